@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import AsistenteConfigModel, FAQ, ChatSession, ChatMessage, CachedResponse, AIUsageLog
+from .models import AsistenteConfigModel, FAQ, ChatSession, ChatMessage, CachedResponse, AIUsageLog, UsoIADiario
 
 
 @admin.register(AsistenteConfigModel)
@@ -36,3 +36,9 @@ class CachedResponseAdmin(admin.ModelAdmin):
 class AIUsageLogAdmin(admin.ModelAdmin):
     list_display = ['provider', 'model', 'tokens_input', 'tokens_output', 'exitoso', 'created_at']
     list_filter = ['exitoso', 'provider']
+
+
+@admin.register(UsoIADiario)
+class UsoIADiarioAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'llamadas_exitosas', 'updated_at']
+    readonly_fields = ['fecha', 'llamadas_exitosas', 'updated_at']
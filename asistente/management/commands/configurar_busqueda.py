@@ -0,0 +1,70 @@
+"""
+Comando de Django para preparar la búsqueda full-text de PostgreSQL del asistente.
+Crea (si no existen) la extensión unaccent, la configuración de texto
+ASISTENTE_BUSQUEDA_CONFIG (español sin acentos) y los índices GIN sobre los
+tsvector de FAQs y fragmentos KB; luego recalcula todos los vectores.
+
+Uso:
+    python manage.py configurar_busqueda              # Configurar y recalcular
+    python manage.py configurar_busqueda --solo-vectores
+
+Es idempotente: se puede ejecutar en cada despliegue. Solo tiene efecto con
+PostgreSQL; activar luego ASISTENTE_BUSQUEDA_BACKEND = 'postgres'.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from asistente.models import FAQ, FragmentoKB
+from asistente.services import busqueda_postgres
+
+
+class Command(BaseCommand):
+    help = 'Configura la búsqueda full-text de PostgreSQL (KB y FAQs) y recalcula los vectores'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--solo-vectores',
+            action='store_true',
+            help='No tocar extensión/configuración/índices; solo recalcular los tsvector',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('La búsqueda full-text requiere PostgreSQL (la base actual es '
+                               f'{connection.vendor}).')
+
+        config = settings.ASISTENTE_BUSQUEDA_CONFIG
+
+        with transaction.atomic():
+            if not options['solo_vectores']:
+                with connection.cursor() as cursor:
+                    cursor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+                    cursor.execute('SELECT 1 FROM pg_ts_config WHERE cfgname = %s', [config])
+                    if cursor.fetchone() is None:
+                        nombre = connection.ops.quote_name(config)
+                        cursor.execute(f'CREATE TEXT SEARCH CONFIGURATION {nombre} (COPY = spanish)')
+                        cursor.execute(
+                            f'ALTER TEXT SEARCH CONFIGURATION {nombre} '
+                            'ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem'
+                        )
+                        self.stdout.write(f'Configuración de texto "{config}" creada.')
+
+                    for modelo in (FAQ, FragmentoKB):
+                        tabla = modelo._meta.db_table
+                        indice = connection.ops.quote_name(f'{tabla}_busqueda_gin')
+                        cursor.execute(
+                            f'CREATE INDEX IF NOT EXISTS {indice} '
+                            f'ON {connection.ops.quote_name(tabla)} USING gin (busqueda)'
+                        )
+
+            faqs, documentos = busqueda_postgres.actualizar_todos()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Búsqueda configurada: {faqs} FAQ(s) y {documentos} documento(s) KB indexados.'
+        ))
+        if settings.ASISTENTE_BUSQUEDA_BACKEND != 'postgres':
+            self.stdout.write(self.style.WARNING(
+                "ASISTENTE_BUSQUEDA_BACKEND no es 'postgres': el asistente sigue usando los índices en memoria."
+            ))
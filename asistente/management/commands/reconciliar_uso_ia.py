@@ -0,0 +1,46 @@
+"""
+Comando de Django para reconciliar los contadores diarios de uso de IA.
+Recalcula UsoIADiario (el contador que consulta el límite diario) desde los
+registros de AIUsageLog, por si quedaron desfasados (logs borrados desde el
+panel, cambios directos en la base, etc.).
+
+Uso:
+    python manage.py reconciliar_uso_ia              # Hoy y ayer
+    python manage.py reconciliar_uso_ia --dias 30    # Últimos 30 días
+
+Para automatizar con cron (cada hora):
+    0 * * * * cd /ruta/proyecto && python manage.py reconciliar_uso_ia
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from asistente.services.cuota_ia import reconciliar
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los contadores diarios de uso de IA desde AIUsageLog'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=2,
+            help='Cantidad de días a reconciliar, contando hoy (por defecto 2)',
+        )
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+        corregidos = 0
+        for i in range(max(options['dias'], 1)):
+            fecha = hoy - timedelta(days=i)
+            antes, despues = reconciliar(fecha)
+            if antes != despues:
+                corregidos += 1
+                self.stdout.write(f'{fecha:%d/%m/%Y}: {antes} -> {despues}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Uso de IA reconciliado: {corregidos} día(s) corregido(s).'
+        ))
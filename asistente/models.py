@@ -1,10 +1,15 @@
 import uuid
 from datetime import timedelta
 
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+from core.singleton import get_singleton, invalidar_singleton
+
 
 class AsistenteConfigModel(models.Model):
     """Configuración del Asistente Virtual (Singleton)"""
@@ -13,6 +18,8 @@ class AsistenteConfigModel(models.Model):
         ('gemini_flash', 'Google Gemini Flash'),
         ('openai', 'OpenAI'),
         ('custom', 'Proveedor personalizado'),
+        ('local', 'Local extractivo (sin red ni costo)'),
+        ('simulado', 'Simulado (pruebas, sin red)'),
     ]
 
     # General
@@ -106,8 +113,14 @@ class AsistenteConfigModel(models.Model):
 
     @classmethod
     def get_config(cls):
-        config, created = cls.objects.get_or_create(pk=1)
-        return config
+        return get_singleton(cls)
+
+
+@receiver(post_save, sender=AsistenteConfigModel)
+@receiver(post_delete, sender=AsistenteConfigModel)
+def invalidar_config_asistente(sender, **kwargs):
+    """La configuración cacheada por cada worker se vuelve a leer"""
+    invalidar_singleton(sender)
 
 
 class FAQ(models.Model):
@@ -151,6 +164,10 @@ class FAQ(models.Model):
     status = models.BooleanField(default=True, verbose_name='Activa')
     created_at = models.DateTimeField(default=timezone.now, verbose_name='Fecha de creación')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Última actualización')
+    busqueda = SearchVectorField(
+        null=True, editable=False,
+        verbose_name='Vector de búsqueda',
+        help_text='tsvector de palabras clave + pregunta (solo con búsqueda PostgreSQL)')
 
     class Meta:
         verbose_name = 'Pregunta Frecuente'
@@ -161,6 +178,18 @@ class FAQ(models.Model):
         return self.pregunta[:80]
 
 
+@receiver(post_save, sender=FAQ)
+@receiver(post_delete, sender=FAQ)
+def invalidar_indice_faq(sender, **kwargs):
+    """Alta, edición, aprobación o baja de una FAQ: el índice del resolver se reconstruye"""
+    from asistente.services import busqueda_postgres
+    from asistente.services.faq_index import invalidar_indice_faq as invalidar
+
+    invalidar()
+    if kwargs.get('signal') is post_save and busqueda_postgres.habilitada():
+        busqueda_postgres.actualizar_vector_faq(kwargs['instance'])
+
+
 class ChatSession(models.Model):
     """Sesión de chat de un visitante"""
 
@@ -260,6 +289,10 @@ class CachedResponse(models.Model):
         default=dict, blank=True,
         verbose_name='Datos de contexto usados')
     respuesta = models.TextField(verbose_name='Respuesta cacheada')
+    pregunta_hash = models.CharField(
+        max_length=40, blank=True, editable=False,
+        verbose_name='Hash de la pregunta',
+        help_text='sha1 de la pregunta normalizada (búsqueda exacta)')
     veces_usada = models.IntegerField(default=0, verbose_name='Veces utilizada')
     vigente = models.BooleanField(default=True, verbose_name='Vigente')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
@@ -268,10 +301,45 @@ class CachedResponse(models.Model):
         verbose_name = 'Respuesta en Cache'
         verbose_name_plural = 'Respuestas en Cache'
         ordering = ['-veces_usada']
+        indexes = [
+            models.Index(fields=['intent', 'pregunta_hash']),
+        ]
 
     def __str__(self):
         return f"Cache: {self.pregunta_normalizada[:60]}..."
 
+    def save(self, *args, **kwargs):
+        from asistente.services.cache_index import hash_pregunta
+        from asistente.services.intents import normalizar_texto
+
+        self.pregunta_hash = hash_pregunta(normalizar_texto(self.pregunta_normalizada))
+        super().save(*args, **kwargs)
+
+
+@receiver(post_save, sender=CachedResponse)
+def sincronizar_indice_cache(sender, created, **kwargs):
+    """Una respuesta nueva se incorpora al índice de cada worker en la próxima búsqueda"""
+    if created:
+        from asistente.services.cache_index import invalidar_indice_cache
+
+        invalidar_indice_cache()
+
+
+@receiver(post_save, sender='talleres.Taller')
+@receiver(post_delete, sender='talleres.Taller')
+@receiver(post_save, sender='tarifas.Tarifa')
+@receiver(post_delete, sender='tarifas.Tarifa')
+@receiver(post_save, sender='tarifas.TarifaItem')
+@receiver(post_delete, sender='tarifas.TarifaItem')
+@receiver(post_save, sender='core.Service')
+@receiver(post_delete, sender='core.Service')
+@receiver(post_save, sender=AsistenteConfigModel)
+def invalidar_cache_humanizado(sender, **kwargs):
+    """Cambiaron datos que el asistente reformula: descartar las respuestas humanizadas"""
+    from asistente.services import cache_humanizado
+
+    cache_humanizado.invalidar()
+
 
 class Derivacion(models.Model):
     """Registro de derivaciones a operador humano"""
@@ -449,6 +517,48 @@ class DocumentoKB(models.Model):
         return self.titulo
 
 
+class FragmentoKB(models.Model):
+    """
+    Párrafo de un DocumentoKB con sus términos ya normalizados.
+    Se generan al procesar el documento y alimentan el índice BM25 del asistente.
+    """
+
+    documento = models.ForeignKey(
+        DocumentoKB, on_delete=models.CASCADE, related_name='fragmentos',
+        verbose_name='Documento')
+    orden = models.PositiveIntegerField(default=0, verbose_name='Orden')
+    texto = models.TextField(verbose_name='Texto')
+    terminos = models.JSONField(
+        default=dict, blank=True,
+        verbose_name='Términos',
+        help_text='Frecuencia de cada término normalizado (sin stopwords)')
+    largo = models.PositiveIntegerField(default=0, verbose_name='Cantidad de términos')
+    busqueda = SearchVectorField(
+        null=True, editable=False,
+        verbose_name='Vector de búsqueda',
+        help_text='tsvector de título/keywords + texto (solo con búsqueda PostgreSQL)')
+
+    class Meta:
+        verbose_name = 'Fragmento KB'
+        verbose_name_plural = 'Fragmentos KB'
+        ordering = ['documento', 'orden']
+
+    def __str__(self):
+        return f"{self.documento_id} #{self.orden}: {self.texto[:60]}"
+
+
+@receiver(post_save, sender=DocumentoKB)
+@receiver(post_delete, sender=DocumentoKB)
+def invalidar_indice_kb(sender, **kwargs):
+    """Cambios de título, keywords, contenido o estado: el índice BM25 se reconstruye"""
+    from asistente.services import busqueda_postgres
+    from asistente.services.kb_index import invalidar_indice_kb as invalidar
+
+    invalidar()
+    if kwargs.get('signal') is post_save and busqueda_postgres.habilitada():
+        busqueda_postgres.actualizar_vectores_documento(kwargs['instance'])
+
+
 class AIUsageLog(models.Model):
     """Log de uso de la IA para monitoreo y control de costos"""
 
@@ -475,3 +585,23 @@ class AIUsageLog(models.Model):
     def __str__(self):
         status = "OK" if self.exitoso else "ERROR"
         return f"[{status}] {self.provider}/{self.model} - {self.created_at.strftime('%d/%m/%Y %H:%M')}"
+
+
+class UsoIADiario(models.Model):
+    """
+    Contador de llamadas exitosas a la IA por día (fecha local).
+    Se incrementa con F() en cada llamada y es lo que consulta el límite diario,
+    en lugar de contar AIUsageLog. Se reconcilia con `manage.py reconciliar_uso_ia`.
+    """
+
+    fecha = models.DateField(unique=True, verbose_name='Fecha')
+    llamadas_exitosas = models.PositiveIntegerField(default=0, verbose_name='Llamadas exitosas')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Última actualización')
+
+    class Meta:
+        verbose_name = 'Uso IA diario'
+        verbose_name_plural = 'Uso IA diario'
+        ordering = ['-fecha']
+
+    def __str__(self):
+        return f"{self.fecha:%d/%m/%Y}: {self.llamadas_exitosas} llamada(s)"
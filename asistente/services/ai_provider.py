@@ -1,117 +1,163 @@
 """
 Wrapper para proveedores de IA.
-Actualmente soporta Gemini Flash. Preparado para conectar con otros proveedores.
+
+Los proveedores se registran en PROVEEDORES por su `nombre` (el valor de
+AsistenteConfigModel.ai_provider) y comparten la interfaz de ProveedorIA:
+generate_response / generate_response_async / stream_response_async, el
+registro en AIUsageLog y el costo por millón de tokens.
+
+- gemini_flash: Google Gemini (pago).
+- local: extractivo, sin red ni costo; arma la respuesta con los datos del prompt.
+- simulado: falso con latencia y fallos configurables (pruebas de resiliencia).
+
+settings.ASISTENTE_IA_RUTEO deriva intents puntuales a otro proveedor (ej:
+los de datos simples al local) y settings.ASISTENTE_PRECIOS_IA reemplaza los
+precios por defecto de cada proveedor.
 """
+import re
 import time
 import logging
 
 logger = logging.getLogger(__name__)
 
+# nombre -> clase del proveedor (ver registrar_proveedor)
+PROVEEDORES = {}
 
-def get_ai_client(config):
-    """Obtiene el cliente de IA según la configuración"""
-    if config.ai_provider == 'gemini_flash':
-        return GeminiProvider(config)
-    raise ValueError(f"Proveedor de IA no soportado: {config.ai_provider}")
 
+def registrar_proveedor(clase):
+    """Decorador: agrega la clase a PROVEEDORES con su `nombre`"""
+    PROVEEDORES[clase.nombre] = clase
+    return clase
 
-class GeminiProvider:
-    """Wrapper para Google Gemini Flash"""
+
+def nombre_proveedor(config, intent=None):
+    """Proveedor a usar: el ruteado para el intent o el configurado en el panel"""
+    from django.conf import settings
+
+    ruteo = getattr(settings, 'ASISTENTE_IA_RUTEO', {})
+    return ruteo.get(intent, config.ai_provider) if intent else config.ai_provider
+
+
+def get_ai_client(config, resiliente=True, intent=None):
+    """
+    Obtiene el cliente de IA según la configuración (o el ruteo del intent).
+    Los proveedores remotos se envuelven en ProveedorResiliente (deadline,
+    reintentos y circuit breaker); resiliente=False retorna el proveedor
+    directo (ej: probar la conexión).
+    """
+    nombre = nombre_proveedor(config, intent)
+    clase = PROVEEDORES.get(nombre)
+    if clase is None:
+        raise ValueError(f"Proveedor de IA no soportado: {nombre}")
+
+    proveedor = clase(config)
+    if not resiliente or not proveedor.remoto:
+        return proveedor
+    from .resiliencia import ProveedorResiliente
+    return ProveedorResiliente(proveedor, config)
+
+
+class ProveedorIA:
+    """
+    Base de los proveedores. Las subclases implementan generate_response; las
+    variantes async y streaming tienen una implementación por defecto a partir
+    de ella (las subclases con cliente async propio las reemplazan).
+    """
+
+    nombre = ''
+    modelo_default = ''
+    # Llama a un servicio externo: se envuelve en ProveedorResiliente
+    remoto = True
+    # Sus llamadas exitosas cuentan para los límites diario y por sesión
+    cuenta_en_cupo = True
+    # Redacta texto nuevo: sus respuestas se cachean y se sugieren como FAQ
+    redacta = True
+    # USD por millón de tokens (reemplazables con settings.ASISTENTE_PRECIOS_IA)
+    precio_input = 0
+    precio_output = 0
 
     def __init__(self, config):
         self.config = config
-        self.model_name = config.ai_model or 'gemini-2.0-flash'
-        self._client = None
+        self.model_name = config.ai_model or self.modelo_default
 
-    def _get_client(self):
-        if self._client is None:
-            import google.generativeai as genai
-            from django.conf import settings
-            # Priorizar API key desde credenciales.py (más seguro que la BD)
-            api_key = getattr(settings, 'GEMINI_API_KEY', '') or self.config.ai_api_key
-            genai.configure(api_key=api_key)
-            self._client = genai.GenerativeModel(
-                model_name=self.model_name,
-                generation_config={
-                    'max_output_tokens': self.config.max_tokens_per_request,
-                    'temperature': 0.7,
-                }
-            )
-        return self._client
-
-    def generate_response(self, prompt, context=None):
-        """
-        Genera una respuesta usando Gemini Flash.
-        Retorna dict con: respuesta, tokens_input, tokens_output, latencia_ms, exitoso, error
-        """
-        from asistente.models import AIUsageLog, ChatSession
+    def _prompt_completo(self, prompt, context):
+        if context and context.get('system_prompt'):
+            return f"{context['system_prompt']}\n\n{prompt}"
+        return prompt
 
-        start_time = time.time()
-        result = {
+    def _resultado_vacio(self):
+        return {
             'respuesta': '',
             'tokens_input': 0,
             'tokens_output': 0,
             'latencia_ms': 0,
             'exitoso': False,
             'error': '',
+            'proveedor': self.nombre,
         }
 
-        try:
-            client = self._get_client()
-
-            # Construir el prompt completo
-            full_prompt = prompt
-            if context and context.get('system_prompt'):
-                full_prompt = f"{context['system_prompt']}\n\n{prompt}"
-
-            response = client.generate_content(full_prompt)
-
-            elapsed_ms = int((time.time() - start_time) * 1000)
-
-            result['respuesta'] = response.text
-            result['latencia_ms'] = elapsed_ms
-            result['exitoso'] = True
-
-            # Obtener tokens si están disponibles
-            if hasattr(response, 'usage_metadata') and response.usage_metadata:
-                result['tokens_input'] = getattr(response.usage_metadata, 'prompt_token_count', 0) or 0
-                result['tokens_output'] = getattr(response.usage_metadata, 'candidates_token_count', 0) or 0
+    def registrar_uso(self, result, context=None):
+        """Registra la llamada en AIUsageLog (y en el contador diario si fue exitosa)"""
+        from asistente.models import AIUsageLog
+        from .cuota_ia import registrar_llamada_exitosa
 
-            # Log de uso
-            session = context.get('session') if context else None
+        session = context.get('session') if context else None
+        if result['exitoso']:
             AIUsageLog.objects.create(
                 session=session,
-                provider='gemini_flash',
+                provider=self.nombre,
                 model=self.model_name,
                 tokens_input=result['tokens_input'],
                 tokens_output=result['tokens_output'],
                 costo_estimado=self._calcular_costo(result['tokens_input'], result['tokens_output']),
-                latencia_ms=elapsed_ms,
+                latencia_ms=result['latencia_ms'],
                 exitoso=True,
             )
-
-        except Exception as e:
-            elapsed_ms = int((time.time() - start_time) * 1000)
-            result['latencia_ms'] = elapsed_ms
-            result['error'] = str(e)
-            logger.error(f"Error Gemini: {e}")
-
-            # Log de error
-            session = context.get('session') if context else None
+            if self.cuenta_en_cupo:
+                registrar_llamada_exitosa()
+        else:
             AIUsageLog.objects.create(
                 session=session,
-                provider='gemini_flash',
+                provider=self.nombre,
                 model=self.model_name,
                 tokens_input=0,
                 tokens_output=0,
                 costo_estimado=0,
-                latencia_ms=elapsed_ms,
+                latencia_ms=result['latencia_ms'],
                 exitoso=False,
-                error_mensaje=str(e),
+                error_mensaje=result['error'],
             )
 
+    def generate_response(self, prompt, context=None, timeout=None, registrar=True):
+        """
+        Retorna dict con: respuesta, tokens_input, tokens_output, latencia_ms, exitoso, error
+        timeout: segundos máximos de la llamada. registrar=False omite el
+        AIUsageLog (lo escribe ProveedorResiliente una vez por llamada).
+        """
+        raise NotImplementedError
+
+    async def generate_response_async(self, prompt, context=None, timeout=None, registrar=True):
+        """Por defecto: generate_response en un thread aparte (no bloquea el event loop)"""
+        from asgiref.sync import sync_to_async
+
+        result = await sync_to_async(self.generate_response, thread_sensitive=False)(
+            prompt, context, timeout, registrar=False)
+        if registrar:
+            await sync_to_async(self.registrar_uso)(result, context)
         return result
 
+    async def stream_response_async(self, prompt, context=None, result=None, timeout=None, registrar=True):
+        """
+        Async generator que emite la respuesta en fragmentos y al terminar deja
+        en `result` el dict de generate_response. Por defecto emite la
+        respuesta completa en un solo fragmento.
+        """
+        final = await self.generate_response_async(prompt, context, timeout, registrar)
+        if final['exitoso'] and final['respuesta']:
+            yield final['respuesta']
+        if result is not None:
+            result.update(final)
+
     def classify_intent(self, texto, intents_disponibles):
         """
         Usa IA para clasificar el intent cuando los keywords no son suficientes.
@@ -147,20 +193,309 @@ class GeminiProvider:
         return False
 
     def _calcular_costo(self, tokens_input, tokens_output):
-        """Calcula costo estimado para Gemini Flash (precios aproximados)"""
-        # Gemini Flash: ~$0.075/1M input, ~$0.30/1M output
-        costo_input = (tokens_input / 1_000_000) * 0.075
-        costo_output = (tokens_output / 1_000_000) * 0.30
+        """Costo estimado en USD según el precio por millón de tokens del proveedor"""
+        from django.conf import settings
+
+        precios = getattr(settings, 'ASISTENTE_PRECIOS_IA', {})
+        precio_input, precio_output = precios.get(self.nombre, (self.precio_input, self.precio_output))
+        costo_input = (tokens_input / 1_000_000) * precio_input
+        costo_output = (tokens_output / 1_000_000) * precio_output
         return round(costo_input + costo_output, 6)
 
 
+@registrar_proveedor
+class GeminiProvider(ProveedorIA):
+    """Wrapper para Google Gemini Flash"""
+
+    nombre = 'gemini_flash'
+    modelo_default = 'gemini-2.0-flash'
+    # Gemini Flash: ~$0.075/1M input, ~$0.30/1M output (precios aproximados)
+    precio_input = 0.075
+    precio_output = 0.30
+
+    def __init__(self, config):
+        super().__init__(config)
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            import google.generativeai as genai
+            from django.conf import settings
+            # Priorizar API key desde credenciales.py (más seguro que la BD)
+            api_key = getattr(settings, 'GEMINI_API_KEY', '') or self.config.ai_api_key
+            genai.configure(api_key=api_key)
+            self._client = genai.GenerativeModel(
+                model_name=self.model_name,
+                generation_config={
+                    'max_output_tokens': self.config.max_tokens_per_request,
+                    'temperature': 0.7,
+                }
+            )
+        return self._client
+
+    def _leer_uso(self, response, result):
+        """Obtiene tokens si están disponibles"""
+        if hasattr(response, 'usage_metadata') and response.usage_metadata:
+            result['tokens_input'] = getattr(response.usage_metadata, 'prompt_token_count', 0) or 0
+            result['tokens_output'] = getattr(response.usage_metadata, 'candidates_token_count', 0) or 0
+
+    def _opciones_request(self, timeout):
+        return {'timeout': timeout} if timeout else None
+
+    def generate_response(self, prompt, context=None, timeout=None, registrar=True):
+        """
+        Genera una respuesta usando Gemini Flash.
+        Retorna dict con: respuesta, tokens_input, tokens_output, latencia_ms, exitoso, error
+        timeout: segundos máximos de la llamada HTTP. registrar=False omite el
+        AIUsageLog (lo escribe ProveedorResiliente una vez por llamada).
+        """
+        start_time = time.time()
+        result = self._resultado_vacio()
+
+        try:
+            client = self._get_client()
+            response = client.generate_content(
+                self._prompt_completo(prompt, context),
+                request_options=self._opciones_request(timeout))
+
+            result['respuesta'] = response.text
+            result['latencia_ms'] = int((time.time() - start_time) * 1000)
+            result['exitoso'] = True
+            self._leer_uso(response, result)
+
+        except Exception as e:
+            result['latencia_ms'] = int((time.time() - start_time) * 1000)
+            result['error'] = str(e)
+            logger.error(f"Error Gemini: {e}")
+
+        # Log de uso
+        if registrar:
+            self.registrar_uso(result, context)
+        return result
+
+    async def generate_response_async(self, prompt, context=None, timeout=None, registrar=True):
+        """
+        Igual que generate_response, pero espera a Gemini sin ocupar un thread
+        (vistas async bajo ASGI). El log de uso se escribe con sync_to_async.
+        """
+        from asgiref.sync import sync_to_async
+
+        start_time = time.time()
+        result = self._resultado_vacio()
+
+        try:
+            client = self._get_client()
+            response = await client.generate_content_async(
+                self._prompt_completo(prompt, context),
+                request_options=self._opciones_request(timeout))
+
+            result['respuesta'] = response.text
+            result['latencia_ms'] = int((time.time() - start_time) * 1000)
+            result['exitoso'] = True
+            self._leer_uso(response, result)
+
+        except Exception as e:
+            result['latencia_ms'] = int((time.time() - start_time) * 1000)
+            result['error'] = str(e)
+            logger.error(f"Error Gemini: {e}")
+
+        if registrar:
+            await sync_to_async(self.registrar_uso)(result, context)
+        return result
+
+    async def stream_response_async(self, prompt, context=None, result=None, timeout=None, registrar=True):
+        """
+        Genera la respuesta en streaming: async generator que emite los
+        fragmentos de texto a medida que llegan. Al terminar deja en `result`
+        (dict de generate_response) la respuesta completa, tokens y latencia.
+        """
+        from asgiref.sync import sync_to_async
+
+        start_time = time.time()
+        if result is None:
+            result = {}
+        result.update(self._resultado_vacio())
+        partes = []
+
+        try:
+            client = self._get_client()
+            response = await client.generate_content_async(
+                self._prompt_completo(prompt, context), stream=True,
+                request_options=self._opciones_request(timeout))
+            async for chunk in response:
+                texto = getattr(chunk, 'text', '') or ''
+                if texto:
+                    partes.append(texto)
+                    yield texto
+
+            result['respuesta'] = ''.join(partes)
+            result['latencia_ms'] = int((time.time() - start_time) * 1000)
+            result['exitoso'] = True
+            self._leer_uso(response, result)
+
+        except Exception as e:
+            result['latencia_ms'] = int((time.time() - start_time) * 1000)
+            result['error'] = str(e)
+            logger.error(f"Error Gemini (streaming): {e}")
+
+        if registrar:
+            await sync_to_async(self.registrar_uso)(result, context)
+
+
+@registrar_proveedor
+class ProveedorLocal(ProveedorIA):
+    """
+    Proveedor local extractivo: sin red, sin costo y determinístico. No
+    redacta: arma la respuesta con el texto de los prompts del humanizer.
+    - Humanizar datos: devuelve los datos del sistema tal cual (cifras exactas).
+    - IA completa con KB: el párrafo de la base de conocimiento con más
+      términos en común con la consulta; sin KB o sin coincidencias responde
+      NO_RELEVANTE y el humanizer elige el mensaje.
+    - Otros prompts: devuelve el último párrafo (eco).
+    No cuenta para los límites de IA ni alimenta el cache de respuestas. Sirve para correr el pipeline completo
+    sin API key (test_asistente.py, pruebas de carga) y para rutear intents
+    de datos simples fuera del modelo pago (settings.ASISTENTE_IA_RUTEO).
+    """
+
+    nombre = 'local'
+    modelo_default = 'extractivo'
+    remoto = False
+    cuenta_en_cupo = False
+    redacta = False
+
+    # Secciones de los prompts de humanizer (_prompt_humanizar_datos / _prompt_ia_completa)
+    RE_DATOS = re.compile(r'Se encontró la siguiente información en el sistema:\n(.*?)\n\nINSTRUCCIONES:', re.S)
+    RE_KB = re.compile(r'INFORMACIÓN DE LA BASE DE CONOCIMIENTO:\n(.*?)\n\nUsá la información anterior', re.S)
+    RE_CONSULTA = re.compile(r'Consulta del usuario: "(.*?)"\n\n', re.S)
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.model_name = self.modelo_default
+
+    def _extraer(self, prompt):
+        datos = self.RE_DATOS.search(prompt)
+        if datos:
+            return datos.group(1).strip()
+
+        consulta = self.RE_CONSULTA.search(prompt)
+        if consulta:
+            kb = self.RE_KB.search(prompt)
+            return self._mejor_parrafo(kb.group(1), consulta.group(1)) if kb else 'NO_RELEVANTE'
+
+        return prompt.strip().split('\n\n')[-1].strip()
+
+    def _mejor_parrafo(self, contexto_kb, consulta):
+        from .kb_service import terminos_de
+
+        buscados = set(terminos_de(consulta))
+        mejor, mejor_puntaje = '', 0
+        for parrafo in contexto_kb.split('\n\n'):
+            # Sin la línea "[Documento: ...]" que encabeza cada fragmento
+            texto = re.sub(r'^\[Documento: [^\]]*\]\n?', '', parrafo.strip()).strip()
+            puntaje = len(buscados & set(terminos_de(texto)))
+            if puntaje > mejor_puntaje:
+                mejor, mejor_puntaje = texto, puntaje
+        return mejor or 'NO_RELEVANTE'
+
+    def generate_response(self, prompt, context=None, timeout=None, registrar=True):
+        start_time = time.time()
+        result = self._resultado_vacio()
+        result['respuesta'] = self._extraer(prompt)
+        result['exitoso'] = bool(result['respuesta'])
+        if not result['exitoso']:
+            result['error'] = 'Prompt sin contenido para extraer'
+        result['latencia_ms'] = int((time.time() - start_time) * 1000)
+        if registrar:
+            self.registrar_uso(result, context)
+        return result
+
+    async def generate_response_async(self, prompt, context=None, timeout=None, registrar=True):
+        from asgiref.sync import sync_to_async
+
+        # Solo CPU y muy rápido: no hace falta un thread aparte
+        result = self.generate_response(prompt, context, timeout, registrar=False)
+        if registrar:
+            await sync_to_async(self.registrar_uso)(result, context)
+        return result
+
+
+@registrar_proveedor
+class ProveedorSimulado(ProveedorIA):
+    """
+    Proveedor falso para pruebas (sin red ni API key): responde `respuesta`
+    después de `latencia_ms` y falla con probabilidad `tasa_fallos`. Sirve para
+    ejercitar reintentos, timeouts y circuit breaker sin llamar a Gemini.
+    """
+
+    nombre = 'simulado'
+    modelo_default = 'simulado'
+    respuesta = 'Respuesta simulada.'
+    latencia_ms = 0
+    tasa_fallos = 0.0
+
+    def __init__(self, config, respuesta=None, latencia_ms=None, tasa_fallos=None):
+        super().__init__(config)
+        self.model_name = self.modelo_default
+        if respuesta is not None:
+            self.respuesta = respuesta
+        if latencia_ms is not None:
+            self.latencia_ms = latencia_ms
+        if tasa_fallos is not None:
+            self.tasa_fallos = tasa_fallos
+
+    def _simular(self, timeout):
+        import random
+
+        if timeout is not None and self.latencia_ms / 1000 > timeout:
+            return timeout, 'Timeout simulado'
+        if random.random() < self.tasa_fallos:
+            return self.latencia_ms / 1000, 'Error simulado'
+        return self.latencia_ms / 1000, ''
+
+    def _resultado_simulado(self, error, espera):
+        result = self._resultado_vacio()
+        result['latencia_ms'] = int(espera * 1000)
+        if error:
+            result['error'] = error
+        else:
+            result.update(respuesta=self.respuesta, tokens_input=10, tokens_output=10, exitoso=True)
+        return result
+
+    def generate_response(self, prompt, context=None, timeout=None, registrar=True):
+        espera, error = self._simular(timeout)
+        time.sleep(espera)
+        result = self._resultado_simulado(error, espera)
+        if registrar:
+            self.registrar_uso(result, context)
+        return result
+
+    async def generate_response_async(self, prompt, context=None, timeout=None, registrar=True):
+        import asyncio
+        from asgiref.sync import sync_to_async
+
+        espera, error = self._simular(timeout)
+        await asyncio.sleep(espera)
+        result = self._resultado_simulado(error, espera)
+        if registrar:
+            await sync_to_async(self.registrar_uso)(result, context)
+        return result
+
+    async def stream_response_async(self, prompt, context=None, result=None, timeout=None, registrar=True):
+        final = await self.generate_response_async(prompt, context, timeout, registrar)
+        if final['exitoso']:
+            for i, palabra in enumerate(final['respuesta'].split(' ')):
+                yield palabra if i == 0 else f' {palabra}'
+        if result is not None:
+            result.update(final)
+
+
 def test_connection(config):
     """Prueba la conexión con el proveedor de IA. Retorna (exitoso, mensaje)"""
     try:
-        provider = get_ai_client(config)
+        provider = get_ai_client(config, resiliente=False)
         result = provider.generate_response("Respondé solo 'OK' para confirmar que funciona.")
         if result['exitoso']:
-            return True, f"Conexión exitosa. Modelo: {config.ai_model}. Latencia: {result['latencia_ms']}ms"
+            return True, f"Conexión exitosa. Modelo: {provider.model_name}. Latencia: {result['latencia_ms']}ms"
         return False, f"Error: {result['error']}"
     except Exception as e:
         return False, f"Error de conexión: {str(e)}"
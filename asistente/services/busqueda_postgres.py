@@ -0,0 +1,194 @@
+"""
+Búsqueda full-text de PostgreSQL para la KB y las FAQs.
+
+Alternativa a los índices en memoria (kb_index / faq_index) cuando
+ASISTENTE_BUSQUEDA_BACKEND = 'postgres'. Cada FragmentoKB y cada FAQ guarda su
+tsvector en el campo `busqueda`, con índice GIN y la configuración de texto
+ASISTENTE_BUSQUEDA_CONFIG (español + unaccent), así la búsqueda la resuelve el
+índice de la base en lugar de recorrer filas en Python.
+
+- Fragmentos KB: título y palabras clave del documento con peso A, texto del
+  párrafo con peso B. La base trae los párrafos que coinciden con alguna
+  palabra, ordenados por SearchRank, y marca qué palabras aparecen en el texto
+  (peso B). Sobre eso se aplica el mismo umbral que el índice en memoria
+  (kb_index.RELEVANCIA_MINIMA): bonus de título/keywords más palabras
+  distintas en el contenido.
+- FAQs: palabras clave con peso A, pregunta con peso B. La base preselecciona
+  las mejores MAX_CANDIDATAS_FAQ y sobre ellas se aplica la misma puntuación
+  que el índice en memoria.
+
+La configuración de texto y los índices GIN se crean con
+`python manage.py configurar_busqueda`. Con SQLite (desarrollo/tests) siempre
+se usan los índices en memoria.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+
+MAX_FRAGMENTOS_KB = 50
+MAX_CANDIDATAS_FAQ = 20
+
+
+def habilitada():
+    """True si está configurado el backend 'postgres' y la base es PostgreSQL"""
+    return (getattr(settings, 'ASISTENTE_BUSQUEDA_BACKEND', 'python') == 'postgres'
+            and connection.vendor == 'postgresql')
+
+
+def _config():
+    return getattr(settings, 'ASISTENTE_BUSQUEDA_CONFIG', 'es_unaccent')
+
+
+def _terminos(palabras):
+    """Palabras sin repetir y limpias para usar en un tsquery"""
+    terminos = []
+    for palabra in palabras:
+        palabra = re.sub(r'[^a-z0-9]', '', palabra)
+        if palabra and palabra not in terminos:
+            terminos.append(palabra)
+    return terminos
+
+
+def _consulta(palabras):
+    """SearchQuery OR de las palabras, cada una como prefijo ('turno' -> 'turno:*')"""
+    from django.contrib.postgres.search import SearchQuery
+
+    terminos = _terminos(palabras)
+    if not terminos:
+        return None
+    return SearchQuery(' | '.join(f'{t}:*' for t in terminos), config=_config(), search_type='raw')
+
+
+def actualizar_vectores_documento(documento):
+    """Recalcula el tsvector de los fragmentos del documento"""
+    from django.contrib.postgres.search import SearchVector
+    from django.db.models import Value
+    from asistente.models import FragmentoKB
+
+    cabecera = ' '.join([documento.titulo or ''] + list(documento.palabras_clave or []))
+    FragmentoKB.objects.filter(documento=documento).update(
+        busqueda=(SearchVector(Value(cabecera), weight='A', config=_config())
+                  + SearchVector('texto', weight='B', config=_config())),
+    )
+
+
+def _vector_faq():
+    from django.contrib.postgres.search import SearchVector
+    from django.db.models import TextField
+    from django.db.models.functions import Cast
+
+    return (SearchVector(Cast('palabras_clave', TextField()), weight='A', config=_config())
+            + SearchVector('pregunta', weight='B', config=_config()))
+
+
+def actualizar_vector_faq(faq):
+    """Recalcula el tsvector de una FAQ"""
+    from asistente.models import FAQ
+
+    FAQ.objects.filter(pk=faq.pk).update(busqueda=_vector_faq())
+
+
+def actualizar_todos():
+    """Recalcula los tsvector de todas las FAQs y fragmentos. Retorna (faqs, documentos)"""
+    from asistente.models import FAQ, DocumentoKB
+
+    faqs = FAQ.objects.update(busqueda=_vector_faq())
+    documentos = 0
+    for documento in DocumentoKB.objects.only('pk', 'titulo', 'palabras_clave'):
+        actualizar_vectores_documento(documento)
+        documentos += 1
+    return faqs, documentos
+
+
+def buscar_fragmentos_kb(palabras_consulta, max_resultados=3):
+    """
+    Misma salida y mismo criterio que IndiceKB.buscar: [{'doc_id', 'score',
+    'fragmentos'}]. Un documento entra si su bonus de título/keywords más la
+    cantidad de palabras distintas que aparecen en el texto de sus párrafos
+    llega a RELEVANCIA_MINIMA. Score = bonus + mejor SearchRank; sin palabras
+    en el texto se usa solo su primer párrafo.
+    """
+    from django.contrib.postgres.search import SearchRank
+    from django.db.models import BooleanField, F
+    from django.db.models.expressions import RawSQL
+    from asistente.models import DocumentoKB, FragmentoKB
+    from .intents import normalizar_texto
+    from .kb_index import RELEVANCIA_MINIMA, bonus_documento
+
+    terminos = _terminos(palabras_consulta)
+    consulta = _consulta(terminos)
+    if consulta is None:
+        return []
+
+    # Por palabra: si aparece en el texto del párrafo (peso B), no solo en título/keywords
+    en_texto = {
+        f'en_texto_{i}': RawSQL('busqueda @@ to_tsquery(%s::regconfig, %s)', (_config(), f'{termino}:*B'),
+                                output_field=BooleanField())
+        for i, termino in enumerate(terminos)
+    }
+    filas = (
+        FragmentoKB.objects
+        .filter(documento__activo=True, busqueda=consulta)
+        .annotate(rango=SearchRank(F('busqueda'), consulta), **en_texto)
+        .order_by('-rango')
+        .values_list('pk', 'documento_id', 'orden', 'rango', *en_texto)[:MAX_FRAGMENTOS_KB]
+    )
+
+    documentos = {}
+    for pk, documento_id, orden, rango, *coincidencias in filas:
+        doc = documentos.setdefault(documento_id, {'fragmentos': [], 'en_contenido': set(), 'primero': (orden, pk)})
+        doc['primero'] = min(doc['primero'], (orden, pk))
+        palabras = {i for i, coincide in enumerate(coincidencias) if coincide}
+        if palabras:
+            doc['fragmentos'].append(pk)  # ya vienen por rango descendente
+            doc['en_contenido'] |= palabras
+            doc.setdefault('rango', rango)
+
+    resultados = []
+    cabeceras = DocumentoKB.objects.filter(pk__in=documentos).values_list('pk', 'titulo', 'palabras_clave')
+    for documento_id, titulo, palabras_clave in cabeceras:
+        doc = documentos[documento_id]
+        bonus = bonus_documento(
+            palabras_consulta,
+            normalizar_texto(titulo) if titulo else '',
+            [normalizar_texto(kw) for kw in (palabras_clave or [])],
+        )
+        if bonus + len(doc['en_contenido']) < RELEVANCIA_MINIMA:
+            continue
+        if doc['fragmentos']:
+            resultados.append({'doc_id': documento_id, 'score': bonus + doc['rango'], 'fragmentos': doc['fragmentos']})
+        else:
+            resultados.append({'doc_id': documento_id, 'score': bonus, 'fragmentos': [doc['primero'][1]]})
+
+    resultados.sort(key=lambda r: r['score'], reverse=True)
+    return resultados[:max_resultados]
+
+
+def buscar_faq(texto_norm):
+    """Misma salida que faq_index.buscar_faq: (faq, score) o (None, 0)"""
+    from django.contrib.postgres.search import SearchRank
+    from django.db.models import F
+    from asistente.models import FAQ
+    from .faq_index import IndiceFAQ
+
+    consulta = _consulta([p for p in texto_norm.split() if len(p) > 1])
+    if consulta is None:
+        return None, 0
+
+    pks = list(
+        FAQ.objects
+        .filter(aprobada=True, status=True, busqueda=consulta)
+        .annotate(rango=SearchRank(F('busqueda'), consulta))
+        .order_by('-rango')
+        .values_list('pk', flat=True)[:MAX_CANDIDATAS_FAQ]
+    )
+    if not pks:
+        return None, 0
+
+    # En el orden del modelo, para desempatar igual que el índice en memoria
+    candidatas = FAQ.objects.filter(pk__in=pks).only(
+        'pk', 'pregunta', 'palabras_clave', 'respuesta_datos',
+        'respuesta_humanizada', 'categoria',
+    )
+    return IndiceFAQ(candidatas).buscar(texto_norm)
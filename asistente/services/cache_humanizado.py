@@ -0,0 +1,170 @@
+"""
+Cache de respuestas humanizadas por datos del resolver.
+
+La IA reformula una y otra vez los mismos datos (tarifas, horarios,
+ubicación): la respuesta depende de los datos, no de cómo se escribió la
+pregunta. Este cache guarda la respuesta humanizada bajo
+sha1(intent, datos, versión del prompt, generación) y el humanizer lo
+consulta antes de llamar al proveedor.
+
+- Dos niveles: LRU en memoria del worker (MAX_ENTRADAS) y el cache de Django,
+  compartido entre workers. Cada entrada vence MAX_EDAD_SEGUNDOS (10 minutos)
+  después de guardarse.
+- Invalidación: la generación vive en el cache de Django y se renueva al
+  guardar/borrar talleres, tarifas, servicios o la configuración del
+  asistente (signals en asistente/models.py). Las claves viejas dejan de
+  consultarse y vencen solas. Con caches no compartidos entre workers
+  (LocMem) la nueva generación solo llega al worker que guardó el cambio: en
+  los demás, el vencimiento de cada entrada acota a MAX_EDAD_SEGUNDOS el
+  tiempo que se sirve una respuesta de datos cambiados.
+- Métricas: aciertos, fallos y consultas omitidas por baja confianza del día,
+  en la página de Uso IA del panel. La tasa de aciertos se calcula sobre las
+  tres.
+
+Los intents de turnos no se cachean: sus datos son de una persona puntual.
+
+La respuesta cacheada no depende de la pregunta, pero el prompt también le pide
+a la IA decidir con la pregunta si los datos no son relevantes (NO_RELEVANTE,
+falso positivo de keywords) o si hace falta un operador (NECESITA_OPERADOR,
+reclamos). Por eso obtener() solo sirve aciertos cuando el intent se detectó
+con la confianza de CONFIANZA_MINIMA para ese intent (CONFIANZA_MINIMA_DEFAULT
+para el resto): las demás preguntas pasan siempre por la IA, que toma esa
+decisión. guardar() solo recibe respuestas que la IA ya consideró
+relevantes.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.utils import timezone
+
+MAX_EDAD_SEGUNDOS = 10 * 60
+MAX_ENTRADAS = 500
+CLAVE_GENERACION = 'asistente:humanizado:generacion'
+INTENTS_SIN_CACHE = ('consultar_turno', 'cancelar_turno', 'reprogramar_turno')
+CONFIANZA_MINIMA_DEFAULT = 1.0
+# Preguntas cortas y directas ("tarifas", "precio vtv", "atienden los sabados")
+# puntúan 2 de 3 en detectar_intent_por_keywords; con una sola keyword
+# ("el precio de la vtv es un robo") quedan en 1/3 y pasan por la IA.
+CONFIANZA_MINIMA = {
+    'consultar_tarifa': 0.6,
+    'consultar_horarios': 0.6,
+    'consultar_ubicacion': 0.6,
+    'consultar_servicios': 0.6,
+}
+
+# clave -> (respuesta, vence), del menos al más usado recientemente
+_lru = OrderedDict()
+_lock = threading.Lock()
+
+
+def _generacion():
+    generacion = cache.get(CLAVE_GENERACION)
+    if generacion is None:
+        generacion = uuid.uuid4().hex
+        if not cache.add(CLAVE_GENERACION, generacion, None):
+            generacion = cache.get(CLAVE_GENERACION, generacion)
+    return generacion
+
+
+def _clave(resolver_result, version_prompt):
+    base = '\x1f'.join([
+        resolver_result.intent or '', str(version_prompt), _generacion(), resolver_result.datos,
+    ])
+    return 'asistente:humanizado:' + hashlib.sha1(base.encode('utf-8')).hexdigest()
+
+
+def _cacheable(resolver_result):
+    return bool(resolver_result.datos) and resolver_result.intent not in INTENTS_SIN_CACHE
+
+
+def _memorizar(clave, respuesta, vence):
+    with _lock:
+        _lru[clave] = (respuesta, vence)
+        _lru.move_to_end(clave)
+        while len(_lru) > MAX_ENTRADAS:
+            _lru.popitem(last=False)
+
+
+def _buscar_en_memoria(clave):
+    with _lock:
+        memo = _lru.get(clave)
+        if memo is None:
+            return None
+        if memo[1] <= time.monotonic():
+            del _lru[clave]
+            return None
+        _lru.move_to_end(clave)
+        return memo[0]
+
+
+def obtener(resolver_result, version_prompt):
+    """Respuesta humanizada guardada para estos datos, o None"""
+    if not _cacheable(resolver_result):
+        return None
+    minima = CONFIANZA_MINIMA.get(resolver_result.intent, CONFIANZA_MINIMA_DEFAULT)
+    if resolver_result.confidence < minima:
+        _incrementar('omitidas')
+        return None
+
+    clave = _clave(resolver_result, version_prompt)
+    respuesta = _buscar_en_memoria(clave)
+    if respuesta is None:
+        respuesta = cache.get(clave)
+        if respuesta is not None:
+            _memorizar(clave, respuesta, time.monotonic() + MAX_EDAD_SEGUNDOS)
+
+    _incrementar('aciertos' if respuesta is not None else 'fallos')
+    return respuesta
+
+
+def guardar(resolver_result, version_prompt, respuesta):
+    """Guarda la respuesta humanizada de estos datos en ambos niveles"""
+    if not _cacheable(resolver_result) or not respuesta:
+        return
+
+    clave = _clave(resolver_result, version_prompt)
+    cache.set(clave, respuesta, MAX_EDAD_SEGUNDOS)
+    _memorizar(clave, respuesta, time.monotonic() + MAX_EDAD_SEGUNDOS)
+
+
+def invalidar():
+    """Descarta las respuestas guardadas en todos los workers (cambió algún dato)"""
+    with _lock:
+        _lru.clear()
+    cache.set(CLAVE_GENERACION, uuid.uuid4().hex, None)
+
+
+# ── Métricas ──
+
+def _clave_metrica(nombre, fecha=None):
+    fecha = fecha or timezone.localdate()
+    return f'asistente:humanizado:{fecha:%Y%m%d}:{nombre}'
+
+
+def _incrementar(nombre):
+    clave = _clave_metrica(nombre)
+    cache.add(clave, 0, 2 * 24 * 3600)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        pass
+
+
+def estadisticas(fecha=None):
+    """Aciertos, fallos y omitidas del día y entradas en memoria de este worker, para el panel"""
+    valores = cache.get_many([_clave_metrica(n, fecha) for n in ('aciertos', 'fallos', 'omitidas')])
+    aciertos = valores.get(_clave_metrica('aciertos', fecha), 0)
+    fallos = valores.get(_clave_metrica('fallos', fecha), 0)
+    omitidas = valores.get(_clave_metrica('omitidas', fecha), 0)
+    consultas = aciertos + fallos + omitidas
+    return {
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'omitidas': omitidas,
+        'tasa_aciertos': round(aciertos * 100 / consultas, 1) if consultas else 0,
+        'entradas_memoria': len(_lru),
+    }
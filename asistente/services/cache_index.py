@@ -0,0 +1,153 @@
+"""
+Índice en memoria de CachedResponse para búsquedas por similitud.
+
+Una respuesta cacheada se reutiliza si su pregunta normalizada es idéntica al
+texto o si la similitud de Jaccard entre sus palabras supera UMBRAL_SIMILITUD.
+En lugar de comparar contra todas las filas del intent, el índice guarda:
+
+- hash de la pregunta normalizada -> ids (coincidencia exacta);
+- prefix filtering: cada pregunta se indexa por las primeras
+  n - floor(UMBRAL * n) palabras de su set, en un orden global fijo
+  (hash de la palabra). Dos sets con Jaccard > UMBRAL comparten
+  necesariamente una palabra de esos prefijos, así que solo se verifican
+  esos candidatos, además filtrados por tamaño.
+
+El resultado es el mismo que la búsqueda lineal. El índice vive en memoria de
+cada worker y se sincroniza en forma incremental (filas con id mayor al último
+cargado) cuando cambia la versión en el cache de Django o pasa
+SEGUNDOS_SINCRONIZACION; cada SEGUNDOS_RECONSTRUCCION se rearma completo para
+descartar filas eliminadas o no vigentes.
+"""
+import hashlib
+import math
+import time
+import uuid
+import zlib
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from .intents import normalizar_texto
+
+UMBRAL_SIMILITUD = 0.8
+CLAVE_VERSION = 'asistente:cache_respuestas_version'
+SEGUNDOS_SINCRONIZACION = 60
+SEGUNDOS_RECONSTRUCCION = 60 * 60
+
+
+def hash_pregunta(texto_norm):
+    """Hash estable (sha1) de una pregunta ya normalizada"""
+    return hashlib.sha1(texto_norm.encode('utf-8')).hexdigest()
+
+
+def _orden_palabra(palabra):
+    # Orden global fijo entre procesos (hash() de Python varía por proceso)
+    return (zlib.crc32(palabra.encode('utf-8')), palabra)
+
+
+def _prefijo(palabras):
+    """Palabras del set que se indexan/consultan para Jaccard > UMBRAL_SIMILITUD"""
+    n = len(palabras)
+    if not n:
+        return []
+    # Mínimo de palabras en común para superar el umbral con un set de tamaño n
+    minimo_comun = math.floor(UMBRAL_SIMILITUD * n) + 1
+    largo = max(n - minimo_comun + 1, 1)
+    return sorted(palabras, key=_orden_palabra)[:largo]
+
+
+def _jaccard(palabras1, palabras2):
+    if not palabras1 or not palabras2:
+        return 0
+    return len(palabras1 & palabras2) / len(palabras1 | palabras2)
+
+
+class IndiceCache:
+    """Índice de CachedResponse vigentes agrupado por intent"""
+
+    def __init__(self):
+        self.version = None
+        self.creado = time.monotonic()
+        self.sincronizado = 0
+        self.ultimo_id = 0
+        self.palabras = {}  # id -> frozenset de palabras
+        self.exactos = defaultdict(list)  # (intent, hash) -> ids
+        self.prefijos = defaultdict(lambda: defaultdict(list))  # intent -> palabra -> ids
+
+    def agregar(self, pk, intent, pregunta_normalizada):
+        texto_norm = normalizar_texto(pregunta_normalizada)
+        palabras = frozenset(texto_norm.split())
+        self.palabras[pk] = palabras
+        self.exactos[(intent, hash_pregunta(texto_norm))].append(pk)
+        for palabra in _prefijo(palabras):
+            self.prefijos[intent][palabra].append(pk)
+        self.ultimo_id = max(self.ultimo_id, pk)
+
+    def sincronizar(self, version):
+        """Carga las filas vigentes nuevas (id > último id cargado)"""
+        from asistente.models import CachedResponse
+
+        filas = CachedResponse.objects.filter(
+            vigente=True, pk__gt=self.ultimo_id,
+        ).order_by('pk').values_list('pk', 'intent', 'pregunta_normalizada')
+        for pk, intent, pregunta in filas.iterator():
+            self.agregar(pk, intent, pregunta)
+        self.version = version
+        self.sincronizado = time.monotonic()
+
+    def candidatos(self, texto_norm, intent):
+        """Ids cuya pregunta coincide exacta o con Jaccard > UMBRAL_SIMILITUD"""
+        encontrados = set(self.exactos.get((intent, hash_pregunta(texto_norm)), ()))
+
+        palabras = frozenset(texto_norm.split())
+        n = len(palabras)
+        postings = self.prefijos.get(intent)
+        if not n or not postings:
+            return encontrados
+
+        for palabra in _prefijo(palabras):
+            for pk in postings.get(palabra, ()):
+                if pk in encontrados:
+                    continue
+                otras = self.palabras[pk]
+                # Filtro por tamaño: Jaccard <= min/max
+                if min(n, len(otras)) <= UMBRAL_SIMILITUD * max(n, len(otras)):
+                    continue
+                if _jaccard(palabras, otras) > UMBRAL_SIMILITUD:
+                    encontrados.add(pk)
+        return encontrados
+
+
+_indice = None
+
+
+def invalidar_indice_cache():
+    """Avisa a los workers que hay filas nuevas para sincronizar"""
+    cache.set(CLAVE_VERSION, uuid.uuid4().hex, None)
+
+
+def get_indice_cache():
+    """Retorna el índice del worker, sincronizado con la base"""
+    global _indice
+    ahora = time.monotonic()
+    if _indice is None or ahora - _indice.creado > SEGUNDOS_RECONSTRUCCION:
+        _indice = IndiceCache()
+
+    version = cache.get(CLAVE_VERSION)
+    if (not _indice.sincronizado or _indice.version != version
+            or ahora - _indice.sincronizado > SEGUNDOS_SINCRONIZACION):
+        _indice.sincronizar(version)
+    return _indice
+
+
+def buscar_respuesta_cacheada(texto_norm, intent):
+    """
+    Retorna la CachedResponse vigente más usada cuya pregunta coincide con el
+    texto (exacta o similar), o None. Solo consulta la base si hay candidatos.
+    """
+    from asistente.models import CachedResponse
+
+    ids = get_indice_cache().candidatos(texto_norm, intent)
+    if not ids:
+        return None
+    return CachedResponse.objects.filter(pk__in=ids, intent=intent, vigente=True).order_by('-veces_usada').first()
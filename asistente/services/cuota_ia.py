@@ -0,0 +1,93 @@
+"""
+Cuota de llamadas a la IA (límite diario y por sesión).
+
+Los límites se controlan con contadores en lugar de contar AIUsageLog (que
+crece sin fin):
+- diario: fila UsoIADiario de la fecha local, incrementada con F() en cada
+  llamada exitosa (una sola lectura por índice único para verificar);
+- por sesión: ChatSession.ai_calls_count, también incrementado con F().
+
+AIUsageLog sigue siendo el registro detallado; `manage.py reconciliar_uso_ia`
+recalcula los contadores diarios a partir de él.
+"""
+import logging
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def llamadas_hoy():
+    """Llamadas exitosas registradas hoy (fecha local)"""
+    from asistente.models import UsoIADiario
+
+    llamadas = UsoIADiario.objects.filter(fecha=timezone.localdate()).values_list(
+        'llamadas_exitosas', flat=True).first()
+    return llamadas or 0
+
+
+def registrar_llamada_exitosa():
+    """Suma una llamada exitosa al contador del día"""
+    from asistente.models import UsoIADiario
+
+    hoy = timezone.localdate()
+    if UsoIADiario.objects.filter(fecha=hoy).update(llamadas_exitosas=F('llamadas_exitosas') + 1):
+        return
+    try:
+        with transaction.atomic():
+            UsoIADiario.objects.create(fecha=hoy, llamadas_exitosas=1)
+    except IntegrityError:
+        # Otro proceso creó la fila del día en paralelo
+        UsoIADiario.objects.filter(fecha=hoy).update(llamadas_exitosas=F('llamadas_exitosas') + 1)
+
+
+def registrar_llamada_sesion(session):
+    """Suma una llamada al contador de la sesión (en la base y en la instancia)"""
+    from asistente.models import ChatSession
+
+    if session:
+        ChatSession.objects.filter(pk=session.pk).update(ai_calls_count=F('ai_calls_count') + 1)
+        session.ai_calls_count += 1
+
+
+def hay_cupo(config, session=None):
+    """Verifica si se pueden hacer más llamadas a la IA"""
+    # Límite por sesión
+    if session and session.ai_calls_count >= config.max_ai_calls_per_session:
+        logger.warning(f"Límite de IA por sesión alcanzado: {session.session_key}")
+        return False
+
+    # Límite diario
+    calls_hoy = llamadas_hoy()
+    if calls_hoy >= config.max_ai_calls_per_day:
+        logger.warning(f"Límite diario de IA alcanzado: {calls_hoy}/{config.max_ai_calls_per_day}")
+        return False
+
+    return True
+
+
+def reconciliar(fecha):
+    """
+    Recalcula el contador de una fecha desde AIUsageLog (rango de created_at
+    del día local, sin castear la columna). Retorna (antes, después).
+    """
+    from asistente.models import AIUsageLog, UsoIADiario
+    from .ai_provider import PROVEEDORES
+
+    sin_cupo = [nombre for nombre, clase in PROVEEDORES.items() if not clase.cuenta_en_cupo]
+    desde = timezone.make_aware(datetime.combine(fecha, time.min))
+    hasta = timezone.make_aware(datetime.combine(fecha + timedelta(days=1), time.min))
+    total = AIUsageLog.objects.filter(
+        created_at__gte=desde, created_at__lt=hasta, exitoso=True,
+    ).exclude(provider__in=sin_cupo).count()
+
+    with transaction.atomic():
+        fila, _ = UsoIADiario.objects.select_for_update().get_or_create(fecha=fecha)
+        antes = fila.llamadas_exitosas
+        if antes != total:
+            fila.llamadas_exitosas = total
+            fila.save(update_fields=['llamadas_exitosas', 'updated_at'])
+    return antes, total
@@ -544,25 +544,28 @@ def _extraer_email(texto):
 
 
 def _enviar_derivacion_email(session, taller, Derivacion, celular='', email_cliente=''):
-    """Envía la derivación por email y registra en BD. Retorna dict de respuesta."""
-    resumen = generar_resumen_email(session)
-    email_ok = enviar_email_derivacion(
-        taller, session, resumen,
-        celular_cliente=celular,
-        email_cliente=email_cliente,
-    )
+    """
+    Registra la derivación en BD y encola el email al taller en la misma
+    transacción (lo envía procesar_emails, que marca email_enviado).
+    Retorna dict de respuesta.
+    """
+    from django.db import transaction
+    from turnero.cola_emails import encolar_email
 
-    # Registrar derivación
-    Derivacion.objects.create(
-        session=session,
-        taller=taller,
-        canal='email',
-        motivo=generar_resumen_conversacion(session),
-        celular_cliente=celular,
-        email_cliente=email_cliente,
-        en_horario=False,
-        email_enviado=email_ok,
-    )
+    resumen = generar_resumen_email(session)
+    with transaction.atomic():
+        derivacion = Derivacion.objects.create(
+            session=session,
+            taller=taller,
+            canal='email',
+            motivo=generar_resumen_conversacion(session),
+            celular_cliente=celular,
+            email_cliente=email_cliente,
+            en_horario=False,
+            email_enviado=False,
+        )
+        email_ok = bool(taller.get_email_operador()) and encolar_email(
+            'derivacion', derivacion_id=derivacion.pk, resumen=resumen)
 
     nombre = taller.get_nombre()
     if email_ok:
@@ -0,0 +1,117 @@
+"""
+Índice en memoria de FAQs aprobadas.
+
+Normaliza una sola vez las palabras clave y las preguntas de las FAQs activas
+y arma un índice invertido (keyword / palabra de la pregunta -> FAQs). Por
+mensaje solo se puntúan las FAQs que comparten alguna clave con el texto.
+
+El índice se reconstruye cuando cambia la versión guardada en el cache de
+Django (se incrementa al guardar/eliminar una FAQ) o, como respaldo para caches
+no compartidos entre workers, cuando supera MAX_EDAD_SEGUNDOS.
+"""
+import time
+import uuid
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from .intents import normalizar_texto, subcadenas_indexadas
+
+CLAVE_VERSION = 'asistente:faq_version'
+MAX_EDAD_SEGUNDOS = 300
+
+
+class IndiceFAQ:
+    """
+    Misma puntuación que recorrer todas las FAQs:
+    +1 por cada palabra clave contenida en el texto y +0.5 por cada palabra
+    (de más de 3 letras) de la pregunta contenida en el texto.
+    """
+
+    def __init__(self, faqs, version=None):
+        self.version = version
+        self.creado = time.monotonic()
+        self.faqs = []  # en el orden del modelo (desempate)
+        self.por_clave = defaultdict(set)  # keyword (o su primera palabra) / palabra -> posiciones
+        self.siempre = set()  # FAQs con keywords vacías (siempre coinciden)
+
+        for posicion, faq in enumerate(faqs):
+            keywords = [normalizar_texto(kw) for kw in (faq.palabras_clave or [])]
+            palabras_pregunta = [p for p in normalizar_texto(faq.pregunta).split() if len(p) > 3]
+            self.faqs.append({
+                'pk': faq.pk,
+                'categoria': faq.categoria,
+                'respuesta_datos': faq.respuesta_datos,
+                'respuesta_humanizada': faq.respuesta_humanizada,
+                'keywords': keywords,
+                'palabras_pregunta': palabras_pregunta,
+            })
+            for kw in keywords:
+                if kw:
+                    self.por_clave[kw.split()[0]].add(posicion)
+                else:
+                    self.siempre.add(posicion)
+            for palabra in palabras_pregunta:
+                self.por_clave[palabra].add(posicion)
+
+        self.largos_clave = sorted({len(clave) for clave in self.por_clave})
+
+    def buscar(self, texto_norm):
+        """Retorna (faq, score) de la mejor FAQ con score >= 1, o (None, 0)"""
+        claves = subcadenas_indexadas(texto_norm.split(), self.por_clave, self.largos_clave)
+        candidatas = set(self.siempre)
+        for clave in claves:
+            candidatas |= self.por_clave[clave]
+
+        mejor_faq = None
+        mejor_score = 0
+        for posicion in sorted(candidatas):
+            faq = self.faqs[posicion]
+            score = 0
+            for kw_norm in faq['keywords']:
+                if kw_norm in texto_norm:
+                    score += 1
+            for palabra in faq['palabras_pregunta']:
+                if palabra in texto_norm:
+                    score += 0.5
+
+            if score > mejor_score and score >= 1:
+                mejor_score = score
+                mejor_faq = faq
+
+        return mejor_faq, mejor_score
+
+
+_indice = None
+
+
+def invalidar_indice_faq():
+    """Marca el índice como desactualizado en todos los procesos que comparten el cache"""
+    global _indice
+    _indice = None
+    cache.set(CLAVE_VERSION, uuid.uuid4().hex, None)
+
+
+def get_indice_faq():
+    """Retorna el índice vigente, reconstruyéndolo si cambió la versión o venció"""
+    from asistente.models import FAQ
+
+    global _indice
+    version = cache.get(CLAVE_VERSION)
+    if (_indice is None or _indice.version != version
+            or time.monotonic() - _indice.creado > MAX_EDAD_SEGUNDOS):
+        faqs = FAQ.objects.filter(aprobada=True, status=True).only(
+            'pk', 'pregunta', 'palabras_clave', 'respuesta_datos',
+            'respuesta_humanizada', 'categoria',
+        )
+        _indice = IndiceFAQ(faqs, version=version)
+    return _indice
+
+
+def buscar_faq(texto_norm):
+    """Busca la FAQ que mejor coincide con el texto normalizado: (faq, score)"""
+    from . import busqueda_postgres
+
+    if busqueda_postgres.habilitada():
+        return busqueda_postgres.buscar_faq(texto_norm)
+    return get_indice_faq().buscar(texto_norm)
@@ -3,6 +3,7 @@ Definición de intenciones (intents) del asistente virtual.
 Cada intent tiene keywords para matching y un handler que resuelve datos.
 """
 import re
+from collections import defaultdict
 from difflib import SequenceMatcher
 
 INTENTS = {
@@ -156,111 +157,252 @@ def _palabra_fuzzy_match(palabra, keyword_palabra, umbral=0.75):
         return True
     if len(palabra) < 4 or len(keyword_palabra) < 4:
         return False
-    return SequenceMatcher(None, palabra, keyword_palabra).ratio() >= umbral
+    matcher = SequenceMatcher(None, palabra, keyword_palabra)
+    # Las cotas rápidas nunca son menores que ratio(): descartan sin calcularlo
+    return (matcher.real_quick_ratio() >= umbral
+            and matcher.quick_ratio() >= umbral
+            and matcher.ratio() >= umbral)
 
 
-def _keyword_fuzzy_en_texto(keyword_norm, texto_normalizado, palabras_texto):
-    """Verifica si un keyword (puede ser multi-palabra) matchea con fuzzy en el texto.
-    Retorna un score: 0 = no match, 0.7 = fuzzy match."""
-    kw_words = keyword_norm.split()
+def _largos_compatibles(largo, umbral=0.75):
+    """
+    Largos de palabra que pueden alcanzar el umbral de similitud con una de
+    `largo` letras: ratio = 2*M/(a+b) con M <= min(a, b).
+    """
+    return [
+        otro for otro in range(1, int(largo * 2 / umbral) + 1)
+        if 2 * min(largo, otro) / (largo + otro) >= umbral
+    ]
 
-    if len(kw_words) == 1:
-        # Keyword de una sola palabra: buscar fuzzy contra cada palabra del texto
-        for palabra in palabras_texto:
-            if _palabra_fuzzy_match(palabra, kw_words[0]):
-                return 0.7
-    else:
-        # Keyword multi-palabra: todas las palabras deben tener fuzzy match
-        matched = 0
-        for kw in kw_words:
-            for palabra in palabras_texto:
-                if _palabra_fuzzy_match(palabra, kw):
-                    matched += 1
-                    break
-        if matched == len(kw_words):
-            return 0.7
 
-    return 0
+def subcadenas_indexadas(palabras, claves, largos):
+    """
+    Retorna las claves (de un dict/set) que aparecen como subcadena de alguna
+    de las palabras. `largos` son los largos de clave existentes. Permite
+    resolver con un índice invertido los matchings del tipo `clave in texto`.
+    """
+    encontradas = {''} if '' in claves else set()
+    for palabra in palabras:
+        for largo in largos:
+            if largo == 0 or largo > len(palabra):
+                continue
+            for inicio in range(len(palabra) - largo + 1):
+                sub = palabra[inicio:inicio + largo]
+                if sub in claves:
+                    encontradas.add(sub)
+    return encontradas
 
 
-def detectar_intent_por_keywords(texto):
+class IndiceIntents:
     """
-    Detecta el intent más probable basado en keywords.
-    Usa matching exacto primero, y fuzzy matching como fallback para typos.
-    Retorna (intent_name, confidence) o (None, 0)
+    Índice compilado de INTENTS para clasificar mensajes.
+
+    Normaliza keywords y negative_keywords una sola vez y arma:
+    - un índice invertido keyword (o primera palabra de una keyword
+      multi-palabra) -> keywords, consultado con las subcadenas de las
+      palabras del mensaje (el matching original es por substring);
+    - el vocabulario de palabras de keywords agrupado por largo, para buscar
+      candidatos fuzzy solo entre palabras de largo compatible;
+    - los sets de negative_keywords normalizadas por intent.
+
+    Las keywords que no aparecen como candidatas puntúan 0, por lo que el
+    resultado es el mismo que recorrer todo el catálogo, pero el costo por
+    mensaje depende del largo del mensaje y no de la cantidad de keywords.
     """
-    texto_normalizado = normalizar_texto(texto)
-    palabras_texto = set(texto_normalizado.split())
-    mejor_intent = None
-    mejor_score = 0
 
-    for intent_name, intent_data in INTENTS.items():
-        score = 0
-        for keyword in intent_data['keywords']:
-            keyword_norm = normalizar_texto(keyword)
+    # Máximo de palabras con vecinos fuzzy memorizados
+    MAX_VECINOS = 10000
+
+    def __init__(self, intents):
+        self.orden = {nombre: i for i, nombre in enumerate(intents)}
+        self.tipos = {nombre: data.get('tipo') for nombre, data in intents.items()}
+        self.keywords = []  # (intent, norm, palabras)
+        self.por_clave = defaultdict(list)  # keyword o primera palabra -> ids
+        self.negativas = {}  # intent -> [(norm, palabras)]
+        self.vocabulario = defaultdict(set)  # largo -> palabras de 4+ letras
+        self._vecinos = {}
+
+        for nombre, data in intents.items():
+            for keyword in data['keywords']:
+                norm = normalizar_texto(keyword)
+                palabras = tuple(norm.split())
+                self.por_clave[palabras[0] if palabras else ''].append(len(self.keywords))
+                self.keywords.append((nombre, norm, palabras))
+                self._agregar_vocabulario(palabras)
+            negativas = []
+            for neg in data.get('negative_keywords', []):
+                neg_norm = normalizar_texto(neg)
+                negativas.append((neg_norm, tuple(neg_norm.split())))
+                self._agregar_vocabulario(neg_norm.split())
+            if negativas:
+                self.negativas[nombre] = negativas
+
+        self.largos_clave = sorted({len(clave) for clave in self.por_clave})
+
+    def _agregar_vocabulario(self, palabras):
+        for palabra in palabras:
+            if len(palabra) >= 4:
+                self.vocabulario[len(palabra)].add(palabra)
+
+    def _subcadenas(self, palabras_texto):
+        """Subcadenas de las palabras del mensaje que son claves del índice"""
+        return subcadenas_indexadas(palabras_texto, self.por_clave, self.largos_clave)
+
+    def vecinos(self, palabra):
+        """Palabras del vocabulario que matchean fuzzy con `palabra` (incluida ella misma)"""
+        vecinos = self._vecinos.get(palabra)
+        if vecinos is None:
+            vecinos = {palabra}
+            if len(palabra) >= 4:
+                for largo in _largos_compatibles(len(palabra)):
+                    for candidata in self.vocabulario.get(largo, ()):
+                        if _palabra_fuzzy_match(palabra, candidata):
+                            vecinos.add(candidata)
+            if len(self._vecinos) >= self.MAX_VECINOS:
+                self._vecinos.clear()
+            self._vecinos[palabra] = vecinos
+        return vecinos
+
+    def _candidatas(self, claves, intents=None):
+        """Ids de keywords indexadas bajo alguna de las claves, en orden de catálogo"""
+        ids = set()
+        for clave in claves:
+            ids.update(self.por_clave.get(clave, ()))
+        if intents is not None:
+            ids = {i for i in ids if self.keywords[i][0] in intents}
+        return sorted(ids)
+
+    def _mejor(self, scores):
+        # Mismo desempate que recorrer INTENTS en orden: gana el primero con mayor score
+        mejor_intent = None
+        mejor_score = 0
+        for intent in sorted(scores, key=self.orden.get):
+            if scores[intent] > mejor_score:
+                mejor_score = scores[intent]
+                mejor_intent = intent
+        confidence = min(mejor_score / 3.0, 1.0) if mejor_score > 0 else 0
+        return mejor_intent, confidence
+
+    def detectar(self, texto):
+        """Ver detectar_intent_por_keywords"""
+        texto_normalizado = normalizar_texto(texto)
+        palabras_texto = set(texto_normalizado.split())
+        # Palabras de keywords alcanzables con fuzzy desde alguna palabra del mensaje
+        alcanzables = set()
+        for palabra in palabras_texto:
+            alcanzables |= self.vecinos(palabra)
+
+        def fuzzy(palabras_kw):
+            return bool(palabras_kw) and all(kw in alcanzables for kw in palabras_kw)
+
+        scores = defaultdict(float)
+        claves = self._subcadenas(palabras_texto) | alcanzables
+        for i in self._candidatas(claves):
+            intent, keyword_norm, kw_palabras = self.keywords[i]
+            score = 0
 
             if ' ' in keyword_norm:
                 # --- Keyword MULTI-PALABRA ---
                 # Match exacto de substring
                 if keyword_norm in texto_normalizado:
                     if texto_normalizado == keyword_norm:
-                        score += 3
+                        score = 3
                     elif texto_normalizado.startswith(keyword_norm):
-                        score += 2
+                        score = 2
                     else:
-                        score += 1
-                else:
+                        score = 1
+                elif set(kw_palabras) <= palabras_texto:
                     # Match por palabras individuales
-                    kw_words = set(keyword_norm.split())
-                    matches = kw_words & palabras_texto
-                    if len(matches) == len(kw_words):
-                        score += 1.5
+                    score = 1.5
+                elif fuzzy(kw_palabras):
+                    score = 0.7
+            elif len(keyword_norm) <= 3:
+                # Keywords cortas (hi, hey, bye, rtv, rto, vtv):
+                # solo word match exacto (evitar 'hi' en 'chiste', 'vehicular')
+                if keyword_norm in palabras_texto:
+                    if texto_normalizado == keyword_norm:
+                        score = 3
+                    elif len(palabras_texto) <= 2:
+                        score = 2
                     else:
-                        fuzzy_score = _keyword_fuzzy_en_texto(keyword_norm, texto_normalizado, palabras_texto)
-                        if fuzzy_score > 0:
-                            score += fuzzy_score
-            else:
-                # --- Keyword UNA SOLA PALABRA ---
-                if len(keyword_norm) <= 3:
-                    # Keywords cortas (hi, hey, bye, rtv, rto, vtv):
-                    # solo word match exacto (evitar 'hi' en 'chiste', 'vehicular')
-                    if keyword_norm in palabras_texto:
-                        if texto_normalizado == keyword_norm:
-                            score += 3
-                        elif len(palabras_texto) <= 2:
-                            score += 2
-                        else:
-                            score += 1
+                        score = 1
+            elif keyword_norm in texto_normalizado:
+                # Keywords largas (4+ chars): substring match
+                if texto_normalizado == keyword_norm:
+                    score = 3
+                elif texto_normalizado.startswith(keyword_norm):
+                    score = 2
                 else:
-                    # Keywords largas (4+ chars): substring match
-                    if keyword_norm in texto_normalizado:
-                        if texto_normalizado == keyword_norm:
-                            score += 3
-                        elif texto_normalizado.startswith(keyword_norm):
-                            score += 2
-                        else:
-                            score += 1
-                    else:
-                        fuzzy_score = _keyword_fuzzy_en_texto(keyword_norm, texto_normalizado, palabras_texto)
-                        if fuzzy_score > 0:
-                            score += fuzzy_score
+                    score = 1
+            elif fuzzy(kw_palabras):
+                score = 0.7
+
+            if score:
+                scores[intent] += score
 
         # Penalizar por negative_keywords (desambiguación)
         # Incluye fuzzy matching para que typos como "cncelar" penalicen igual que "cancelar"
-        if score > 0 and 'negative_keywords' in intent_data:
-            for neg_kw in intent_data['negative_keywords']:
-                neg_norm = normalizar_texto(neg_kw)
-                if neg_norm in palabras_texto or neg_norm in texto_normalizado:
-                    score = 0
-                    break
-                # Fuzzy match en negative_keywords (typos)
-                if _keyword_fuzzy_en_texto(neg_norm, texto_normalizado, palabras_texto) > 0:
-                    score = 0
+        for intent in list(scores):
+            for neg_norm, neg_palabras in self.negativas.get(intent, ()):
+                if neg_norm in palabras_texto or neg_norm in texto_normalizado or fuzzy(neg_palabras):
+                    scores[intent] = 0
                     break
 
-        if score > mejor_score:
-            mejor_score = score
-            mejor_intent = intent_name
+        return self._mejor(scores)
+
+    def detectar_db(self, texto):
+        """Ver detectar_mejor_intent_db"""
+        texto_normalizado = normalizar_texto(texto)
+        palabras_texto = set(texto_normalizado.split())
+        intents_db = {nombre for nombre, tipo in self.tipos.items() if tipo == 'db'}
+
+        scores = defaultdict(float)
+        for i in self._candidatas(self._subcadenas(palabras_texto), intents_db):
+            intent, keyword_norm, kw_palabras = self.keywords[i]
+            if keyword_norm in texto_normalizado:
+                if texto_normalizado == keyword_norm:
+                    scores[intent] += 3
+                elif texto_normalizado.startswith(keyword_norm):
+                    scores[intent] += 2
+                else:
+                    scores[intent] += 1
+            elif ' ' in keyword_norm and set(kw_palabras) <= palabras_texto:
+                scores[intent] += 1.5
+
+        return self._mejor(scores)
+
+
+_indice = None
+
+
+def get_indice_intents():
+    """Retorna el índice compilado de INTENTS (se arma en el primer uso)"""
+    global _indice
+    if _indice is None:
+        _indice = IndiceIntents(INTENTS)
+    return _indice
+
+
+def recompilar_indice_intents():
+    """Vuelve a compilar el índice. Llamar después de modificar INTENTS."""
+    global _indice
+    _indice = IndiceIntents(INTENTS)
+    return _indice
 
-    confidence = min(mejor_score / 3.0, 1.0) if mejor_score > 0 else 0
-    return mejor_intent, confidence
+
+def detectar_intent_por_keywords(texto):
+    """
+    Detecta el intent más probable basado en keywords.
+    Usa matching exacto primero, y fuzzy matching como fallback para typos.
+    Retorna (intent_name, confidence) o (None, 0)
+    """
+    return get_indice_intents().detectar(texto)
+
+
+def detectar_mejor_intent_db(texto):
+    """
+    Detecta el mejor intent de tipo 'db' ignorando los fijos (saludo, etc),
+    solo con matching exacto (sin fuzzy ni negative_keywords).
+    Retorna (intent_name, confidence) o (None, 0)
+    """
+    return get_indice_intents().detectar_db(texto)
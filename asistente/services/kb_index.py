@@ -0,0 +1,193 @@
+"""
+Índice BM25 en memoria sobre los fragmentos (párrafos) de la Base de Conocimiento.
+
+Los documentos se dividen en FragmentoKB al procesarlos, con la frecuencia de
+cada término ya normalizada. Este módulo arma con esas filas un índice
+invertido (término -> fragmentos) sin leer el texto completo: por consulta se
+recorren solo las listas de los términos buscados y se traen de la base los
+textos de los fragmentos elegidos.
+
+Un término de la consulta coincide con los términos del índice que empiezan
+con él ('turno' -> 'turno', 'turnos'), que es lo que aportaba la búsqueda por
+substring sobre el contenido.
+
+Igual que el índice de FAQs, se reconstruye cuando cambia la versión guardada
+en el cache de Django o cuando supera MAX_EDAD_SEGUNDOS.
+"""
+import bisect
+import math
+import time
+import uuid
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from .intents import normalizar_texto
+
+CLAVE_VERSION = 'asistente:kb_version'
+MAX_EDAD_SEGUNDOS = 300
+
+# Parámetros BM25 habituales
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Relevancia mínima para que un documento entre en los resultados (ver IndiceKB.buscar)
+RELEVANCIA_MINIMA = 2
+
+
+def bonus_documento(palabras_consulta, titulo_norm, keywords_doc):
+    """+2 por palabra que coincide con una keyword del documento y +2 por palabra en su título"""
+    bonus = 0
+    for palabra in palabras_consulta:
+        if any(palabra in kw or kw in palabra for kw in keywords_doc):
+            bonus += 2
+        if palabra in titulo_norm:
+            bonus += 2
+    return bonus
+
+
+class IndiceKB:
+    """
+    documentos: filas (pk, titulo, palabras_clave) de los DocumentoKB activos.
+    fragmentos: filas (pk, documento_id, orden, terminos, largo) de sus FragmentoKB.
+    """
+
+    def __init__(self, documentos, fragmentos, version=None):
+        self.version = version
+        self.creado = time.monotonic()
+        self.titulos = {}  # doc -> título normalizado
+        self.keywords = {}  # doc -> keywords normalizadas
+        for pk, titulo, palabras_clave in documentos:
+            self.titulos[pk] = normalizar_texto(titulo) if titulo else ''
+            self.keywords[pk] = [normalizar_texto(kw) for kw in (palabras_clave or [])]
+
+        self.fragmentos = []  # posición -> (pk, documento_id)
+        self.largos = []
+        self.primer_fragmento = {}  # doc -> (orden, pk)
+        self.postings = defaultdict(list)  # término -> [(posición, frecuencia)]
+        for pk, documento_id, orden, terminos, largo in fragmentos:
+            if documento_id not in self.titulos:
+                continue
+            posicion = len(self.fragmentos)
+            self.fragmentos.append((pk, documento_id))
+            self.largos.append(largo)
+            if (documento_id not in self.primer_fragmento
+                    or orden < self.primer_fragmento[documento_id][0]):
+                self.primer_fragmento[documento_id] = (orden, pk)
+            for termino, frecuencia in (terminos or {}).items():
+                self.postings[termino].append((posicion, frecuencia))
+
+        self.vocabulario = sorted(self.postings)
+        total = len(self.fragmentos)
+        self.largo_promedio = (sum(self.largos) / total) if total else 0
+        self.idf = {
+            termino: math.log(1 + (total - len(lista) + 0.5) / (len(lista) + 0.5))
+            for termino, lista in self.postings.items()
+        }
+
+    def expandir(self, palabra):
+        """Términos del índice que empiezan con la palabra"""
+        inicio = bisect.bisect_left(self.vocabulario, palabra)
+        terminos = []
+        for termino in self.vocabulario[inicio:]:
+            if not termino.startswith(palabra):
+                break
+            terminos.append(termino)
+        return terminos
+
+    def puntuar_fragmentos(self, palabras_consulta):
+        """
+        Retorna ({posición: score BM25}, {doc: palabras de la consulta presentes
+        en su contenido}). Por cada palabra de la consulta cuenta el término
+        expandido que más aporta, así 'turno' no suma dos veces en un párrafo
+        que dice 'turno' y 'turnos'.
+        """
+        scores = defaultdict(float)
+        en_contenido = defaultdict(set)
+        for palabra in palabras_consulta:
+            aportes = {}
+            for termino in self.expandir(palabra):
+                idf = self.idf[termino]
+                for posicion, frecuencia in self.postings[termino]:
+                    norma = 1 - BM25_B + BM25_B * self.largos[posicion] / (self.largo_promedio or 1)
+                    aporte = idf * frecuencia * (BM25_K1 + 1) / (frecuencia + BM25_K1 * norma)
+                    if aporte > aportes.get(posicion, 0):
+                        aportes[posicion] = aporte
+            for posicion, aporte in aportes.items():
+                scores[posicion] += aporte
+                en_contenido[self.fragmentos[posicion][1]].add(palabra)
+        return scores, en_contenido
+
+    def buscar(self, palabras_consulta, max_resultados=3):
+        """
+        Retorna hasta max_resultados dicts {'doc_id', 'score', 'fragmentos'}
+        (pks de FragmentoKB, del más al menos relevante).
+
+        Mantiene el umbral de relevancia de la búsqueda original: +2 por palabra
+        que coincide con una keyword, +2 por palabra en el título y +1 por
+        palabra en el contenido; el documento entra con 2 o más. El orden
+        final es ese puntaje de título/keywords más el mejor BM25 del documento.
+        """
+        scores, en_contenido = self.puntuar_fragmentos(palabras_consulta)
+
+        por_documento = defaultdict(list)
+        for posicion, score in scores.items():
+            pk, documento_id = self.fragmentos[posicion]
+            por_documento[documento_id].append((score, pk))
+
+        resultados = []
+        for documento_id, titulo_norm in self.titulos.items():
+            bonus = bonus_documento(palabras_consulta, titulo_norm, self.keywords[documento_id])
+            relevancia = bonus + len(en_contenido.get(documento_id, ()))
+            if relevancia < RELEVANCIA_MINIMA:
+                continue
+
+            fragmentos = sorted(por_documento.get(documento_id, []), reverse=True)
+            if fragmentos:
+                pks = [pk for _, pk in fragmentos]
+                score = bonus + fragmentos[0][0]
+            elif documento_id in self.primer_fragmento:
+                # Sin match en el contenido: se usa el primer párrafo
+                pks = [self.primer_fragmento[documento_id][1]]
+                score = bonus
+            else:
+                continue
+            resultados.append({'doc_id': documento_id, 'score': score, 'fragmentos': pks})
+
+        resultados.sort(key=lambda r: r['score'], reverse=True)
+        return resultados[:max_resultados]
+
+
+_indice = None
+
+
+def invalidar_indice_kb():
+    """Marca el índice como desactualizado en todos los procesos que comparten el cache"""
+    global _indice
+    _indice = None
+    cache.set(CLAVE_VERSION, uuid.uuid4().hex, None)
+
+
+def get_indice_kb():
+    """Retorna el índice vigente, reconstruyéndolo si cambió la versión o venció"""
+    from asistente.models import DocumentoKB, FragmentoKB
+
+    global _indice
+    version = cache.get(CLAVE_VERSION)
+    if (_indice is None or _indice.version != version
+            or time.monotonic() - _indice.creado > MAX_EDAD_SEGUNDOS):
+        # Documentos cargados antes de existir los fragmentos
+        pendientes = DocumentoKB.objects.filter(activo=True, fragmentos__isnull=True).exclude(contenido_texto='')
+        if pendientes.exists():
+            from .kb_service import fragmentar_documento
+
+            for documento in pendientes:
+                fragmentar_documento(documento)
+            version = cache.get(CLAVE_VERSION)
+
+        documentos = DocumentoKB.objects.filter(activo=True).values_list('pk', 'titulo', 'palabras_clave')
+        fragmentos = FragmentoKB.objects.filter(documento__activo=True).values_list(
+            'pk', 'documento_id', 'orden', 'terminos', 'largo',
+        )
+        _indice = IndiceKB(documentos, fragmentos.iterator(), version=version)
+    return _indice
@@ -44,6 +44,51 @@ def procesar_documento(documento):
         documento.palabras_clave = generar_palabras_clave(texto_para_keywords)
 
     documento.save()
+    fragmentar_documento(documento)
+
+
+def dividir_parrafos(texto):
+    """Divide el texto en párrafos (doble salto o línea individual) de más de 20 caracteres"""
+    parrafos = re.split(r'\n\s*\n|\n', texto)
+    return [p.strip() for p in parrafos if p.strip() and len(p.strip()) > 20]
+
+
+def terminos_de(texto):
+    """Términos normalizados de un texto, sin stopwords ni palabras muy cortas"""
+    return [p for p in normalizar_texto(texto).split() if p not in STOPWORDS_ES and len(p) > 2]
+
+
+def fragmentar_documento(documento):
+    """
+    Regenera los FragmentoKB del documento: un fragmento por párrafo con la
+    frecuencia de sus términos ya calculada (índice BM25, ver kb_index).
+    Un texto sin párrafos largos queda como un único fragmento.
+    """
+    from asistente.models import FragmentoKB
+    from . import busqueda_postgres
+    from .kb_index import invalidar_indice_kb
+
+    texto = documento.contenido_texto or ''
+    parrafos = dividir_parrafos(texto)
+    if not parrafos and texto.strip():
+        parrafos = [texto.strip()]
+
+    fragmentos = []
+    for orden, parrafo in enumerate(parrafos):
+        terminos = terminos_de(parrafo)
+        fragmentos.append(FragmentoKB(
+            documento=documento,
+            orden=orden,
+            texto=parrafo,
+            terminos=dict(Counter(terminos)),
+            largo=len(terminos),
+        ))
+
+    FragmentoKB.objects.filter(documento=documento).delete()
+    FragmentoKB.objects.bulk_create(fragmentos)
+    invalidar_indice_kb()
+    if busqueda_postgres.habilitada():
+        busqueda_postgres.actualizar_vectores_documento(documento)
 
 
 def _extraer_texto_archivo(archivo_field):
@@ -148,62 +193,40 @@ def buscar_en_kb(consulta, max_resultados=3):
     """
     Busca documentos relevantes en la KB para una consulta del cliente.
     Retorna lista de dicts: [{'titulo': str, 'texto': str, 'doc_id': int}, ...]
+    Los fragmentos salen del índice BM25 (kb_index) o, con el backend
+    'postgres', del full-text search de la base; solo se leen los textos de
+    los párrafos elegidos.
     """
-    from asistente.models import DocumentoKB
-
-    documentos = DocumentoKB.objects.filter(activo=True)
-    if not documentos.exists():
-        return []
-
-    consulta_norm = normalizar_texto(consulta)
-    palabras_consulta = [
-        p for p in consulta_norm.split()
-        if p not in STOPWORDS_ES and len(p) > 2
-    ]
+    from asistente.models import DocumentoKB, FragmentoKB
+    from . import busqueda_postgres
+    from .kb_index import get_indice_kb
 
+    palabras_consulta = terminos_de(consulta)
     if not palabras_consulta:
         return []
 
-    resultados = []
-
-    for doc in documentos:
-        score = 0
+    if busqueda_postgres.habilitada():
+        encontrados = busqueda_postgres.buscar_fragmentos_kb(palabras_consulta, max_resultados)
+    else:
+        encontrados = get_indice_kb().buscar(palabras_consulta, max_resultados)
+    if not encontrados:
+        return []
 
-        # Scoring por keywords del documento
-        keywords_doc = [normalizar_texto(kw) for kw in (doc.palabras_clave or [])]
-        for palabra in palabras_consulta:
-            for kw in keywords_doc:
-                if palabra in kw or kw in palabra:
-                    score += 2
-                    break
+    pks = [pk for r in encontrados for pk in r['fragmentos']]
+    textos = dict(FragmentoKB.objects.filter(pk__in=pks).values_list('pk', 'texto'))
+    titulos = dict(DocumentoKB.objects.filter(
+        pk__in=[r['doc_id'] for r in encontrados]).values_list('pk', 'titulo'))
 
-        # Scoring por título del documento
-        titulo_norm = normalizar_texto(doc.titulo) if doc.titulo else ''
-        for palabra in palabras_consulta:
-            if palabra in titulo_norm:
-                score += 2
-
-        # Scoring por contenido (búsqueda en texto completo)
-        contenido_norm = normalizar_texto(doc.contenido_texto) if doc.contenido_texto else ''
-        for palabra in palabras_consulta:
-            if palabra in contenido_norm:
-                score += 1
-
-        if score >= 2:  # Umbral mínimo de relevancia
-            fragmento = extraer_fragmento_relevante(
-                doc.contenido_texto, palabras_consulta
-            )
-            if fragmento:
-                resultados.append({
-                    'titulo': doc.titulo,
-                    'texto': fragmento,
-                    'doc_id': doc.pk,
-                    'score': score,
-                })
-
-    # Ordenar por score y tomar los mejores
-    resultados.sort(key=lambda x: x['score'], reverse=True)
-    resultados = resultados[:max_resultados]
+    resultados = []
+    for r in encontrados:
+        fragmento = armar_fragmento([textos[pk] for pk in r['fragmentos'] if pk in textos])
+        if fragmento and r['doc_id'] in titulos:
+            resultados.append({
+                'titulo': titulos[r['doc_id']],
+                'texto': fragmento,
+                'doc_id': r['doc_id'],
+                'score': r['score'],
+            })
 
     # Incrementar veces_usado
     if resultados:
@@ -224,9 +247,7 @@ def extraer_fragmento_relevante(texto_completo, palabras_consulta, max_chars=800
     if not texto_completo:
         return ''
 
-    # Dividir en párrafos (por doble salto de línea o por líneas individuales)
-    parrafos = re.split(r'\n\s*\n|\n', texto_completo)
-    parrafos = [p.strip() for p in parrafos if p.strip() and len(p.strip()) > 20]
+    parrafos = dividir_parrafos(texto_completo)
 
     if not parrafos:
         return texto_completo[:max_chars]
@@ -248,10 +269,13 @@ def extraer_fragmento_relevante(texto_completo, palabras_consulta, max_chars=800
 
     # Ordenar por score descendente
     mejores.sort(key=lambda x: x[0], reverse=True)
+    return armar_fragmento([parrafo for _, parrafo in mejores], max_chars)
 
-    # Combinar los mejores párrafos hasta llenar max_chars
+
+def armar_fragmento(parrafos, max_chars=800):
+    """Combina los párrafos (ya ordenados por relevancia) hasta llenar max_chars"""
     fragmento = ''
-    for _, parrafo in mejores:
+    for parrafo in parrafos:
         if len(fragmento) + len(parrafo) + 2 <= max_chars:
             fragmento += parrafo + '\n\n'
         else:
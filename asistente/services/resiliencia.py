@@ -0,0 +1,265 @@
+"""
+Capa de resiliencia para los proveedores de IA.
+
+ProveedorResiliente envuelve al cliente que retorna get_ai_client y agrega:
+- deadline por llamada: config.timeout_seconds cubre todos los intentos;
+- reintentos acotados (MAX_REINTENTOS) con backoff exponencial y jitter,
+  solo si queda tiempo dentro del deadline;
+- circuit breaker: tras UMBRAL_FALLOS llamadas fallidas consecutivas se abre
+  por SEGUNDOS_ABIERTO y las llamadas fallan al instante (el humanizer cae a
+  los datos del resolver sin IA). Pasado ese tiempo se deja pasar una sola
+  llamada de prueba: si funciona se cierra, si no se vuelve a abrir.
+
+El estado del breaker y un histograma de latencias del día viven en el cache
+de Django (compartido entre workers con Redis/Memcached) y se muestran en la
+página de Uso IA del panel (ver estadisticas()).
+"""
+import asyncio
+import logging
+import random
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MAX_REINTENTOS = 2
+BACKOFF_BASE_SEGUNDOS = 0.25
+BACKOFF_MAX_SEGUNDOS = 2.0
+UMBRAL_FALLOS = 5
+SEGUNDOS_ABIERTO = 30
+
+# Límites superiores (ms) de los buckets del histograma; el último es "más de"
+BUCKETS_LATENCIA_MS = (250, 500, 1000, 2000, 5000, 10000)
+
+CLAVE_FALLOS = 'asistente:ia:fallos_consecutivos'
+CLAVE_ABIERTO_HASTA = 'asistente:ia:abierto_hasta'
+CLAVE_SONDA = 'asistente:ia:sonda'
+ERROR_CIRCUITO_ABIERTO = 'Circuito abierto: IA omitida temporalmente'
+
+
+# ── Circuit breaker ──
+
+def circuito_abierto():
+    """True si la IA está en pausa; deja pasar una única llamada de prueba al vencer la pausa"""
+    abierto_hasta = cache.get(CLAVE_ABIERTO_HASTA)
+    if not abierto_hasta:
+        return False
+    if time.time() < abierto_hasta:
+        return True
+    # Semiabierto: solo un proceso prueba la IA (add es atómico)
+    return not cache.add(CLAVE_SONDA, 1, SEGUNDOS_ABIERTO)
+
+
+def _registrar_exito():
+    cache.delete_many([CLAVE_FALLOS, CLAVE_ABIERTO_HASTA, CLAVE_SONDA])
+
+
+def _registrar_fallo():
+    cache.add(CLAVE_FALLOS, 0, None)
+    try:
+        fallos = cache.incr(CLAVE_FALLOS)
+    except ValueError:
+        fallos = 1
+        cache.set(CLAVE_FALLOS, fallos, None)
+    if fallos >= UMBRAL_FALLOS:
+        cache.set(CLAVE_ABIERTO_HASTA, time.time() + SEGUNDOS_ABIERTO, None)
+        cache.delete(CLAVE_SONDA)
+        logger.warning(f"Circuit breaker de IA abierto por {SEGUNDOS_ABIERTO}s ({fallos} fallos seguidos)")
+
+
+# ── Métricas ──
+
+def _clave_metrica(nombre, fecha=None):
+    fecha = fecha or timezone.localdate()
+    return f'asistente:ia:{fecha:%Y%m%d}:{nombre}'
+
+
+def _incrementar(nombre):
+    clave = _clave_metrica(nombre)
+    cache.add(clave, 0, 2 * 24 * 3600)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        pass
+
+
+def _bucket_latencia(latencia_ms):
+    for limite in BUCKETS_LATENCIA_MS:
+        if latencia_ms <= limite:
+            return f'le_{limite}'
+    return f'gt_{BUCKETS_LATENCIA_MS[-1]}'
+
+
+def _registrar_metricas(result, intentos):
+    _incrementar('ok' if result['exitoso'] else 'error')
+    _incrementar(_bucket_latencia(result['latencia_ms']))
+    if intentos > 1:
+        _incrementar('reintentos')
+
+
+def estadisticas(fecha=None):
+    """Estado del breaker e histograma de latencias del día, para el panel"""
+    nombres = ['ok', 'error', 'reintentos', 'cortocircuitos']
+    buckets = [f'le_{limite}' for limite in BUCKETS_LATENCIA_MS] + [f'gt_{BUCKETS_LATENCIA_MS[-1]}']
+    valores = cache.get_many([_clave_metrica(n, fecha) for n in nombres + buckets])
+    valor = lambda n: valores.get(_clave_metrica(n, fecha), 0)  # noqa: E731
+
+    abierto_hasta = cache.get(CLAVE_ABIERTO_HASTA)
+    if not abierto_hasta:
+        estado = 'cerrado'
+    elif time.time() < abierto_hasta:
+        estado = 'abierto'
+    else:
+        estado = 'semiabierto'
+
+    etiquetas = [f'≤ {limite} ms' for limite in BUCKETS_LATENCIA_MS] + [f'> {BUCKETS_LATENCIA_MS[-1]} ms']
+    return {
+        'estado': estado,
+        'fallos_consecutivos': cache.get(CLAVE_FALLOS, 0),
+        'segundos_para_reintentar': max(int(abierto_hasta - time.time()), 0) if abierto_hasta else 0,
+        'ok': valor('ok'),
+        'error': valor('error'),
+        'reintentos': valor('reintentos'),
+        'cortocircuitos': valor('cortocircuitos'),
+        'histograma': [(etiqueta, valor(b)) for etiqueta, b in zip(etiquetas, buckets)],
+    }
+
+
+# ── Wrapper ──
+
+def _espera_reintento(intento):
+    """Backoff exponencial con jitter (full jitter entre 50% y 100%)"""
+    espera = min(BACKOFF_MAX_SEGUNDOS, BACKOFF_BASE_SEGUNDOS * (2 ** intento))
+    return espera * random.uniform(0.5, 1.0)
+
+
+class ProveedorResiliente:
+    """
+    Misma interfaz que el proveedor envuelto (generate_response,
+    generate_response_async, stream_response_async, ...). Cada llamada
+    registra un único AIUsageLog con el resultado final, no uno por intento.
+    """
+
+    def __init__(self, proveedor, config):
+        self.proveedor = proveedor
+        self.config = config
+        self.deadline_segundos = max(config.timeout_seconds or 10, 1)
+
+    def __getattr__(self, nombre):
+        return getattr(self.proveedor, nombre)
+
+    def _cortocircuito(self):
+        _incrementar('cortocircuitos')
+        result = self.proveedor._resultado_vacio()
+        result['error'] = ERROR_CIRCUITO_ABIERTO
+        return result
+
+    def _cerrar_llamada(self, result, intentos, context):
+        _registrar_metricas(result, intentos)
+        if result['exitoso']:
+            _registrar_exito()
+        else:
+            _registrar_fallo()
+        self.proveedor.registrar_uso(result, context)
+
+    def generate_response(self, prompt, context=None):
+        if circuito_abierto():
+            return self._cortocircuito()
+
+        inicio = time.monotonic()
+        intentos = 0
+        while True:
+            restante = self.deadline_segundos - (time.monotonic() - inicio)
+            intentos += 1
+            result = self.proveedor.generate_response(prompt, context, timeout=restante, registrar=False)
+            if result['exitoso'] or intentos > MAX_REINTENTOS:
+                break
+            espera = _espera_reintento(intentos - 1)
+            if time.monotonic() - inicio + espera >= self.deadline_segundos:
+                break
+            time.sleep(espera)
+
+        result['latencia_ms'] = int((time.monotonic() - inicio) * 1000)
+        self._cerrar_llamada(result, intentos, context)
+        return result
+
+    async def generate_response_async(self, prompt, context=None):
+        from asgiref.sync import sync_to_async
+
+        if await sync_to_async(circuito_abierto)():
+            return await sync_to_async(self._cortocircuito)()
+
+        inicio = time.monotonic()
+        intentos = 0
+        while True:
+            restante = self.deadline_segundos - (time.monotonic() - inicio)
+            intentos += 1
+            try:
+                result = await asyncio.wait_for(
+                    self.proveedor.generate_response_async(prompt, context, timeout=restante, registrar=False),
+                    timeout=restante,
+                )
+            except TimeoutError:
+                result = self.proveedor._resultado_vacio()
+                result['error'] = f'Timeout ({self.deadline_segundos}s)'
+            if result['exitoso'] or intentos > MAX_REINTENTOS:
+                break
+            espera = _espera_reintento(intentos - 1)
+            if time.monotonic() - inicio + espera >= self.deadline_segundos:
+                break
+            await asyncio.sleep(espera)
+
+        result['latencia_ms'] = int((time.monotonic() - inicio) * 1000)
+        await sync_to_async(self._cerrar_llamada)(result, intentos, context)
+        return result
+
+    async def stream_response_async(self, prompt, context=None, result=None):
+        """
+        Streaming con el mismo deadline. Solo se reintenta si el intento falló
+        antes de emitir texto (lo ya enviado al cliente no se puede deshacer).
+        Cada fragmento se pide con su propio wait_for y se emite fuera de él: el
+        tiempo que el consumidor tarda en procesarlo cuenta para el deadline,
+        pero el vencimiento siempre llega como TimeoutError (nunca como
+        CancelledError en la tarea del consumidor).
+        """
+        from asgiref.sync import sync_to_async
+
+        if result is None:
+            result = {}
+        if await sync_to_async(circuito_abierto)():
+            result.update(await sync_to_async(self._cortocircuito)())
+            return
+
+        inicio = time.monotonic()
+        intentos = 0
+        while True:
+            restante = self.deadline_segundos - (time.monotonic() - inicio)
+            intentos += 1
+            emitido = False
+            fragmentos = self.proveedor.stream_response_async(
+                prompt, context, result, timeout=restante, registrar=False)
+            try:
+                while True:
+                    restante = self.deadline_segundos - (time.monotonic() - inicio)
+                    try:
+                        texto = await asyncio.wait_for(anext(fragmentos), timeout=max(restante, 0))
+                    except StopAsyncIteration:
+                        break
+                    emitido = True
+                    yield texto
+            except TimeoutError:
+                result.update(self.proveedor._resultado_vacio())
+                result['error'] = f'Timeout ({self.deadline_segundos}s)'
+            finally:
+                await fragmentos.aclose()
+            if result['exitoso'] or emitido or intentos > MAX_REINTENTOS:
+                break
+            espera = _espera_reintento(intentos - 1)
+            if time.monotonic() - inicio + espera >= self.deadline_segundos:
+                break
+            await asyncio.sleep(espera)
+
+        result['latencia_ms'] = int((time.monotonic() - inicio) * 1000)
+        await sync_to_async(self._cerrar_llamada)(result, intentos, context)
@@ -10,7 +10,7 @@ from typing import Optional
 
 from .intents import (
     INTENTS, RESPUESTAS_FIJAS,
-    detectar_intent_por_keywords, normalizar_texto,
+    detectar_intent_por_keywords, detectar_mejor_intent_db, normalizar_texto,
 )
 
 
@@ -200,88 +200,39 @@ def _detectar_mejor_intent_db(texto):
     Detecta el mejor intent de tipo 'db' ignorando los fijos (saludo, etc).
     Se usa cuando el mensaje parece compuesto ("Hola, cuánto cuesta...")
     """
-    texto_normalizado = normalizar_texto(texto)
-    palabras_texto = set(texto_normalizado.split())
-    mejor_intent = None
-    mejor_score = 0
-
-    for intent_name, intent_data in INTENTS.items():
-        if intent_data.get('tipo') != 'db':
-            continue
-        score = 0
-        for keyword in intent_data['keywords']:
-            keyword_norm = normalizar_texto(keyword)
-
-            if keyword_norm in texto_normalizado:
-                if texto_normalizado == keyword_norm:
-                    score += 3
-                elif texto_normalizado.startswith(keyword_norm):
-                    score += 2
-                else:
-                    score += 1
-            elif ' ' in keyword_norm:
-                kw_words = set(keyword_norm.split())
-                matches = kw_words & palabras_texto
-                if len(matches) == len(kw_words):
-                    score += 1.5
-
-        if score > mejor_score:
-            mejor_score = score
-            mejor_intent = intent_name
-
-    confidence = min(mejor_score / 3.0, 1.0) if mejor_score > 0 else 0
-    return mejor_intent, confidence
+    return detectar_mejor_intent_db(texto)
 
 
 def _buscar_faq(texto_norm):
-    """Busca coincidencia en FAQs por palabras clave"""
+    """Busca coincidencia en FAQs por palabras clave (índice en memoria, ver faq_index)"""
+    from django.db.models import F
     from asistente.models import FAQ
+    from .faq_index import buscar_faq
 
-    faqs = FAQ.objects.filter(aprobada=True, status=True)
-    mejor_faq = None
-    mejor_score = 0
-
-    for faq in faqs:
-        score = 0
-        keywords = faq.palabras_clave or []
-        for kw in keywords:
-            kw_norm = normalizar_texto(kw)
-            if kw_norm in texto_norm:
-                score += 1
-
-        # También comparar con la pregunta
-        pregunta_norm = normalizar_texto(faq.pregunta)
-        palabras_pregunta = pregunta_norm.split()
-        for palabra in palabras_pregunta:
-            if len(palabra) > 3 and palabra in texto_norm:
-                score += 0.5
-
-        if score > mejor_score and score >= 1:
-            mejor_score = score
-            mejor_faq = faq
+    mejor_faq, mejor_score = buscar_faq(texto_norm)
 
     if mejor_faq:
         # Incrementar contador
-        FAQ.objects.filter(pk=mejor_faq.pk).update(veces_usada=mejor_faq.veces_usada + 1)
+        FAQ.objects.filter(pk=mejor_faq['pk']).update(veces_usada=F('veces_usada') + 1)
 
         # Si tiene respuesta humanizada cacheada, usarla directo
-        if mejor_faq.respuesta_humanizada:
+        if mejor_faq['respuesta_humanizada']:
             return ResolverResult(
-                intent=mejor_faq.categoria,
-                datos=mejor_faq.respuesta_datos,
-                respuesta_fija=mejor_faq.respuesta_humanizada,
+                intent=mejor_faq['categoria'],
+                datos=mejor_faq['respuesta_datos'],
+                respuesta_fija=mejor_faq['respuesta_humanizada'],
                 source='faq',
-                faq_id=mejor_faq.pk,
+                faq_id=mejor_faq['pk'],
                 confidence=min(mejor_score / 2.0, 1.0),
             )
 
         # Si no, necesita humanizar los datos
         return ResolverResult(
-            intent=mejor_faq.categoria,
-            datos=mejor_faq.respuesta_datos,
+            intent=mejor_faq['categoria'],
+            datos=mejor_faq['respuesta_datos'],
             source='faq',
             necesita_humanizar=True,
-            faq_id=mejor_faq.pk,
+            faq_id=mejor_faq['pk'],
             confidence=min(mejor_score / 2.0, 1.0),
         )
 
@@ -289,25 +240,25 @@ def _buscar_faq(texto_norm):
 
 
 def _buscar_cache(texto_norm, intent):
-    """Busca en cache de respuestas"""
+    """Busca en cache de respuestas (índice exacto + similitud, ver cache_index)"""
+    from django.db.models import F
     from asistente.models import CachedResponse
+    from .cache_index import buscar_respuesta_cacheada
 
     if not intent:
         return None
 
     # Buscar cache exacto o similar
-    caches = CachedResponse.objects.filter(intent=intent, vigente=True)
-    for cache in caches:
-        cache_norm = normalizar_texto(cache.pregunta_normalizada)
-        if cache_norm == texto_norm or _similitud_basica(cache_norm, texto_norm) > 0.8:
-            CachedResponse.objects.filter(pk=cache.pk).update(veces_usada=cache.veces_usada + 1)
-            return ResolverResult(
-                intent=intent,
-                datos=str(cache.datos_contexto),
-                respuesta_fija=cache.respuesta,
-                source='cache',
-                confidence=0.9,
-            )
+    cache = buscar_respuesta_cacheada(texto_norm, intent)
+    if cache:
+        CachedResponse.objects.filter(pk=cache.pk).update(veces_usada=F('veces_usada') + 1)
+        return ResolverResult(
+            intent=intent,
+            datos=str(cache.datos_contexto),
+            respuesta_fija=cache.respuesta,
+            source='cache',
+            confidence=0.9,
+        )
 
     return None
 
@@ -330,7 +281,6 @@ def _similitud_basica(texto1, texto2):
 def resolver_tarifas(texto, intent, confidence):
     """Resuelve tarifas desde la Tarifa vigente (Excel)"""
     from tarifas.models import Tarifa
-    from tarifas.utils import excel_to_list
 
     tarifa = Tarifa.objects.filter(status=True).first()
     if not tarifa or not tarifa.archivo_excel:
@@ -346,7 +296,7 @@ def resolver_tarifas(texto, intent, confidence):
         )
 
     try:
-        tarifas_list = excel_to_list(tarifa.archivo_excel.path)
+        tarifas_list = tarifa.get_tarifas_list()
     except Exception:
         tarifas_list = []
 
@@ -601,11 +551,13 @@ def resolver_cancelar_turno(texto, intent, confidence):
                 )
 
             if turno.puede_cancelar:
-                # Generar token y enviar email con link de cancelación
+                # Generar token y encolar email con link de cancelación
                 try:
-                    token = turno.generar_token_cancelacion()
-                    from turnero.views_cancelacion import enviar_email_solicitud_cancelacion
-                    exito = enviar_email_solicitud_cancelacion(turno, token)
+                    from django.db import transaction
+                    from turnero.cola_emails import encolar_email
+                    with transaction.atomic():
+                        token = turno.generar_token_cancelacion()
+                        exito = encolar_email('solicitud_cancelacion', turno, token=token)
                 except Exception:
                     exito = False
 
@@ -700,11 +652,13 @@ def resolver_reprogramar_turno(texto, intent, confidence):
                 )
 
             if turno.puede_reprogramar:
-                # Disparar email de reprogramación directamente
+                # Encolar email de reprogramación (lo envía procesar_emails)
                 try:
-                    token = turno.generar_token_reprogramacion()
-                    from turnero.views_cancelacion import enviar_email_reprogramacion
-                    exito = enviar_email_reprogramacion(turno, token)
+                    from django.db import transaction
+                    from turnero.cola_emails import encolar_email
+                    with transaction.atomic():
+                        token = turno.generar_token_reprogramacion()
+                        exito = encolar_email('reprogramacion', turno, token=token)
                 except Exception:
                     exito = False
 
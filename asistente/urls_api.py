@@ -4,6 +4,9 @@ from . import views_api
 urlpatterns = [
     path('api/session/', views_api.api_session, name='asistente_api_session'),
     path('api/mensaje/', views_api.api_mensaje, name='asistente_api_mensaje'),
+    # Variantes para servir con ASGI: async y streaming (Server-Sent Events)
+    path('api/mensaje/async/', views_api.api_mensaje_async, name='asistente_api_mensaje_async'),
+    path('api/mensaje/stream/', views_api.api_mensaje_stream, name='asistente_api_mensaje_stream'),
     path('api/status/', views_api.api_status, name='asistente_api_status'),
     # Acción sobre sugerencia desde email (público, tokenizado)
     path('sugerencia-accion/<uuid:token>/', views_api.sugerencia_accion_token, name='sugerencia_accion_token'),
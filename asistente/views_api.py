@@ -6,14 +6,17 @@ import json
 import time
 import uuid
 
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST, require_GET
 from django.core.cache import cache
 
 from .models import AsistenteConfigModel, ChatSession, ChatMessage
 from .services.resolver import resolver_mensaje
-from .services.humanizer import humanizar_respuesta
+from .services.humanizer import (
+    humanizar_respuesta, humanizar_respuesta_async, humanizar_respuesta_stream,
+)
 
 
 # ── Rate Limiting ──
@@ -90,32 +93,35 @@ def api_session(request):
     })
 
 
-@csrf_exempt
-@require_POST
-def api_mensaje(request):
-    """Recibir mensaje del usuario y retornar respuesta del asistente"""
+def _recibir_mensaje(request):
+    """
+    Parte sync de api_mensaje: valida, guarda el mensaje del usuario y resuelve
+    los datos (Capa 1). Retorna (respuesta, None) si ya hay una respuesta
+    final (errores, flujos multi-paso, derivaciones) o (None, estado) si falta
+    humanizar con _guardar_respuesta.
+    """
     ip = _get_client_ip(request)
 
     # Rate limiting (por minuto y por día)
     allowed, info = _check_rate_limit(ip, 'mensaje')
     if not allowed:
-        return JsonResponse(info, status=429)
+        return JsonResponse(info, status=429), None
     allowed_dia, info_dia = _check_rate_limit(ip, 'mensaje_dia')
     if not allowed_dia:
-        return JsonResponse(info_dia, status=429)
+        return JsonResponse(info_dia, status=429), None
 
     start_time = time.time()
 
     try:
         data = json.loads(request.body)
     except json.JSONDecodeError:
-        return JsonResponse({'error': 'JSON inválido'}, status=400)
+        return JsonResponse({'error': 'JSON inválido'}, status=400), None
 
     session_key = data.get('session_key')
     mensaje = data.get('mensaje', '').strip()
 
     if not session_key or not mensaje:
-        return JsonResponse({'error': 'Faltan parámetros requeridos'}, status=400)
+        return JsonResponse({'error': 'Faltan parámetros requeridos'}, status=400), None
 
     # Limitar largo del mensaje (prevenir prompt injection con textos gigantes)
     MAX_MSG_LENGTH = 500
@@ -126,21 +132,21 @@ def api_mensaje(request):
     try:
         session = ChatSession.objects.get(session_key=session_key, activa=True)
     except ChatSession.DoesNotExist:
-        return JsonResponse({'error': 'Sesión no encontrada o expirada', 'expirada': True}, status=404)
+        return JsonResponse({'error': 'Sesión no encontrada o expirada', 'expirada': True}, status=404), None
 
     # Verificar expiración (24 horas)
     if session.cerrar_si_expirada():
         return JsonResponse({
             'error': 'Tu sesión expiró. Por favor iniciá una nueva conversación.',
             'expirada': True,
-        }, status=410)
+        }, status=410), None
 
     # Obtener configuración
     config = AsistenteConfigModel.get_config()
     if not config.habilitado:
         return JsonResponse({
             'error': 'El asistente no está disponible en este momento.'
-        }, status=503)
+        }, status=503), None
 
     # Guardar mensaje del usuario
     msg_usuario = ChatMessage.objects.create(
@@ -171,7 +177,7 @@ def api_mensaje(request):
                 'source': resultado_contexto.get('source', 'hardcoded'),
                 'acciones': resultado_contexto.get('acciones', []),
                 'session_cerrada': not session.activa,
-            })
+            }), None
 
     # CAPA 1: Resolver datos
     resolver_result = resolver_mensaje(mensaje, session)
@@ -229,7 +235,7 @@ def api_mensaje(request):
             'source': resultado.get('source', 'hardcoded'),
             'acciones': resultado.get('acciones', []),
             'session_cerrada': not session.activa,
-        })
+        }), None
 
     # Guardar contexto si el resolver pide selección de planta
     if (resolver_result.acciones
@@ -241,10 +247,20 @@ def api_mensaje(request):
         }
         session.save(update_fields=['contexto'])
 
-    # CAPA 2: Humanizar respuesta
-    humano_result = humanizar_respuesta(resolver_result, config, session)
+    return None, {
+        'session': session,
+        'config': config,
+        'resolver_result': resolver_result,
+        'start_time': start_time,
+    }
+
+
+def _guardar_respuesta(estado, humano_result):
+    """Guarda la respuesta humanizada del asistente y arma el JSON de api_mensaje"""
+    session = estado['session']
+    resolver_result = estado['resolver_result']
 
-    elapsed_ms = int((time.time() - start_time) * 1000)
+    elapsed_ms = int((time.time() - estado['start_time']) * 1000)
 
     # Guardar respuesta del asistente
     msg_asistente = ChatMessage.objects.create(
@@ -262,12 +278,79 @@ def api_mensaje(request):
     # sino las del resolver
     acciones = humano_result.get('acciones') or resolver_result.acciones
 
-    return JsonResponse({
+    return {
         'respuesta': humano_result['respuesta'],
         'intent': resolver_result.intent,
         'source': humano_result['source'],
         'acciones': acciones,
-    })
+    }
+
+
+@csrf_exempt
+@require_POST
+def api_mensaje(request):
+    """Recibir mensaje del usuario y retornar respuesta del asistente"""
+    respuesta, estado = _recibir_mensaje(request)
+    if respuesta is not None:
+        return respuesta
+
+    # CAPA 2: Humanizar respuesta
+    humano_result = humanizar_respuesta(estado['resolver_result'], estado['config'], estado['session'])
+    return JsonResponse(_guardar_respuesta(estado, humano_result))
+
+
+@csrf_exempt
+@require_POST
+async def api_mensaje_async(request):
+    """
+    Variante async de api_mensaje (servida con ASGI): mientras espera a la IA
+    no ocupa un worker/thread. Misma entrada y salida que api_mensaje.
+    """
+    respuesta, estado = await sync_to_async(_recibir_mensaje)(request)
+    if respuesta is not None:
+        return respuesta
+
+    humano_result = await humanizar_respuesta_async(
+        estado['resolver_result'], estado['config'], estado['session'])
+    return JsonResponse(await sync_to_async(_guardar_respuesta)(estado, humano_result))
+
+
+@csrf_exempt
+@require_POST
+async def api_mensaje_stream(request):
+    """
+    Variante en streaming (Server-Sent Events). Emite eventos:
+      event: token  data: {"texto": "..."}      fragmentos de la respuesta de la IA
+      event: fin    data: {respuesta, intent, source, acciones, ...}
+    El evento 'fin' trae la respuesta definitiva (la misma que api_mensaje),
+    que se guarda como ChatMessage al terminar. Los errores de validación se
+    responden como JSON con su status, igual que api_mensaje.
+    """
+    respuesta, estado = await sync_to_async(_recibir_mensaje)(request)
+    if respuesta is not None and respuesta.status_code != 200:
+        return respuesta
+
+    async def eventos():
+        if respuesta is not None:
+            yield _evento_sse('fin', json.loads(respuesta.content))
+            return
+        humano_result = None
+        async for tipo, valor in humanizar_respuesta_stream(
+                estado['resolver_result'], estado['config'], estado['session']):
+            if tipo == 'token':
+                yield _evento_sse('token', {'texto': valor})
+            else:
+                humano_result = valor
+        yield _evento_sse('fin', await sync_to_async(_guardar_respuesta)(estado, humano_result))
+
+    response = StreamingHttpResponse(eventos(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Nginx: no bufferear el stream
+    return response
+
+
+def _evento_sse(evento, data):
+    return f"event: {evento}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 
 @require_GET
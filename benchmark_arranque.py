@@ -0,0 +1,74 @@
+"""
+Benchmark de arranque de un worker: tiempo de importación y memoria (RSS).
+
+Simula el arranque de gunicorn en un proceso limpio (django.setup() + carga del
+URLconf, que importa todas las vistas) y mide cuánto cuesta. Compara contra la
+carga anticipada de pandas/openpyxl, que era lo que pagaba cada worker cuando
+esas librerías se importaban a nivel de módulo.
+
+Ejecutar: python benchmark_arranque.py [--repeticiones 5]
+(RSS medido con el módulo resource: disponible en Linux/macOS)
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+CODIGO_WORKER = r'''
+import json, os, sys, time
+t0 = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+if sys.argv[1] == 'anticipada':
+    import pandas, openpyxl  # noqa: F401
+segundos = time.perf_counter() - t0
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+except ImportError:
+    rss_mb = None
+print(json.dumps({
+    'segundos': segundos,
+    'rss_mb': rss_mb,
+    'pandas_cargado': 'pandas' in sys.modules,
+    'openpyxl_cargado': 'openpyxl' in sys.modules,
+}))
+'''
+
+
+def medir(modo):
+    """Arranca un intérprete nuevo y retorna las métricas del worker simulado"""
+    salida = subprocess.run(
+        [sys.executable, '-c', CODIGO_WORKER, modo],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'Modo':<12} {'Arranque (ms)':>14} {'RSS (MB)':>10}  pandas  openpyxl")
+    for modo in ('diferida', 'anticipada'):
+        muestras = [medir(modo) for _ in range(max(args.repeticiones, 1))]
+        tiempos = sorted(m['segundos'] * 1000 for m in muestras)
+        mediana = tiempos[len(tiempos) // 2]
+        rss = [m['rss_mb'] for m in muestras if m['rss_mb'] is not None]
+        rss_txt = f"{sorted(rss)[len(rss) // 2]:.1f}" if rss else 'n/d'
+        ultima = muestras[-1]
+        print(f"{modo:<12} {mediana:>14.0f} {rss_txt:>10}  "
+              f"{'sí' if ultima['pandas_cargado'] else 'no':<6}  {'sí' if ultima['openpyxl_cargado'] else 'no'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -158,6 +158,30 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# ── Reservas temporales de turnos ──
+# 'db': tabla ReservaTemporal (por defecto). 'cache': contadores atómicos en el
+# cache TURNERO_RESERVAS_CACHE, sin escrituras en la base por cada clic.
+# En producción 'cache' requiere un cache compartido entre workers (Redis o
+# Memcached, configurado en CACHES desde credenciales.py).
+TURNERO_RESERVAS_BACKEND = os.environ.get('TURNERO_RESERVAS_BACKEND', 'db')
+TURNERO_RESERVAS_CACHE = 'default'
+
+# ── Búsqueda del asistente (KB y FAQs) ──
+# 'python': índices en memoria de cada worker (por defecto; funciona con SQLite).
+# 'postgres': full-text search de PostgreSQL (tsvector con índice GIN, español
+# sin acentos). Requiere ejecutar una vez `python manage.py configurar_busqueda`.
+ASISTENTE_BUSQUEDA_BACKEND = os.environ.get('ASISTENTE_BUSQUEDA_BACKEND', 'python')
+ASISTENTE_BUSQUEDA_CONFIG = 'es_unaccent'
+
+# Proveedores de IA del asistente (ver asistente/services/ai_provider.py).
+# Ruteo por intent: los intents listados usan ese proveedor en lugar del
+# configurado en el panel, ej: {'consultar_horarios': 'local', 'consultar_ubicacion': 'local'}
+# para no pagar el modelo por reformular datos simples.
+ASISTENTE_IA_RUTEO = {}
+# Precios en USD por millón de tokens (input, output) por proveedor; los que
+# no figuran usan los valores por defecto de su clase.
+ASISTENTE_PRECIOS_IA = {}
+
 ## La configuración de correo ahora se gestiona desde el modelo EmailConfig en el panel de administración
 
 # Configuración de autenticación para el panel
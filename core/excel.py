@@ -0,0 +1,51 @@
+"""
+Carga diferida de las librerías de planillas (pandas / openpyxl).
+
+pandas (+ numpy) suma tiempo de arranque y decenas de MB de memoria a cada
+worker. Ningún módulo las importa a nivel de módulo: se cargan recién la
+primera vez que se lee un Excel, a través de estas funciones.
+"""
+import importlib
+import os
+
+# Tablas HTML ya renderizadas, solo la última versión de cada archivo:
+# {(ruta, opciones): ((mtime, tamaño), (html, filas))}
+_tablas_html = {}
+
+
+def get_pandas():
+    """Importa pandas en el primer uso (luego queda en sys.modules)"""
+    return importlib.import_module('pandas')
+
+
+def get_openpyxl():
+    """Importa openpyxl en el primer uso (luego queda en sys.modules)"""
+    return importlib.import_module('openpyxl')
+
+
+def leer_excel(file_path):
+    """Lee la primera hoja como DataFrame, con celdas vacías como string vacío"""
+    return get_pandas().read_excel(file_path).fillna("")
+
+
+def abrir_libro(file_path, **kwargs):
+    """Abre un libro con openpyxl.load_workbook (kwargs: read_only, data_only, ...)"""
+    return get_openpyxl().load_workbook(file_path, **kwargs)
+
+
+def excel_a_html(file_path, **to_html_kwargs):
+    """
+    Retorna (tabla_html, cantidad_filas) de la primera hoja usando
+    DataFrame.to_html. El resultado queda en memoria del proceso por ruta,
+    así el mismo archivo no se vuelve a parsear; si el archivo cambia (fecha de
+    modificación o tamaño) se reemplaza la versión anterior.
+    """
+    stat = os.stat(file_path)
+    clave = (file_path, tuple(sorted(to_html_kwargs.items())))
+    firma = (stat.st_mtime_ns, stat.st_size)
+    memo = _tablas_html.get(clave)
+    if memo is None or memo[0] != firma:
+        df = leer_excel(file_path)
+        memo = (firma, (df.to_html(**to_html_kwargs), len(df)))
+        _tablas_html[clave] = memo
+    return memo[1]
@@ -1,8 +1,12 @@
 
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+from core.singleton import get_primera, get_singleton, invalidar_singleton
+
 # Modelo para configuración de correo SMTP
 class EmailConfig(models.Model):
     nombre = models.CharField(
@@ -54,6 +58,21 @@ class EmailConfig(models.Model):
             config = cls.objects.filter(status=True).first()
         return config
 
+    @classmethod
+    def get_actual(cls):
+        """
+        Configuración con la que se envían los correos del sistema (la primera
+        según el ordering, o None). Cacheada por proceso, ver core.singleton.
+        """
+        return get_primera(cls)
+
+
+@receiver(post_save, sender=EmailConfig)
+@receiver(post_delete, sender=EmailConfig)
+def invalidar_email_config(sender, **kwargs):
+    """Los workers vuelven a leer la configuración y reabren su conexión SMTP"""
+    invalidar_singleton(sender)
+
 class AboutSection(models.Model):
     title = models.CharField(max_length=200, verbose_name="Título")
     description = models.TextField(verbose_name="Descripción")
@@ -145,14 +164,15 @@ class Service(models.Model):
         download_btn = f'<a href="{self.attachment.url}" download class="btn btn-download-attachment mb-3">Descargar archivo</a>'
         if name.endswith('.xlsx') or name.endswith('.xls'):
             try:
-                import pandas as pd
-                df = pd.read_excel(self.attachment.path)
+                from core.excel import excel_a_html
                 # Paginación solo frontend: mostrar todas las filas en la tabla
                 page_size = 10
-                total_rows = len(df)
-                # Reemplazar NaN/null por string vacío para mostrar celdas vacías
-                df = df.fillna("")
-                table_html = df.to_html(classes='table table-striped table-bordered excel-paginated-table', index=False)
+                # Celdas vacías como string vacío; la tabla se parsea una vez por versión del archivo
+                table_html, total_rows = excel_a_html(
+                    self.attachment.path,
+                    classes='table table-striped table-bordered excel-paginated-table',
+                    index=False,
+                )
                 num_pages = (total_rows + page_size - 1) // page_size
                 pagination_html = ''
                 if num_pages > 1:
@@ -518,6 +538,12 @@ class SiteConfiguration(models.Model):
 
     @classmethod
     def get_config(cls):
-        """Método helper para obtener la configuración"""
-        config, created = cls.objects.get_or_create(pk=1)
-        return config
+        """Método helper para obtener la configuración (cacheada, ver core.singleton)"""
+        return get_singleton(cls)
+
+
+@receiver(post_save, sender=SiteConfiguration)
+@receiver(post_delete, sender=SiteConfiguration)
+def invalidar_site_config(sender, **kwargs):
+    """La configuración cacheada por cada worker se vuelve a leer"""
+    invalidar_singleton(sender)
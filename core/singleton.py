@@ -0,0 +1,57 @@
+"""
+Acceso cacheado a modelos de configuración singleton (fila pk=1).
+
+SiteConfiguration y AsistenteConfigModel se leen varias veces por request
+(template tags, vistas, API del chat). get_singleton guarda la instancia en
+memoria del proceso y solo vuelve a la base cuando cambia la versión guardada
+en el cache de Django, que se renueva en los signals de save/delete. Como
+respaldo para caches no compartidos entre workers, la copia en memoria vence
+a los MAX_EDAD_SEGUNDOS.
+
+get_primera aplica lo mismo a modelos de configuración con varias filas de
+las que se usa la primera según el ordering (EmailConfig).
+
+Cada llamada retorna una copia: quien modifica la configuración y llama a
+save() no altera la instancia compartida.
+"""
+import copy
+import time
+import uuid
+
+from django.core.cache import cache
+
+MAX_EDAD_SEGUNDOS = 60
+
+# {label del modelo: (versión, instancia, momento de carga)}
+_instancias = {}
+
+
+def _clave_version(modelo):
+    return f'singleton:{modelo._meta.label_lower}:version'
+
+
+def _cacheada(modelo, cargar):
+    label = modelo._meta.label_lower
+    version = cache.get(_clave_version(modelo))
+    memo = _instancias.get(label)
+    if (memo is None or memo[0] != version
+            or time.monotonic() - memo[2] > MAX_EDAD_SEGUNDOS):
+        memo = (version, cargar(), time.monotonic())
+        _instancias[label] = memo
+    return copy.copy(memo[1])
+
+
+def get_singleton(modelo):
+    """Retorna la configuración (pk=1) del modelo, creándola si no existe"""
+    return _cacheada(modelo, lambda: modelo.objects.get_or_create(pk=1)[0])
+
+
+def get_primera(modelo):
+    """Retorna la primera fila del modelo según su ordering, o None si no hay"""
+    return _cacheada(modelo, lambda: modelo.objects.first())
+
+
+def invalidar_singleton(modelo):
+    """Descarta la copia en memoria de todos los procesos que comparten el cache"""
+    _instancias.pop(modelo._meta.label_lower, None)
+    cache.set(_clave_version(modelo), uuid.uuid4().hex, None)
@@ -8,10 +8,8 @@ import logging
 logger = logging.getLogger(__name__)
 from .models import AboutSection
 from tarifas.models import Tarifa
-from tarifas.utils import excel_to_html
 from django.conf import settings
 from django.core.mail import send_mail, BadHeaderError
-from .models import EmailConfig
 from .models import ContactMessage
 from .models import WhatsAppConfig
 from ubicacion.models import Ubicacion
@@ -50,9 +48,8 @@ def home_view(request):
         tabla_html = None
         tarifas_list = []
         if tarifa and tarifa.archivo_excel:
-            tabla_html = excel_to_html(tarifa.archivo_excel.path)
-            from tarifas.utils import excel_to_list
-            tarifas_list = excel_to_list(tarifa.archivo_excel.path)
+            tabla_html = tarifa.get_tabla_html()
+            tarifas_list = tarifa.get_tarifas_list()
             #print("[DEPURACION] tarifas_list:", tarifas_list)
     except ImportError:
         tarifa = None
@@ -113,21 +110,14 @@ def contact_submit(request):
             sent_successfully = False
             error_message = ""
             try:
-                email_config = EmailConfig.objects.first()
+                from turnero.utils import get_email_connection
+
+                connection, email_config = get_email_connection()
 
                 if email_config:
                     logger.info(f"Enviando email de contacto desde {data['email']}")
 
-                    from django.core.mail import EmailMessage, get_connection
-
-                    connection = get_connection(
-                        backend='django.core.mail.backends.smtp.EmailBackend',
-                        host=email_config.email_host,
-                        port=email_config.email_port,
-                        username=email_config.email_host_user,
-                        password=email_config.email_host_password,
-                        use_tls=email_config.email_use_tls,
-                    )
+                    from django.core.mail import EmailMessage
 
                     # 1. Enviar mensaje del usuario al administrador
                     admin_email = email_config.contact_admin_email or email_config.email_host_user
@@ -75,9 +75,14 @@ log_info "Paso 6: Inicializando menú del panel..."
 python manage.py inicializar_menu_produccion
 echo ""
 
-# Paso 7: Limpiar reservas temporales expiradas
-log_info "Paso 7: Limpiando reservas temporales expiradas..."
-python manage.py shell -c "from turnero.models import ReservaTemporal; ReservaTemporal.limpiar_expiradas()" 2>/dev/null || log_warn "No se pudo limpiar reservas temporales (puede que el modelo no exista aún)"
+# Paso 7: Limpiar reservas temporales expiradas y cargar el ledger de capacidad
+# (obligatorio: con el ledger vacío los turnos existentes no ocupan cupo)
+log_info "Paso 7: Limpiando reservas temporales y verificando el ledger de capacidad..."
+python manage.py purgar_reservas_temporales || log_warn "No se pudo limpiar reservas temporales"
+if ! python manage.py reconstruir_capacidad --si-hace-falta; then
+    log_error "No se pudo reconstruir el ledger de capacidad (SlotCapacidad). Despliegue detenido."
+    exit 1
+fi
 echo ""
 
 # Paso 8: Verificar configuración
@@ -104,6 +109,15 @@ if command -v systemctl &> /dev/null; then
 else
     log_warn "systemctl no disponible. Reiniciá el servicio manualmente."
 fi
+echo ""
+
+# Paso 10: Volver a verificar el ledger: los turnos que la versión anterior
+# tomó entre el paso 7 y el reinicio no actualizaron SlotCapacidad
+log_info "Paso 10: Verificando el ledger de capacidad con el servicio nuevo..."
+if ! python manage.py reconstruir_capacidad --si-hace-falta; then
+    log_error "No se pudo reconstruir el ledger de capacidad. Ejecutá: python manage.py reconstruir_capacidad"
+    exit 1
+fi
 
 echo ""
 echo "=============================================="
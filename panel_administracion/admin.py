@@ -125,7 +125,7 @@ class CustomUserAdmin(UserAdmin):
 
             count = HistorialTurno.objects.all().delete()[0]
             mensajes.append(f'Eliminados {count} registros de historial de turnos')
-            count = ReservaTemporal.objects.all().delete()[0]
+            count = ReservaTemporal.eliminar(ReservaTemporal.objects.all())
             mensajes.append(f'Eliminadas {count} reservas temporales')
             count = Turno.objects.all().delete()[0]
             mensajes.append(f'Eliminados {count} turnos')
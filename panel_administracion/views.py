@@ -5,11 +5,14 @@ from django.contrib.auth.models import User, Group
 from django.utils import timezone
 from django.http import JsonResponse
 from django.template.loader import render_to_string
+from django.db import OperationalError, transaction
 from django.db.models import Q, Count
 from datetime import timedelta, datetime
 from collections import Counter
 import re
 from turnero.models import Turno, HistorialTurno
+from turnero.availability import calcular_horarios_dia
+from turnero.reservas import SlotNoDisponible, guardar_cambio_slot, verificar_cupo
 from clientes.models import Cliente
 from talleres.models import Taller, TipoVehiculo, Vehiculo, ConfiguracionTaller
 from .models import UserProfile, Sector, UserPermission, PasswordResetToken
@@ -299,23 +302,14 @@ def gestion_turnos_guardar(request):
             return JsonResponse({'success': False, 'error': f'Error en formato de fecha/hora: {str(e)}'})
 
         try:
+            # Capacidad del slot según la configuración del taller para el tipo de trámite
+            config = ConfiguracionTaller.objects.filter(taller_id=taller_id, tipo_vehiculo_id=tipo_vehiculo_id).first()
+            capacidad = config.turnos_simultaneos if config else 2
+
             if pk:
                 # Editar turno existente
                 turno = get_object_or_404(Turno, pk=pk)
 
-                # Verificar si ya existe otro turno con la misma combinación (excluyendo el actual)
-                turno_existente = Turno.objects.filter(
-                    taller_id=taller_id,
-                    fecha=fecha,
-                    hora_inicio=hora_inicio
-                ).exclude(pk=pk).first()
-
-                if turno_existente:
-                    return JsonResponse({
-                        'success': False,
-                        'error': f'Ya existe un turno para ese taller, fecha y hora ({turno_existente.codigo})'
-                    })
-
                 turno.cliente_id = cliente_id
                 turno.vehiculo_id = vehiculo_id
                 turno.taller_id = taller_id
@@ -331,7 +325,9 @@ def gestion_turnos_guardar(request):
                 turno.whatsapp_enviado = request.POST.get('whatsapp_enviado') == 'on'
                 turno.recordatorio_enviado = request.POST.get('recordatorio_enviado') == 'on'
 
-                turno.save()
+                # Si el turno pasa a ocupar otro slot, verificar cupo con ambos slots bloqueados
+                with transaction.atomic():
+                    guardar_cambio_slot(turno, capacidad, incluir_reservas=False)
 
                 # Registrar en historial
                 HistorialTurno.objects.create(
@@ -344,21 +340,8 @@ def gestion_turnos_guardar(request):
 
                 return JsonResponse({'success': True, 'message': 'Turno actualizado correctamente'})
             else:
-                # Verificar si ya existe un turno con la misma combinación
-                turno_existente = Turno.objects.filter(
-                    taller_id=taller_id,
-                    fecha=fecha,
-                    hora_inicio=hora_inicio
-                ).first()
-
-                if turno_existente:
-                    return JsonResponse({
-                        'success': False,
-                        'error': f'Ya existe un turno para ese taller, fecha y hora ({turno_existente.codigo})'
-                    })
-
-                # Crear nuevo turno
-                turno = Turno.objects.create(
+                # Crear nuevo turno verificando el cupo con el slot bloqueado
+                turno = Turno(
                     cliente_id=cliente_id,
                     vehiculo_id=vehiculo_id,
                     taller_id=taller_id,
@@ -370,6 +353,11 @@ def gestion_turnos_guardar(request):
                     observaciones=observaciones,
                     created_by=request.user
                 )
+                with transaction.atomic():
+                    slot_nuevo = turno.slot_ocupado()
+                    if slot_nuevo:
+                        verificar_cupo(slot_nuevo, capacidad, incluir_reservas=False)
+                    turno.save()
 
                 # Registrar en historial
                 HistorialTurno.objects.create(
@@ -382,6 +370,12 @@ def gestion_turnos_guardar(request):
 
                 return JsonResponse({'success': True, 'message': 'Turno creado correctamente'})
 
+        except (SlotNoDisponible, OperationalError):
+            # OperationalError: la base abortó la transacción por una reserva concurrente (deadlock/serialización)
+            return JsonResponse({
+                'success': False,
+                'error': 'No hay cupos disponibles para ese taller, tipo de trámite, fecha y hora'
+            })
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)})
 
@@ -812,11 +806,18 @@ def obtener_horarios_disponibles(request):
                     tipo_vehiculo_id=tipo_vehiculo_id,
                     status=True
                 )
-                intervalo = config.intervalo_minutos
-                turnos_simultaneos = config.turnos_simultaneos
             except ConfiguracionTaller.DoesNotExist:
-                intervalo = tipo_vehiculo.duracion_minutos or 30
-                turnos_simultaneos = 2
+                # Configuración por defecto (no se persiste)
+                config = ConfiguracionTaller(
+                    taller=taller,
+                    tipo_vehiculo=tipo_vehiculo,
+                    intervalo_minutos=tipo_vehiculo.duracion_minutos or 30,
+                    turnos_simultaneos=2
+                )
+            # Reusar las instancias ya cargadas (evita consultas extra en el motor)
+            config.taller = taller
+            config.tipo_vehiculo = tipo_vehiculo
+            intervalo = config.intervalo_minutos
 
             # Horarios del taller
             hora_apertura = taller.horario_apertura
@@ -825,46 +826,26 @@ def obtener_horarios_disponibles(request):
             if not hora_apertura or not hora_cierre:
                 return JsonResponse({'success': False, 'error': 'El taller no tiene horarios configurados'})
 
-            # Generar slots de horarios
-            horarios = []
-            hora_actual = datetime.combine(datetime.strptime(fecha, '%Y-%m-%d').date(), hora_apertura)
-            hora_fin_dia = datetime.combine(datetime.strptime(fecha, '%Y-%m-%d').date(), hora_cierre)
-
-            # Obtener turnos ya reservados para esa fecha
+            # Grilla del día calculada por el motor de disponibilidad
             # Si estamos editando un turno, excluirlo de la cuenta
-            turnos_query = Turno.objects.filter(
-                taller_id=taller_id,
-                fecha=fecha,
-                estado__in=['PENDIENTE', 'CONFIRMADO']
+            slots = calcular_horarios_dia(
+                config,
+                datetime.strptime(fecha, '%Y-%m-%d').date(),
+                excluir_turno_id=turno_id or None,
+                incluir_reservas=False,
+                horario=(hora_apertura, hora_cierre),
+                fin_antes_del_cierre=True,
             )
-            if turno_id:
-                turnos_query = turnos_query.exclude(pk=turno_id)
-            turnos_reservados = turnos_query.values_list('hora_inicio', flat=True)
-
-            turnos_por_hora = {}
-            for hora in turnos_reservados:
-                hora_str = hora.strftime('%H:%M')
-                turnos_por_hora[hora_str] = turnos_por_hora.get(hora_str, 0) + 1
-
-            while hora_actual < hora_fin_dia:
-                hora_str = hora_actual.strftime('%H:%M')
-                hora_fin_turno = hora_actual + timedelta(minutes=intervalo)
-
-                # Verificar si el turno termina antes del cierre
-                if hora_fin_turno <= hora_fin_dia:
-                    # Verificar disponibilidad
-                    ocupados = turnos_por_hora.get(hora_str, 0)
-                    disponible = ocupados < turnos_simultaneos
-
-                    horarios.append({
-                        'hora_inicio': hora_str,
-                        'hora_fin': hora_fin_turno.strftime('%H:%M'),
-                        'disponible': disponible,
-                        'ocupados': ocupados,
-                        'capacidad': turnos_simultaneos
-                    })
 
-                hora_actual += timedelta(minutes=intervalo)
+            horarios = []
+            for slot in slots:
+                horarios.append({
+                    'hora_inicio': slot.hora_inicio.strftime('%H:%M'),
+                    'hora_fin': slot.hora_fin.strftime('%H:%M'),
+                    'disponible': not slot.anulado and slot.ocupados < slot.capacidad,
+                    'ocupados': slot.ocupados,
+                    'capacidad': slot.capacidad
+                })
 
             return JsonResponse({
                 'success': True,
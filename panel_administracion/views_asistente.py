@@ -311,6 +311,16 @@ def asistente_uso_ia(request):
     respuestas_cache = mensajes_hoy.filter(source__in=['cache', 'faq', 'hardcoded']).count()
     cache_hit_rate = round((respuestas_cache / total_respuestas * 100) if total_respuestas > 0 else 0, 1)
 
+    # Circuit breaker, histograma de latencias y cache de respuestas humanizadas
+    from asistente.services.cache_humanizado import estadisticas as estadisticas_cache_humanizado
+    from asistente.services.resiliencia import estadisticas
+    resiliencia = estadisticas()
+    max_histograma = max([cantidad for _, cantidad in resiliencia['histograma']] + [1])
+    resiliencia['histograma'] = [
+        (etiqueta, cantidad, round(cantidad * 100 / max_histograma))
+        for etiqueta, cantidad in resiliencia['histograma']
+    ]
+
     context = {
         'titulo': 'Uso IA / Costos - Asistente',
         'total_calls': stats_hoy['total_calls'] or 0,
@@ -318,6 +328,8 @@ def asistente_uso_ia(request):
         'costo_total': stats_hoy['costo_total'] or 0,
         'latencia_avg': round(stats_hoy['latencia_avg'] or 0),
         'cache_hit_rate': cache_hit_rate,
+        'resiliencia': resiliencia,
+        'cache_humanizado': estadisticas_cache_humanizado(),
     }
     return render(request, 'panel/asistente_uso_ia.html', context)
 
@@ -844,11 +856,14 @@ def asistente_kb_guardar(request):
         if archivo:
             from asistente.services.kb_service import procesar_documento
             procesar_documento(doc)
-        elif contenido and not keywords_raw:
-            # Si solo se escribió contenido manual sin keywords, generar keywords
-            from asistente.services.kb_service import generar_palabras_clave
-            doc.palabras_clave = generar_palabras_clave(doc.contenido_texto)
-            doc.save(update_fields=['palabras_clave'])
+        elif contenido:
+            from asistente.services.kb_service import fragmentar_documento, generar_palabras_clave
+            if not keywords_raw:
+                # Si solo se escribió contenido manual sin keywords, generar keywords
+                doc.palabras_clave = generar_palabras_clave(doc.contenido_texto)
+                doc.save(update_fields=['palabras_clave'])
+            # Reindexar los párrafos del contenido editado
+            fragmentar_documento(doc)
 
         return JsonResponse({'success': True, 'message': 'Documento guardado correctamente'})
     except DocumentoKB.DoesNotExist:
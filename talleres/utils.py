@@ -1,8 +1,8 @@
 """
 Utilidades para importación de trámites desde Excel
 """
-import openpyxl
 from decimal import Decimal, InvalidOperation
+from core.excel import abrir_libro
 from .models import TipoVehiculo, Taller, ConfiguracionTaller
 
 
@@ -29,8 +29,8 @@ def convertir_a_decimal(valor):
 def importar_tramites_desde_excel(archivo_path):
     """
     Importa trámites desde un archivo Excel con la estructura:
-    Columna 1: CODIGO TARIFA (número)
-    Columna 2: TARIFA (nombre del trámite)
+    Columna 1: TARIFA (código de tarifa, número)
+    Columna 2: LISTA DE PRECIOS (nombre del trámite)
     Columna 3: PROVINCIAL (precio provincial)
     Columna 4: NACIONAL (precio nacional)
     Columna 5: CAJUTAC (precio cajutac)
@@ -39,7 +39,7 @@ def importar_tramites_desde_excel(archivo_path):
         tuple: (cantidad_creados, cantidad_errores, lista_errores)
     """
     try:
-        wb = openpyxl.load_workbook(archivo_path)
+        wb = abrir_libro(archivo_path)
         ws = wb.active
 
         creados = 0
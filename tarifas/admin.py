@@ -1,5 +1,17 @@
 from django.contrib import admin
-from .models import Tarifa
+from .models import Tarifa, TarifaItem
+
+
+class TarifaItemInline(admin.TabularInline):
+    model = TarifaItem
+    extra = 0
+    can_delete = False
+    fields = ('orden', 'codigo', 'concepto', 'provincial', 'nacional', 'cajutac')
+    readonly_fields = fields
+    verbose_name_plural = "Ítems importados del Excel"
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Tarifa)
@@ -8,6 +20,7 @@ class TarifaAdmin(admin.ModelAdmin):
     search_fields = ("titulo", "descripcion")
     list_filter = ("status", "created")
     readonly_fields = ("created", "updated")
+    inlines = [TarifaItemInline]
     fieldsets = (
         ('Información General', {
             'fields': ('titulo', 'descripcion', 'archivo_excel')
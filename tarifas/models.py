@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
+from django.utils.html import format_html, format_html_join
 
 
 class Tarifa(models.Model):
@@ -24,6 +25,21 @@ class Tarifa(models.Model):
         help_text="Marca esta tarifa como vigente. Solo puede haber una tarifa vigente a la vez."
     )
 
+    # Ítems del Excel (ver importar_items)
+    encabezados = models.JSONField(
+        default=list,
+        blank=True,
+        editable=False,
+        verbose_name="Encabezados del Excel",
+        help_text="Fila 1 del Excel, usada como títulos de las columnas"
+    )
+    items_importados = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name="Ítems importados",
+        help_text="Ya se intentó importar el Excel actual (aunque no haya tenido filas)"
+    )
+
     # Campos de auditoría
     created = models.DateTimeField(
         default=timezone.now,
@@ -47,7 +63,8 @@ class Tarifa(models.Model):
     def save(self, *args, **kwargs):
         """
         Al marcar una tarifa como vigente, automáticamente
-        desmarca todas las demás tarifas e importa los trámites desde el Excel
+        desmarca todas las demás tarifas e importa los trámites desde el Excel.
+        Si cambia el archivo Excel, vuelve a cargar sus filas en TarifaItem.
         """
         # Verificar si estamos marcando como vigente
         marcando_como_vigente = self.status and (
@@ -55,16 +72,95 @@ class Tarifa(models.Model):
             Tarifa.objects.filter(pk=self.pk, status=False).exists()  # Cambió a vigente
         )
 
+        archivo_anterior = None
+        if self.pk:
+            archivo_anterior = Tarifa.objects.filter(pk=self.pk).values_list('archivo_excel', flat=True).first()
+        archivo_cambio = (self.archivo_excel.name or None) != (archivo_anterior or None)
+
         if self.status:
             # Desmarcar todas las demás tarifas como vigentes
             Tarifa.objects.filter(status=True).exclude(pk=self.pk).update(status=False)
 
         super().save(*args, **kwargs)
 
+        if archivo_cambio:
+            self.importar_items()
+
         # Si se marcó como vigente y tiene archivo Excel, importar trámites
         if marcando_como_vigente and self.archivo_excel:
             self.importar_tramites()
 
+    def importar_items(self):
+        """
+        Parsea el Excel una única vez y reemplaza las filas TarifaItem de esta
+        tarifa, con los precios ya formateados, y los encabezados. Las páginas y
+        el asistente leen esas filas en lugar de volver a abrir el archivo.
+        Queda marcada como importada aunque el Excel no tenga filas o no se
+        pueda leer: no se reintenta en cada lectura, sino al subir otro archivo.
+        """
+        from .utils import leer_items_excel
+        import logging
+        logger = logging.getLogger(__name__)
+
+        encabezados, filas = [], []
+        if self.archivo_excel:
+            try:
+                encabezados, filas = leer_items_excel(self.archivo_excel.path)
+            except Exception as e:
+                logger.error(f"No se pudo leer el Excel de tarifas {self.archivo_excel.name}: {e}")
+
+        self._items = None
+        self.encabezados = encabezados
+        self.items_importados = True
+        with transaction.atomic():
+            self.items.all().delete()
+            TarifaItem.objects.bulk_create([
+                TarifaItem(tarifa=self, orden=orden, **fila)
+                for orden, fila in enumerate(filas, start=1)
+            ])
+            Tarifa.objects.filter(pk=self.pk).update(encabezados=encabezados, items_importados=True)
+        return len(filas)
+
+    def _items_cargados(self):
+        """Filas de la tarifa, leídas una vez por instancia"""
+        if getattr(self, '_items', None) is None:
+            # Tarifas subidas antes de existir TarifaItem: se importan la primera vez que se usan
+            if self.archivo_excel and not self.items_importados:
+                self.importar_items()
+            self._items = list(self.items.all())
+        return self._items
+
+    def _columnas(self, items):
+        return TarifaItem.columnas_con_datos(items, self.encabezados)
+
+    def get_tarifas_list(self):
+        """Filas de la tarifa como dicts {encabezado: valor}, sin las columnas vacías"""
+        items = self._items_cargados()
+        columnas = self._columnas(items)
+        return [
+            {titulo: getattr(item, campo) for campo, titulo in columnas}
+            for item in items
+        ]
+
+    def get_tabla_html(self):
+        """Tabla HTML (Bootstrap) de la tarifa para la vista de escritorio"""
+        items = self._items_cargados()
+        if not items:
+            return None
+        columnas = self._columnas(items)
+        encabezados = format_html_join('', '<th>{}</th>', ((titulo,) for _, titulo in columnas))
+        filas = format_html_join(
+            '\n', '<tr>{}</tr>',
+            ((format_html_join('', '<td>{}</td>', ((getattr(item, campo),) for campo, _ in columnas)),)
+             for item in items),
+        )
+        return format_html(
+            '<table border="0" class="dataframe table table-hover excel-table-responsive">\n'
+            '<thead><tr style="text-align: center;">{}</tr></thead>\n'
+            '<tbody>\n{}\n</tbody>\n</table>',
+            encabezados, filas,
+        )
+
     def importar_tramites(self):
         """
         Importa trámites desde el archivo Excel asociado a esta tarifa
@@ -98,3 +194,60 @@ class Tarifa(models.Model):
         logger.info(f"Configuraciones creadas: {configs_creadas}")
 
         return (creados, errores, lista_errores)
+
+
+
+class TarifaItem(models.Model):
+    """
+    Fila de una tarifa, importada del Excel al subirlo.
+    Columnas con el mismo orden que el Excel: código, concepto y precios
+    provincial/nacional/CAJUTAC (ya formateados como moneda). Los títulos que
+    se muestran son los de la fila 1 del Excel (Tarifa.encabezados); COLUMNAS
+    tiene los títulos por defecto para las celdas de encabezado vacías.
+    """
+    COLUMNAS = [
+        ('codigo', 'TARIFA'),
+        ('concepto', 'LISTA DE PRECIOS'),
+        ('provincial', 'PROVINCIAL'),
+        ('nacional', 'NACIONAL'),
+        ('cajutac', 'CAJUTAC'),
+    ]
+
+    tarifa = models.ForeignKey(
+        Tarifa,
+        on_delete=models.CASCADE,
+        related_name='items',
+        verbose_name="Tarifa"
+    )
+    codigo = models.CharField(max_length=20, blank=True, verbose_name="Código")
+    concepto = models.CharField(max_length=255, blank=True, verbose_name="Concepto")
+    provincial = models.CharField(max_length=50, blank=True, verbose_name="Provincial")
+    nacional = models.CharField(max_length=50, blank=True, verbose_name="Nacional")
+    cajutac = models.CharField(max_length=50, blank=True, verbose_name="CAJUTAC")
+    orden = models.PositiveIntegerField(default=0, verbose_name="Orden")
+
+    class Meta:
+        verbose_name = "Ítem de Tarifa"
+        verbose_name_plural = "Ítems de Tarifa"
+        ordering = ['tarifa', 'orden']
+        indexes = [
+            models.Index(fields=['tarifa', 'orden']),
+        ]
+
+    def __str__(self):
+        return f"{self.concepto} ({self.tarifa_id})"
+
+    @classmethod
+    def columnas_con_datos(cls, items, encabezados=()):
+        """
+        Columnas (campo, encabezado) que tienen al menos un valor en las filas.
+        encabezados: títulos del Excel por posición; los vacíos usan los de COLUMNAS.
+        """
+        columnas = []
+        for posicion, (campo, titulo) in enumerate(cls.COLUMNAS):
+            if not any(getattr(item, campo) for item in items):
+                continue
+            if posicion < len(encabezados) and encabezados[posicion]:
+                titulo = encabezados[posicion]
+            columnas.append((campo, titulo))
+        return columnas
@@ -1,80 +1,117 @@
-import pandas as pd
 from django.utils.safestring import mark_safe
 
+from core.excel import abrir_libro, get_pandas, leer_excel
+
+
+def limpiar_y_formatear(val):
+    """Formatea montos como moneda ($1.234,56); deja intactos los textos no numéricos"""
+    if isinstance(val, str):
+        # Eliminar símbolo de pesos, espacios y puntos de miles
+        val_limpio = val.replace('$', '').replace(' ', '').replace('.', '').replace(',', '.')
+        # Si es vacío, devolver tal cual
+        if not val_limpio.strip():
+            return val
+        # Si es numérico, formatear
+        try:
+            num = float(val_limpio)
+            return f"${num:,.2f}".replace(",", ".").replace(".", ",", 1)
+        except ValueError:
+            return val
+    elif isinstance(val, (int, float)):
+        return f"${val:,.2f}".replace(",", ".").replace(".", ",", 1)
+    return val
+
+
+def _formatear_precios(df):
+    # Aplicar a todas las columnas excepto la primera (descriptiva)
+    for col in df.columns[1:]:
+        df[col] = df[col].apply(limpiar_y_formatear)
+    return df
+
+
+def _df_a_list(df):
+    pd = get_pandas()
+    df = df.copy()
+    # Limpiar nombres de columna: si es 'Unnamed: X' y toda la columna está vacía, eliminarla
+    clean_columns = {}
+    for col in df.columns:
+        if str(col).startswith('Unnamed'):
+            # Si toda la columna está vacía, no la incluimos
+            if df[col].replace("", pd.NA).isna().all():
+                continue
+            # Si no, renombramos a string vacío
+            clean_columns[col] = ''
+        else:
+            clean_columns[col] = col
+    df.rename(columns=clean_columns, inplace=True)
+    # Eliminar columnas con nombre vacío
+    df = df.loc[:, df.columns != '']
+    return _formatear_precios(df).to_dict(orient='records')
+
+
+def _df_a_html(df):
+    df = _formatear_precios(df.copy())
+    # Generar tabla con clases Bootstrap y encabezados en negrita
+    html = df.to_html(
+        classes="table table-hover excel-table-responsive",
+        index=False,
+        border=0,
+        justify='center',
+        escape=True
+    )
+    # Solo devuelve la tabla, sin scripts ni links
+    return mark_safe(html)
+
+
 def excel_to_list(file_path):
     try:
-        df = pd.read_excel(file_path)
-        df = df.fillna("")
-        # Limpiar nombres de columna: si es 'Unnamed: X' y toda la columna está vacía, eliminarla
-        clean_columns = {}
-        for col in df.columns:
-            if str(col).startswith('Unnamed'):
-                # Si toda la columna está vacía, no la incluimos
-                if df[col].replace("", pd.NA).isna().all():
-                    continue
-                # Si no, renombramos a string vacío
-                clean_columns[col] = ''
-            else:
-                clean_columns[col] = col
-        df.rename(columns=clean_columns, inplace=True)
-        # Eliminar columnas con nombre vacío
-        df = df.loc[:, df.columns != '']
-        # Formatear todos los campos numéricos como moneda
-        import re
-        def limpiar_y_formatear(val):
-            if isinstance(val, str):
-                # Eliminar símbolo de pesos, espacios y puntos de miles
-                val_limpio = val.replace('$', '').replace(' ', '').replace('.', '').replace(',', '.')
-                # Si es vacío, devolver tal cual
-                if not val_limpio.strip():
-                    return val
-                # Si es numérico, formatear
-                try:
-                    num = float(val_limpio)
-                    return f"${num:,.2f}".replace(",", ".").replace(".", ",", 1)
-                except ValueError:
-                    return val
-            elif isinstance(val, (int, float)):
-                return f"${val:,.2f}".replace(",", ".").replace(".", ",", 1)
-            return val
-        # Aplicar a todas las columnas excepto la primera (descriptiva)
-        for col in df.columns[1:]:
-            df[col] = df[col].apply(limpiar_y_formatear)
-        return df.to_dict(orient='records')
+        return _df_a_list(leer_excel(file_path))
     except Exception as e:
         return []
 
+
 def excel_to_html(file_path):
     try:
-        df = pd.read_excel(file_path)
-        # Reemplazar NaN/null por string vacío
-        df = df.fillna("")
-        # Formatear todos los campos numéricos como moneda
-        import re
-        def limpiar_y_formatear(val):
-            if isinstance(val, str):
-                val_limpio = val.replace('$', '').replace(' ', '').replace('.', '').replace(',', '.')
-                if not val_limpio.strip():
-                    return val
-                try:
-                    num = float(val_limpio)
-                    return f"${num:,.2f}".replace(",", ".").replace(".", ",", 1)
-                except ValueError:
-                    return val
-            elif isinstance(val, (int, float)):
-                return f"${val:,.2f}".replace(",", ".").replace(".", ",", 1)
-            return val
-        for col in df.columns[1:]:
-            df[col] = df[col].apply(limpiar_y_formatear)
-        # Generar tabla con clases Bootstrap y encabezados en negrita
-        html = df.to_html(
-            classes="table table-hover excel-table-responsive",
-            index=False,
-            border=0,
-            justify='center',
-            escape=True
-        )
-        # Solo devuelve la tabla, sin scripts ni links
-        return mark_safe(html)
+        return _df_a_html(leer_excel(file_path))
     except Exception as e:
         return f"<p>Error al procesar el archivo: {e}</p>"
+
+
+def _texto_celda(val):
+    if val is None:
+        return ''
+    if isinstance(val, float) and val.is_integer():
+        return str(int(val))
+    return str(val).strip()
+
+
+def leer_items_excel(file_path):
+    """
+    Lee el Excel de tarifas y retorna (encabezados, filas): los textos de la
+    fila 1 de las primeras cinco columnas y una lista de dicts con los campos
+    de TarifaItem (codigo, concepto, provincial, nacional, cajutac). Las
+    columnas van por posición, igual que importar_tramites_desde_excel, y los
+    precios se guardan ya formateados con limpiar_y_formatear.
+    """
+    wb = abrir_libro(file_path, read_only=True, data_only=True)
+    try:
+        encabezados = []
+        filas = []
+        for numero, row in enumerate(wb.active.iter_rows(max_col=5, values_only=True), start=1):
+            valores = list(row) + [None] * (5 - len(row))
+            if numero == 1:
+                encabezados = [_texto_celda(v) for v in valores]
+                continue
+            if all(v is None or str(v).strip() == '' for v in valores):
+                continue
+            codigo, concepto, provincial, nacional, cajutac = valores
+            filas.append({
+                'codigo': _texto_celda(codigo),
+                'concepto': _texto_celda(concepto),
+                'provincial': _texto_celda(limpiar_y_formatear(provincial)),
+                'nacional': _texto_celda(limpiar_y_formatear(nacional)),
+                'cajutac': _texto_celda(limpiar_y_formatear(cajutac)),
+            })
+        return encabezados, filas
+    finally:
+        wb.close()
@@ -1,15 +1,13 @@
 from django.shortcuts import render
 from .models import Tarifa
-from .utils import excel_to_html
 
 def tarifas_view(request):
     tarifa = Tarifa.objects.filter(status=True).first()
     tabla_html = None
     tarifas_list = []
     if tarifa and tarifa.archivo_excel:
-        tabla_html = excel_to_html(tarifa.archivo_excel.path)
-        from .utils import excel_to_list
-        tarifas_list = excel_to_list(tarifa.archivo_excel.path)
+        tabla_html = tarifa.get_tabla_html()
+        tarifas_list = tarifa.get_tarifas_list()
         #print("[DEPURACION] tarifas_list:", tarifas_list)
         #print("[DEPURACION] tabla_html:", tabla_html)
     else:
@@ -891,6 +891,76 @@ test("No cancelar (botón mantener turno)",
      descripcion="Botón 'No, mantener turno' → agradecimiento, NO cancelación")
 
 
+# =============================================================================
+# CAT 17: HUMANIZER OFFLINE (proveedor local)
+# Pipeline completo resolver → humanizer con el proveedor local extractivo:
+# sin red ni API key, y sin consumir el cupo de IA.
+# =============================================================================
+print(f"\n\n{'='*70}")
+print(f"{BOLD}CAT 17: HUMANIZER OFFLINE (proveedor local){END}")
+print(f"La respuesta final debe conservar los datos del resolver.")
+print(f"{'='*70}")
+
+from asistente.models import AsistenteConfigModel
+from asistente.services.humanizer import humanizar_respuesta
+
+config_local = AsistenteConfigModel.get_config()
+config_local.ai_provider = 'local'
+
+
+def test_humanizer(nombre, mensaje, respuesta_debe_contener=None, no_debe_ser_source=None,
+                   descripcion=''):
+    """Resuelve y humaniza el mensaje con el proveedor local"""
+    global total_tests, passed, failed
+    total_tests += 1
+
+    result = resolver_mensaje(mensaje, session=None)
+    humano = humanizar_respuesta(result, config_local)
+    respuesta = humano['respuesta'] or ''
+
+    errores = []
+    if not respuesta:
+        errores.append("Respuesta vacía")
+    if result.necesita_humanizar and result.datos and respuesta != result.datos.strip():
+        errores.append("Humanizar datos: la respuesta debe ser los datos tal cual")
+    if respuesta_debe_contener and respuesta_debe_contener.lower() not in respuesta.lower():
+        errores.append(f"Respuesta DEBE contener '{respuesta_debe_contener}'")
+    if no_debe_ser_source is not None and humano['source'] == no_debe_ser_source:
+        errores.append(f"Source NO deberia ser={no_debe_ser_source}, pero lo es")
+
+    if errores:
+        failed += 1
+        status = f"{FAIL}FAIL{END}"
+        for err in errores:
+            falencias.append(f"[{nombre}] {err}")
+    else:
+        passed += 1
+        status = f"{OK}PASS{END}"
+
+    print(f"\n{status} {BOLD}Test #{total_tests}: {nombre}{END}")
+    if descripcion:
+        print(f"   Desc: {descripcion}")
+    print(f"   Msg: \"{mensaje}\"")
+    print(f"   Resolver: intent={result.intent} | source={result.source} | Humanizer: source={humano['source']}")
+    print(f"   Resp: {respuesta[:100]}{'...' if len(respuesta)>100 else ''}")
+    for err in errores:
+        print(f"   {FAIL}>>> {err}{END}")
+
+
+test_humanizer("Tarifas humanizadas offline",
+               "cuanto sale la revision de un auto",
+               descripcion="Los montos del resolver llegan intactos a la respuesta")
+
+test_humanizer("Ubicación humanizada offline",
+               "donde queda el taller",
+               descripcion="Dirección de los talleres sin pasar por Gemini")
+
+test_humanizer("Fuera de dominio offline",
+               "cual es la capital de francia",
+               no_debe_ser_source='ai',
+               descripcion="Sin contexto KB el local responde NO_RELEVANTE → mensaje fijo")
+
+
 # =============================================================================
 # RESUMEN
 # =============================================================================
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import Turno, HistorialTurno
+from .models import Turno, HistorialTurno, EmailPendiente
 
 
 @admin.register(Turno)
@@ -107,7 +107,7 @@ class TurnoAdmin(admin.ModelAdmin):
     estado_badge.admin_order_field = 'estado'
 
     def qr_code_display(self, obj):
-        if obj.qr_code:
+        if obj.obtener_qr():
             return mark_safe(f'<img src="{obj.qr_code.url}" width="200" height="200" />')
         return "QR no generado"
     qr_code_display.short_description = 'Código QR'
@@ -131,12 +131,21 @@ class TurnoAdmin(admin.ModelAdmin):
     actions = ['marcar_confirmado', 'marcar_cancelado']
 
     def marcar_confirmado(self, request, queryset):
-        updated = queryset.update(estado='CONFIRMADO')
+        # save() por turno para mantener sincronizado el ledger SlotCapacidad
+        updated = 0
+        for turno in queryset:
+            turno.estado = 'CONFIRMADO'
+            turno.save(update_fields=['estado'])
+            updated += 1
         self.message_user(request, f'{updated} turno(s) marcado(s) como CONFIRMADO.')
     marcar_confirmado.short_description = "Marcar como CONFIRMADO"
 
     def marcar_cancelado(self, request, queryset):
-        updated = queryset.update(estado='CANCELADO')
+        updated = 0
+        for turno in queryset:
+            turno.estado = 'CANCELADO'
+            turno.save(update_fields=['estado'])
+            updated += 1
         self.message_user(request, f'{updated} turno(s) marcado(s) como CANCELADO.')
     marcar_cancelado.short_description = "Marcar como CANCELADO"
 
@@ -167,3 +176,25 @@ class HistorialTurnoAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         # El historial no se elimina
         return False
+
+
+@admin.register(EmailPendiente)
+class EmailPendienteAdmin(admin.ModelAdmin):
+    list_display = ('tipo', 'turno', 'estado', 'intentos', 'proximo_intento', 'created_at', 'enviado_at')
+    list_filter = ('estado', 'tipo', 'created_at')
+    search_fields = ('turno__codigo', 'ultimo_error')
+    ordering = ('-created_at',)
+    readonly_fields = ('tipo', 'turno', 'parametros', 'intentos', 'ultimo_error', 'created_at', 'enviado_at')
+    actions = ['reintentar_ahora']
+
+    def has_add_permission(self, request):
+        # Los emails se encolan desde las vistas
+        return False
+
+    def reintentar_ahora(self, request, queryset):
+        """Vuelve a poner en cola los emails seleccionados que no se enviaron"""
+        from django.utils import timezone
+        updated = queryset.exclude(estado='ENVIADO').update(
+            estado='PENDIENTE', intentos=0, proximo_intento=timezone.now())
+        self.message_user(request, f'{updated} email(s) puestos nuevamente en cola.')
+    reintentar_ahora.short_description = "Reintentar envío ahora"
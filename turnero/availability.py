@@ -0,0 +1,247 @@
+"""
+Motor de disponibilidad de turnos.
+
+Calcula la grilla de horarios de un taller/tipo de trámite en memoria a partir
+de una cantidad constante de consultas (ledger SlotCapacidad, reservas temporales
+y franjas anuladas), sin importar cuántos slots tenga el día. Las reservas
+temporales se leen del backend configurado (base de datos o cache).
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from talleres.models import FranjaAnulada
+from .models import Turno, SlotCapacidad
+from .reservas_temporales import obtener_backend
+
+# Estados de turno que ocupan un cupo
+ESTADOS_OCUPAN_CUPO = ['PENDIENTE', 'CONFIRMADO']
+
+DIAS_SEMANA = ['lunes', 'martes', 'miercoles', 'jueves', 'viernes', 'sabado', 'domingo']
+
+
+@dataclass
+class SlotHorario:
+    """Estado de un horario de la grilla"""
+    hora_inicio: object
+    hora_fin: object
+    capacidad: int
+    ocupados: int = 0
+    reservados: int = 0
+    anulado: bool = False
+    pasado: bool = False
+
+    @property
+    def cupos(self):
+        """Cupos libres = capacidad - turnos - reservas temporales de otros"""
+        return max(self.capacidad - self.ocupados - self.reservados, 0)
+
+    @property
+    def disponible(self):
+        return not self.anulado and not self.pasado and self.cupos > 0
+
+
+def nombre_dia(fecha):
+    """Retorna el nombre del día de la semana tal como se usa en Taller.dias_atencion"""
+    return DIAS_SEMANA[fecha.weekday()]
+
+
+def fechas_no_laborables(taller):
+    """
+    Retorna el set de fechas no laborables del taller en formato 'YYYY-MM-DD'.
+    Soporta elementos string o dict {"fecha": "YYYY-MM-DD", "motivo": "..."}.
+    """
+    fechas = set()
+    for item in taller.fechas_no_laborables or []:
+        if isinstance(item, dict):
+            fecha_str = item.get('fecha', '')
+        else:
+            fecha_str = str(item)
+        if fecha_str:
+            fechas.add(fecha_str[:10])
+    return fechas
+
+
+def es_fecha_no_laborable(taller, fecha):
+    """Verifica si la fecha es feriado/no laborable para el taller"""
+    return fecha.isoformat() in fechas_no_laborables(taller)
+
+
+def cargar_ledger(taller, tipo_vehiculo, fecha_desde, fecha_hasta, excluir_turno_id=None):
+    """
+    Lee el ledger SlotCapacidad del rango en una sola consulta indexada.
+
+    Retorna (ocupacion, hay_retenidos): ocupacion es {(fecha, hora_inicio): turnos}
+    y hay_retenidos indica si el ledger registra reservas temporales en el rango.
+    Si se indica excluir_turno_id (edición desde el panel), descuenta su cupo.
+    """
+    filas = SlotCapacidad.objects.filter(
+        taller=taller,
+        tipo_vehiculo=tipo_vehiculo,
+        fecha__gte=fecha_desde,
+        fecha__lte=fecha_hasta,
+    ).values_list('fecha', 'hora_inicio', 'reservados', 'retenidos')
+
+    ocupacion = {}
+    hay_retenidos = False
+    for fecha, hora_inicio, reservados, retenidos in filas:
+        if reservados > 0:
+            ocupacion[(fecha, hora_inicio)] = reservados
+        if retenidos > 0:
+            hay_retenidos = True
+
+    if excluir_turno_id:
+        turno = Turno.objects.filter(
+            pk=excluir_turno_id,
+            taller=taller,
+            tipo_vehiculo=tipo_vehiculo,
+            estado__in=ESTADOS_OCUPAN_CUPO,
+        ).values_list('fecha', 'hora_inicio').first()
+        if turno and ocupacion.get(turno):
+            ocupacion[turno] -= 1
+
+    return ocupacion, hay_retenidos
+
+
+def cargar_franjas_anuladas(taller):
+    """Retorna las franjas anuladas activas del taller (específicas + recurrentes)"""
+    return list(FranjaAnulada.objects.filter(taller=taller, status=True))
+
+
+def franjas_del_dia(franjas, fecha):
+    """Filtra en memoria las franjas que aplican a una fecha: lista de (inicio, fin)"""
+    return [(f.hora_inicio, f.hora_fin) for f in franjas if f.aplica_en_fecha(fecha)]
+
+
+def generar_slots(fecha, apertura, cierre, intervalo, capacidad, ocupacion=None,
+                  reservas=None, franjas=None, ahora=None, fin_antes_del_cierre=False):
+    """
+    Genera la grilla de un día en memoria.
+
+    ocupacion/reservas: dicts {(fecha, hora_inicio): cantidad}
+    franjas: lista de (inicio, fin) anuladas para el día
+    ahora: datetime local; si la fecha es hoy, marca como pasados los horarios ya vencidos
+    fin_antes_del_cierre: descarta slots cuyo fin supera el horario de cierre
+    """
+    ocupacion = ocupacion or {}
+    reservas = reservas or {}
+    franjas = franjas or []
+
+    slots = []
+    paso = timedelta(minutes=intervalo)
+    hora_actual = datetime.combine(fecha, apertura)
+    hora_cierre = datetime.combine(fecha, cierre)
+
+    while hora_actual < hora_cierre:
+        hora_fin = hora_actual + paso
+        if fin_antes_del_cierre and hora_fin > hora_cierre:
+            break
+
+        hora_time = hora_actual.time()
+        slots.append(SlotHorario(
+            hora_inicio=hora_time,
+            hora_fin=hora_fin.time(),
+            capacidad=capacidad,
+            ocupados=ocupacion.get((fecha, hora_time), 0),
+            reservados=reservas.get((fecha, hora_time), 0),
+            anulado=any(inicio <= hora_time < fin for inicio, fin in franjas),
+            pasado=bool(ahora and fecha == ahora.date() and hora_time <= ahora.time()),
+        ))
+        hora_actual = hora_fin
+
+    return slots
+
+
+def calcular_horarios_dia(config, fecha, session_key=None, excluir_turno_id=None,
+                          incluir_reservas=True, horario=None, fin_antes_del_cierre=False):
+    """
+    Calcula la grilla completa de un día para una ConfiguracionTaller.
+
+    Ejecuta como máximo tres consultas (ledger, reservas y franjas) sin importar
+    la cantidad de slots; con el backend de base de datos las reservas solo se
+    consultan si el ledger las registra, con el de cache son una única lectura.
+    Retorna una lista de SlotHorario, vacía si el taller no atiende ese día o
+    es no laborable.
+
+    horario: tupla (apertura, cierre) para forzar un horario distinto al del día
+    """
+    taller = config.taller
+    tipo_vehiculo = config.tipo_vehiculo
+
+    if horario is None:
+        if es_fecha_no_laborable(taller, fecha):
+            return []
+        horario = taller.get_horario_dia(nombre_dia(fecha))
+
+    apertura, cierre = horario
+    if not apertura or not cierre:
+        return []
+
+    ocupacion, hay_retenidos = cargar_ledger(taller, tipo_vehiculo, fecha, fecha, excluir_turno_id=excluir_turno_id)
+    franjas = franjas_del_dia(cargar_franjas_anuladas(taller), fecha)
+
+    slots = generar_slots(
+        fecha, apertura, cierre,
+        intervalo=config.intervalo_minutos,
+        capacidad=config.turnos_simultaneos,
+        ocupacion=ocupacion,
+        franjas=franjas,
+        ahora=timezone.localtime(timezone.now()),
+        fin_antes_del_cierre=fin_antes_del_cierre,
+    )
+
+    # El contador de retenidos nunca subestima: si está en cero no hay reservas que consultar
+    backend = obtener_backend()
+    if slots and incluir_reservas and (hay_retenidos or not backend.registra_en_ledger):
+        reservas = backend.contar_dia(
+            taller, tipo_vehiculo, fecha,
+            [slot.hora_inicio for slot in slots],
+            excluir_session=session_key,
+        )
+        for slot in slots:
+            slot.reservados = reservas.get((fecha, slot.hora_inicio), 0)
+
+    return slots
+
+
+def calcular_calendario(config, fecha_desde, fecha_hasta):
+    """
+    Calcula la capacidad restante por fecha para un rango de días.
+
+    Lee la ocupación de todo el rango del ledger SlotCapacidad en una sola
+    consulta, más las franjas anuladas del taller, y arma cada día en memoria.
+    Retorna {fecha: (cupos_libres, capacidad_total)}; los días sin atención,
+    no laborables o ya vencidos quedan en (0, 0).
+    """
+    taller = config.taller
+    ocupacion, _ = cargar_ledger(taller, config.tipo_vehiculo, fecha_desde, fecha_hasta)
+    franjas = cargar_franjas_anuladas(taller)
+    no_laborables = fechas_no_laborables(taller)
+    ahora = timezone.localtime(timezone.now())
+
+    calendario = {}
+    fecha = fecha_desde
+    while fecha <= fecha_hasta:
+        cupos, total = 0, 0
+        apertura, cierre = taller.get_horario_dia(nombre_dia(fecha))
+
+        if apertura and cierre and fecha.isoformat() not in no_laborables:
+            slots = generar_slots(
+                fecha, apertura, cierre,
+                intervalo=config.intervalo_minutos,
+                capacidad=config.turnos_simultaneos,
+                ocupacion=ocupacion,
+                franjas=franjas_del_dia(franjas, fecha),
+                ahora=ahora,
+            )
+            for slot in slots:
+                if slot.anulado or slot.pasado:
+                    continue
+                cupos += slot.cupos
+                total += slot.capacidad
+
+        calendario[fecha] = (cupos, total)
+        fecha += timedelta(days=1)
+
+    return calendario
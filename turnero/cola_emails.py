@@ -0,0 +1,179 @@
+"""
+Outbox de emails transaccionales.
+
+Las vistas no hablan con el servidor SMTP: encolar_email inserta un
+EmailPendiente dentro de la transacción del request (si la transacción se
+revierte, el email tampoco existe) y el comando procesar_emails lo envía
+después, fuera del request:
+
+    python manage.py procesar_emails --loop
+
+El contenido se arma al momento del envío, con los datos actuales del turno.
+Cada email se reintenta hasta MAX_INTENTOS veces con backoff exponencial.
+Un lote tomado por un worker queda reservado SEGUNDOS_RESERVA; si el worker
+se cae a mitad de camino, otro lo retoma al vencer la reserva.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MAX_INTENTOS = 6
+BACKOFF_BASE_SEGUNDOS = 60
+BACKOFF_MAX_SEGUNDOS = 60 * 60
+SEGUNDOS_RESERVA = 5 * 60
+
+
+def encolar_email(tipo, turno=None, **parametros):
+    """
+    Encola un email para que lo envíe procesar_emails. Retorna False (sin
+    encolar) si no se puede enviar: no hay configuración de correo o el cliente
+    del turno no tiene email. Llamar dentro de la transacción del cambio que
+    lo origina.
+    """
+    from core.models import EmailConfig
+    from .models import EmailPendiente
+
+    if EmailConfig.get_actual() is None:
+        return False
+    if turno is not None and not turno.cliente.email:
+        return False
+
+    EmailPendiente.objects.create(tipo=tipo, turno=turno, parametros=parametros)
+    return True
+
+
+def _espera_reintento(intentos):
+    return min(BACKOFF_MAX_SEGUNDOS, BACKOFF_BASE_SEGUNDOS * (2 ** (intentos - 1)))
+
+
+def _tomar_lote(lote):
+    """Reserva hasta `lote` pendientes vencidos (SKIP LOCKED entre workers en PostgreSQL)"""
+    from .models import EmailPendiente
+
+    ahora = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            EmailPendiente.objects.select_for_update(skip_locked=True)
+            .filter(estado='PENDIENTE', proximo_intento__lte=ahora)
+            .order_by('proximo_intento').values_list('id', flat=True)[:lote]
+        )
+        EmailPendiente.objects.filter(id__in=ids).update(
+            intentos=F('intentos') + 1,
+            proximo_intento=ahora + timedelta(seconds=SEGUNDOS_RESERVA),
+        )
+    return list(
+        EmailPendiente.objects.filter(id__in=ids)
+        .select_related('turno__cliente', 'turno__vehiculo', 'turno__taller', 'turno__tipo_vehiculo')
+        .order_by('created_at')
+    )
+
+
+def procesar_pendientes(lote=50):
+    """
+    Envía un lote de emails pendientes. Retorna (enviados, con_error), donde
+    con_error incluye los que quedan para reintentar y los que fallaron del todo.
+    """
+    from .models import EmailPendiente
+
+    enviados = con_error = 0
+    for email in _tomar_lote(lote):
+        try:
+            exito, error = _ENVIOS[email.tipo](email)
+        except Exception as e:
+            exito, error = False, str(e)
+
+        if exito:
+            EmailPendiente.objects.filter(pk=email.pk).update(
+                estado='ENVIADO', enviado_at=timezone.now(), ultimo_error='')
+            enviados += 1
+            continue
+
+        con_error += 1
+        cambios = {'ultimo_error': error or 'Error al enviar el email'}
+        if email.intentos >= MAX_INTENTOS:
+            cambios['estado'] = 'FALLIDO'
+            logger.error(f"Email {email.pk} ({email.tipo}) descartado tras {email.intentos} intentos: {error}")
+        else:
+            cambios['proximo_intento'] = timezone.now() + timedelta(seconds=_espera_reintento(email.intentos))
+        EmailPendiente.objects.filter(pk=email.pk).update(**cambios)
+
+    return enviados, con_error
+
+
+# ── Envío por tipo: cada función retorna (exito, error) ──
+
+def _resultado(exito):
+    return exito, '' if exito else 'El envío falló (ver log)'
+
+
+def _enviar_turno(email):
+    from .models import HistorialTurno, Turno
+    from .utils import enviar_email_turno
+
+    motivo = email.parametros.get('motivo', 'confirmacion')
+    exito, mensaje = enviar_email_turno(email.turno, motivo=motivo)
+    if exito and motivo == 'confirmacion':
+        Turno.objects.filter(pk=email.turno_id).update(email_enviado=True)
+        HistorialTurno.objects.create(
+            turno=email.turno,
+            accion='EMAIL_ENVIADO',
+            descripcion=f'Email de confirmación enviado a {email.turno.cliente.email}',
+            ip_address=email.parametros.get('ip_address'),
+        )
+    return exito, '' if exito else mensaje
+
+
+def _enviar_solicitud_cancelacion(email):
+    from .views_cancelacion import enviar_email_solicitud_cancelacion
+
+    # Si el cliente pidió el link de nuevo, el token vigente es el del turno
+    token = email.turno.token_cancelacion or email.parametros['token']
+    return _resultado(enviar_email_solicitud_cancelacion(email.turno, token))
+
+
+def _enviar_cancelacion(email):
+    from .views_cancelacion import enviar_email_cancelacion
+    return _resultado(enviar_email_cancelacion(email.turno, email.parametros.get('motivo', '')))
+
+
+def _enviar_reprogramacion(email):
+    from .views_cancelacion import enviar_email_reprogramacion
+
+    token = email.turno.token_reprogramacion or email.parametros['token']
+    return _resultado(enviar_email_reprogramacion(email.turno, token))
+
+
+def _enviar_confirmacion_reprogramacion(email):
+    from .views_cancelacion import enviar_email_confirmacion_reprogramacion
+    return _resultado(enviar_email_confirmacion_reprogramacion(email.turno))
+
+
+def _enviar_derivacion(email):
+    from asistente.models import Derivacion
+    from asistente.services.escalation import enviar_email_derivacion
+
+    derivacion = Derivacion.objects.select_related('taller', 'session').get(
+        pk=email.parametros['derivacion_id'])
+    exito = enviar_email_derivacion(
+        derivacion.taller, derivacion.session, email.parametros.get('resumen', ''),
+        celular_cliente=derivacion.celular_cliente,
+        email_cliente=derivacion.email_cliente,
+    )
+    if exito:
+        Derivacion.objects.filter(pk=derivacion.pk).update(email_enviado=True)
+    return _resultado(exito)
+
+
+_ENVIOS = {
+    'turno': _enviar_turno,
+    'solicitud_cancelacion': _enviar_solicitud_cancelacion,
+    'cancelacion': _enviar_cancelacion,
+    'reprogramacion': _enviar_reprogramacion,
+    'confirmacion_reprogramacion': _enviar_confirmacion_reprogramacion,
+    'derivacion': _enviar_derivacion,
+}
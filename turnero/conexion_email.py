@@ -0,0 +1,167 @@
+"""
+Conexión SMTP persistente por worker.
+
+Antes cada email abría una conexión nueva (TCP + STARTTLS + login), mandaba
+un mensaje y la cerraba. get_conexion retorna un backend que queda abierto
+en el hilo que lo usa y se reutiliza para los siguientes envíos, así un lote
+de procesar_emails o de recordatorios paga un solo handshake.
+
+- Se reconecta solo: si el servidor cortó la conexión (inactividad, reinicio)
+  el envío se reintenta una vez sobre una conexión nueva.
+- Se recicla al pasar SEGUNDOS_INACTIVIDAD sin uso (los servidores cortan las
+  conexiones ociosas) o MAX_MENSAJES_POR_CONEXION envíos (Outlook y otros
+  limitan los mensajes por sesión).
+- Cambiar la configuración de correo (EmailConfig) invalida el cache y la
+  próxima llamada abre la conexión con los datos nuevos.
+
+Los comandos de larga duración llaman a cerrar_conexion() al terminar.
+Para envíos en paralelo (recordatorios), PoolConexiones reparte N conexiones
+persistentes entre los hilos.
+"""
+import logging
+import queue
+import smtplib
+import threading
+import time
+
+from django.core.mail.backends.smtp import EmailBackend
+
+logger = logging.getLogger(__name__)
+
+SEGUNDOS_INACTIVIDAD = 60
+MAX_MENSAJES_POR_CONEXION = 100
+TIMEOUT_SEGUNDOS = 30
+
+# Errores de una conexión que el servidor ya cerró: el mensaje no salió y se
+# puede reintentar sin riesgo de duplicarlo
+ERRORES_CONEXION = (smtplib.SMTPServerDisconnected, ConnectionError)
+
+_local = threading.local()
+
+
+class EmailBackendPersistente(EmailBackend):
+    """
+    EmailBackend SMTP que no cierra la conexión después de cada envío.
+    Sirve tanto para EmailMessage (send_messages) como para mensajes MIME ya
+    armados (enviar_mime).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ultimo_uso = 0.0
+        self.mensajes_enviados = 0
+
+    def _conexion_vencida(self):
+        return (time.monotonic() - self.ultimo_uso > SEGUNDOS_INACTIVIDAD
+                or self.mensajes_enviados >= MAX_MENSAJES_POR_CONEXION)
+
+    def _asegurar_conexion(self):
+        if self.connection and self._conexion_vencida():
+            self.close()
+        if not self.connection:
+            self.open()
+            self.mensajes_enviados = 0
+
+    def _enviar(self, enviar):
+        """Ejecuta `enviar` sobre la conexión abierta; si se cayó, reconecta y reintenta una vez"""
+        with self._lock:
+            self._asegurar_conexion()
+            try:
+                resultado = enviar()
+            except ERRORES_CONEXION as e:
+                logger.info(f"Conexión SMTP caída ({e}), reconectando")
+                self.close()
+                self.open()
+                self.mensajes_enviados = 0
+                try:
+                    resultado = enviar()
+                except Exception:
+                    self.close()
+                    raise
+            except Exception:
+                # Estado de la sesión SMTP incierto: el próximo envío reconecta
+                self.close()
+                raise
+            self.ultimo_uso = time.monotonic()
+            self.mensajes_enviados += 1
+            return resultado
+
+    def close(self):
+        try:
+            super().close()
+        except smtplib.SMTPException:
+            # La conexión ya no sirve: se descarta igual
+            self.connection = None
+
+    def send_messages(self, email_messages):
+        enviados = 0
+        for message in email_messages:
+            if self._enviar(lambda: self._send(message)):
+                enviados += 1
+        return enviados
+
+    def enviar_mime(self, from_email, destinatarios, mensaje):
+        """Envía un mensaje MIME ya armado (multipart con imágenes inline)"""
+        self._enviar(lambda: self.connection.sendmail(from_email, destinatarios, mensaje.as_string()))
+
+
+def _firma(email_config):
+    return (email_config.pk, email_config.email_host, email_config.email_port,
+            email_config.email_host_user, email_config.email_host_password,
+            email_config.email_use_tls)
+
+
+def _crear_backend(email_config):
+    return EmailBackendPersistente(
+        host=email_config.email_host,
+        port=email_config.email_port,
+        username=email_config.email_host_user,
+        password=email_config.email_host_password,
+        use_tls=email_config.email_use_tls,
+        timeout=TIMEOUT_SEGUNDOS,
+    )
+
+
+def get_conexion(email_config):
+    """Backend persistente de este hilo para la configuración dada"""
+    actual = getattr(_local, 'conexion', None)
+    if actual is not None and actual[0] == _firma(email_config):
+        return actual[1]
+
+    cerrar_conexion()
+    backend = _crear_backend(email_config)
+    _local.conexion = (_firma(email_config), backend)
+    return backend
+
+
+def cerrar_conexion():
+    """Cierra la conexión de este hilo, si hay una abierta"""
+    actual = getattr(_local, 'conexion', None)
+    _local.conexion = None
+    if actual is not None:
+        actual[1].close()
+
+
+class PoolConexiones:
+    """
+    `tamano` conexiones persistentes compartidas entre hilos: cada envío toma
+    una libre (o espera a que se libere), así nunca hay más de `tamano`
+    sesiones SMTP abiertas. Las conexiones se abren con el primer envío.
+    """
+
+    def __init__(self, email_config, tamano):
+        self._libres = queue.Queue()
+        self._todas = [_crear_backend(email_config) for _ in range(max(tamano, 1))]
+        for backend in self._todas:
+            self._libres.put(backend)
+
+    def enviar_mime(self, from_email, destinatarios, mensaje):
+        backend = self._libres.get()
+        try:
+            backend.enviar_mime(from_email, destinatarios, mensaje)
+        finally:
+            self._libres.put(backend)
+
+    def cerrar(self):
+        for backend in self._todas:
+            backend.close()
@@ -0,0 +1,90 @@
+"""
+Armado de los emails de turnos que se envían al cliente.
+
+- Contenido: templates Django en templates/turnero/emails/ (<nombre>.html
+  extiende base.html; <nombre>.txt es la versión texto plano). El loader de
+  Django los compila una vez por proceso; precargar() lo hace por adelantado
+  para los envíos en lote.
+- Logo: la parte MIME, ya codificada en base64, se arma una sola vez por
+  proceso y se comparte entre mensajes. Se usa static/assets/rtv_email.png,
+  una copia de 160 px del logo (se muestra a 80 px): el original pesa 1,3 MB
+  y se codificaba y adjuntaba en cada email.
+- armar_mensaje: el único armado multipart (related > alternative + imágenes
+  inline) que usan todos los emails de turnos.
+
+`python manage.py medir_emails` mide cuántos mensajes por segundo se arman.
+"""
+import os
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from django.conf import settings
+from django.template.loader import get_template
+
+PLANTILLAS = ('turno', 'solicitud_cancelacion', 'cancelacion', 'reprogramacion', 'confirmacion_reprogramacion')
+LOGOS = ('rtv_email.png', 'rtv_mejorado.png')
+
+# Parte MIME del logo (None si no hay archivo), armada en el primer uso
+_logo = {}
+
+
+def render_email(nombre, contexto):
+    """Retorna (texto, html) del email `nombre` con el contexto dado"""
+    texto = get_template(f'turnero/emails/{nombre}.txt').render(contexto)
+    html = get_template(f'turnero/emails/{nombre}.html').render(contexto)
+    return texto, html
+
+
+def parte_logo():
+    """Imagen inline del logo (Content-ID logo_rtv), compartida por todos los mensajes"""
+    if 'parte' not in _logo:
+        parte = None
+        for archivo in LOGOS:
+            try:
+                with open(os.path.join(settings.BASE_DIR, 'static', 'assets', archivo), 'rb') as f:
+                    parte = MIMEImage(f.read())
+            except OSError:
+                continue
+            parte.add_header('Content-ID', '<logo_rtv>')
+            parte.add_header('Content-Disposition', 'inline', filename='logo_rtv.png')
+            break
+        _logo['parte'] = parte
+    return _logo['parte']
+
+
+def armar_mensaje(asunto, from_email, to_email, texto, html, qr_data=None, nombre_qr='qr_turno.png'):
+    """
+    Mensaje multipart listo para connection.enviar_mime: texto + HTML, logo
+    y (opcional) QR inline, referenciados desde el HTML como cid:logo_rtv y
+    cid:qr_code.
+    """
+    mensaje = MIMEMultipart('related')
+    mensaje['Subject'] = asunto
+    mensaje['From'] = from_email
+    mensaje['To'] = to_email
+
+    alternativa = MIMEMultipart('alternative')
+    alternativa.attach(MIMEText(texto, 'plain', 'utf-8'))
+    alternativa.attach(MIMEText(html, 'html', 'utf-8'))
+    mensaje.attach(alternativa)
+
+    logo = parte_logo()
+    if logo is not None:
+        mensaje.attach(logo)
+
+    if qr_data:
+        qr = MIMEImage(qr_data)
+        qr.add_header('Content-ID', '<qr_code>')
+        qr.add_header('Content-Disposition', 'inline', filename=nombre_qr)
+        mensaje.attach(qr)
+
+    return mensaje
+
+
+def precargar():
+    """Compila los templates y arma el logo antes de un envío en lote"""
+    for nombre in PLANTILLAS:
+        get_template(f'turnero/emails/{nombre}.txt')
+        get_template(f'turnero/emails/{nombre}.html')
+    parte_logo()
@@ -0,0 +1,117 @@
+"""
+Comando de Django para enviar los recordatorios por email de los turnos de
+mañana (PENDIENTE y sin recordatorio_enviado). Envía en lotes, en paralelo
+por conexiones SMTP persistentes, y marca cada lote al terminarlo: se puede
+cortar (Ctrl+C / SIGTERM termina el lote en curso) y volver a correr sin
+repetir envíos.
+
+Uso:
+    python manage.py enviar_recordatorios                       # Turnos de mañana
+    python manage.py enviar_recordatorios --fecha 2025-03-10    # Otra fecha
+    python manage.py enviar_recordatorios --dry-run             # Listar sin enviar
+    python manage.py enviar_recordatorios --loop                # Worker continuo (cada 10 min)
+    python manage.py enviar_recordatorios --lote 200 --concurrencia 8
+
+Para automatizar con cron (cada hora; los turnos agendados durante el día
+también reciben su recordatorio):
+    0 * * * * cd /ruta/proyecto && python manage.py enviar_recordatorios
+"""
+
+import signal
+import threading
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from turnero.recordatorios import (
+    CONCURRENCIA_POR_DEFECTO, LOTE_POR_DEFECTO, RecordatoriosEnCurso,
+    enviar_recordatorios, turnos_a_recordar,
+)
+
+
+class Command(BaseCommand):
+    help = 'Envía por email los recordatorios de los turnos de mañana'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fecha',
+            type=date.fromisoformat,
+            help='Fecha de los turnos (AAAA-MM-DD); por defecto mañana',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Listar los turnos que recibirían recordatorio, sin enviar',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Ejecutar en forma continua',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=600,
+            help='Segundos entre pasadas en modo --loop (por defecto 600)',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=LOTE_POR_DEFECTO,
+            help=f'Turnos por lote (por defecto {LOTE_POR_DEFECTO})',
+        )
+        parser.add_argument(
+            '--concurrencia',
+            type=int,
+            default=CONCURRENCIA_POR_DEFECTO,
+            help=f'Conexiones SMTP en paralelo (por defecto {CONCURRENCIA_POR_DEFECTO})',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self._listar(options['fecha'] or self._manana())
+            return
+
+        # Ctrl+C / SIGTERM: terminar el lote en curso, marcarlo y salir
+        detener = threading.Event()
+        for senal in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(senal, lambda *_: detener.set())
+
+        lote = max(options['lote'], 1)
+        concurrencia = max(options['concurrencia'], 1)
+        while True:
+            fecha = options['fecha'] or self._manana()
+            try:
+                resumen = enviar_recordatorios(fecha, lote=lote, concurrencia=concurrencia, detener=detener)
+            except RecordatoriosEnCurso:
+                raise CommandError('Ya hay otra corrida de recordatorios en curso.')
+            if resumen['enviados'] or resumen['fallidos'] or not options['loop']:
+                self._informar(fecha, resumen)
+
+            if not options['loop'] or detener.wait(max(options['intervalo'], 1)):
+                break
+
+        if detener.is_set():
+            self.stdout.write(self.style.WARNING('Envío de recordatorios detenido.'))
+
+    def _manana(self):
+        return timezone.localdate() + timedelta(days=1)
+
+    def _listar(self, fecha):
+        turnos = list(turnos_a_recordar(fecha))
+        self.stdout.write(self.style.WARNING(
+            f'[DRY-RUN] {len(turnos)} turno(s) del {fecha:%d/%m/%Y} recibirían recordatorio:'
+        ))
+        for turno in turnos:
+            self.stdout.write(
+                f'  - {turno.codigo} | {turno.hora_inicio:%H:%M} | {turno.taller.get_nombre()} | {turno.cliente.email}'
+            )
+
+    def _informar(self, fecha, resumen):
+        estilo = self.style.SUCCESS if not resumen['fallidos'] else self.style.WARNING
+        self.stdout.write(estilo(
+            f'Recordatorios del {fecha:%d/%m/%Y}: {resumen["enviados"]} enviado(s), '
+            f'{resumen["fallidos"]} con error, en {resumen["segundos"]} s '
+            f'({resumen["por_minuto"]} por minuto).'
+        ))
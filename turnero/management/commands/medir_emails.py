@@ -0,0 +1,94 @@
+"""
+Comando de Django para medir el armado de los emails de turnos (micro-benchmark).
+Para cada template de turnero/emails mide cuántos mensajes por segundo se
+renderizan (texto + HTML) y cuántos se arman completos (MIME serializado,
+con el logo inline). No envía nada ni modifica la base.
+
+Uso:
+    python manage.py medir_emails                  # 500 mensajes por template
+    python manage.py medir_emails --cantidad 2000
+    python manage.py medir_emails --turno 123      # Con los datos de un turno real
+"""
+
+import time
+from datetime import date, time as hora
+
+from django.core.management.base import BaseCommand, CommandError
+
+from clientes.models import Cliente
+from talleres.models import Taller, TipoVehiculo, Vehiculo
+from turnero.emails import PLANTILLAS, armar_mensaje, precargar, render_email
+from turnero.models import Turno
+from turnero.utils import format_fecha_legible
+
+
+class Command(BaseCommand):
+    help = 'Mide cuántos emails de turnos por segundo se renderizan y arman'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cantidad',
+            type=int,
+            default=500,
+            help='Mensajes por template (por defecto 500)',
+        )
+        parser.add_argument(
+            '--turno',
+            type=int,
+            help='ID de un turno existente para usar sus datos (por defecto, un turno de ejemplo en memoria)',
+        )
+
+    def handle(self, *args, **options):
+        cantidad = max(options['cantidad'], 1)
+        turno = self._turno(options['turno'])
+        contexto = {
+            'turno': turno,
+            'motivo': 'confirmacion',
+            'fecha_legible': format_fecha_legible(turno.fecha),
+            'incluir_qr': False,
+            'cancelar_url': 'https://ejemplo.com/turnero/cancelar/token/',
+            'reprogramar_url': 'https://ejemplo.com/turnero/reprogramar/token/',
+            'nuevo_turno_url': 'https://ejemplo.com/turnero/paso1/',
+            'consultar_url': 'https://ejemplo.com/turnero/consultar/',
+        }
+
+        inicio = time.perf_counter()
+        precargar()
+        self.stdout.write(f'Precarga (templates + logo): {(time.perf_counter() - inicio) * 1000:.1f} ms')
+
+        self.stdout.write(f'{"Template":<30} {"render/s":>10} {"mensaje/s":>10} {"KB":>7}')
+        for nombre in PLANTILLAS:
+            inicio = time.perf_counter()
+            for _ in range(cantidad):
+                texto, html = render_email(nombre, contexto)
+            por_segundo_render = cantidad / (time.perf_counter() - inicio)
+
+            inicio = time.perf_counter()
+            for _ in range(cantidad):
+                texto, html = render_email(nombre, contexto)
+                serializado = armar_mensaje('Asunto', 'rtv@ejemplo.com', 'cliente@ejemplo.com', texto, html).as_string()
+            por_segundo_mensaje = cantidad / (time.perf_counter() - inicio)
+
+            self.stdout.write(
+                f'{nombre:<30} {por_segundo_render:>10.0f} {por_segundo_mensaje:>10.0f} {len(serializado) / 1024:>7.1f}'
+            )
+
+    def _turno(self, turno_id):
+        if turno_id:
+            try:
+                return Turno.objects.select_related(
+                    'cliente', 'vehiculo', 'taller__planta', 'tipo_vehiculo').get(pk=turno_id)
+            except Turno.DoesNotExist:
+                raise CommandError(f'No existe el turno {turno_id}')
+
+        # Turno de ejemplo sin guardar: no toca la base
+        return Turno(
+            codigo='TRN-EJEMPLO',
+            cliente=Cliente(nombre='Juana', apellido='Pérez', email='cliente@ejemplo.com'),
+            vehiculo=Vehiculo(dominio='AB123CD', marca='Ford', modelo='Fiesta'),
+            taller=Taller(nombre='Taller Central', direccion='Av. Siempreviva 742', telefono='3492-000000'),
+            tipo_vehiculo=TipoVehiculo(nombre='Livianos'),
+            fecha=date(2025, 3, 10),
+            hora_inicio=hora(9, 0),
+            hora_fin=hora(9, 30),
+        )
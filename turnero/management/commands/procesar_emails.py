@@ -0,0 +1,69 @@
+"""
+Comando de Django para enviar los emails encolados (outbox EmailPendiente).
+Las vistas de turnos y el asistente solo encolan: este worker arma y envía
+cada email por SMTP, reintenta los que fallan con backoff exponencial y
+descarta los que agotan los intentos (quedan como FALLIDO en el admin).
+La conexión SMTP queda abierta entre lotes (ver turnero.conexion_email).
+
+Uso:
+    python manage.py procesar_emails                      # Una pasada
+    python manage.py procesar_emails --loop               # Worker continuo (cada 5 s)
+    python manage.py procesar_emails --loop --intervalo 2 --lote 100
+
+En producción conviene correrlo con --loop bajo Supervisor/systemd. Con cron
+(cada minuto) los emails salen con hasta un minuto de demora:
+    * * * * * cd /ruta/proyecto && python manage.py procesar_emails
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from turnero.cola_emails import procesar_pendientes
+from turnero.conexion_email import cerrar_conexion
+
+
+class Command(BaseCommand):
+    help = 'Envía los emails pendientes de la cola (confirmaciones, cancelaciones, derivaciones)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Ejecutar en forma continua',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=5,
+            help='Segundos de espera cuando la cola está vacía en modo --loop (por defecto 5)',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=50,
+            help='Cantidad máxima de emails tomados por pasada (por defecto 50)',
+        )
+
+    def handle(self, *args, **options):
+        intervalo = max(options['intervalo'], 1)
+        lote = max(options['lote'], 1)
+
+        if not options['loop']:
+            enviados, con_error = procesar_pendientes(lote=lote)
+            cerrar_conexion()
+            self.stdout.write(self.style.SUCCESS(f'{enviados} email(s) enviado(s), {con_error} con error.'))
+            return
+
+        self.stdout.write(f'Procesando la cola de emails cada {intervalo} s (Ctrl+C para detener)')
+        try:
+            while True:
+                enviados, con_error = procesar_pendientes(lote=lote)
+                if enviados or con_error:
+                    self.stdout.write(f'{enviados} email(s) enviado(s), {con_error} con error')
+                # Si el lote vino lleno puede haber más pendientes: seguir sin esperar
+                if enviados + con_error < lote:
+                    time.sleep(intervalo)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Worker de emails detenido.'))
+        finally:
+            cerrar_conexion()
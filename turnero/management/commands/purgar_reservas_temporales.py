@@ -0,0 +1,63 @@
+"""
+Comando de Django para purgar las reservas temporales expiradas.
+Las vistas ya ignoran las reservas vencidas (filtran por expira_at), por lo que
+la purga no se hace en cada request: este comando las elimina en lotes y
+descuenta los contadores del ledger SlotCapacidad.
+Con TURNERO_RESERVAS_BACKEND = 'cache' las reservas expiran solas por TTL y
+este comando no tiene nada que purgar.
+
+Uso:
+    python manage.py purgar_reservas_temporales                  # Una pasada
+    python manage.py purgar_reservas_temporales --loop           # Barrido continuo (cada 60 s)
+    python manage.py purgar_reservas_temporales --loop --intervalo 30 --lote 500
+
+Para automatizar con cron (cada 5 minutos):
+    */5 * * * * cd /ruta/proyecto && python manage.py purgar_reservas_temporales
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from turnero.models import ReservaTemporal
+
+
+class Command(BaseCommand):
+    help = 'Elimina en lotes las reservas temporales expiradas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Ejecutar en forma continua',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=60,
+            help='Segundos entre barridos en modo --loop (por defecto 60)',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Cantidad máxima de reservas eliminadas por sentencia (por defecto 1000)',
+        )
+
+    def handle(self, *args, **options):
+        intervalo = max(options['intervalo'], 1)
+        lote = max(options['lote'], 1)
+
+        if not options['loop']:
+            eliminadas = ReservaTemporal.limpiar_expiradas(lote=lote)
+            self.stdout.write(self.style.SUCCESS(f'{eliminadas} reserva(s) temporal(es) expirada(s) eliminada(s).'))
+            return
+
+        self.stdout.write(f'Barrido de reservas temporales cada {intervalo} s (Ctrl+C para detener)')
+        try:
+            while True:
+                eliminadas = ReservaTemporal.limpiar_expiradas(lote=lote)
+                if eliminadas:
+                    self.stdout.write(f'{eliminadas} reserva(s) expirada(s) eliminada(s)')
+                time.sleep(intervalo)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Barrido detenido.'))
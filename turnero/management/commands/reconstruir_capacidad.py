@@ -0,0 +1,74 @@
+"""
+Comando de Django para reconstruir el ledger de capacidad de slots (SlotCapacidad).
+Recalcula desde cero los contadores de turnos y reservas temporales por
+taller/tipo de trámite/fecha/hora.
+
+Uso:
+    python manage.py reconstruir_capacidad              # Reconstruir
+    python manage.py reconstruir_capacidad --dry-run    # Solo mostrar diferencias
+    python manage.py reconstruir_capacidad --si-hace-falta  # Reconstruir solo si hay diferencias
+
+Es obligatorio después de desplegar el ledger por primera vez: con el ledger
+vacío los turnos existentes no ocupan cupo. deploy.sh corre --si-hace-falta
+en cada deploy (antes y después de reiniciar el servicio) y se detiene si
+falla. También sirve si se sospecha de contadores desincronizados (ej:
+cambios hechos directamente en la base).
+La reconstrucción bloquea contra escrituras las tablas de turnos, reservas
+temporales y el ledger mientras dura: las reservas en curso esperan. Con
+--si-hace-falta solo se toma ese bloqueo si el ledger no coincide.
+"""
+
+from django.core.management.base import BaseCommand
+from turnero.models import SlotCapacidad
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el ledger SlotCapacidad desde los turnos y reservas temporales'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Simular sin hacer cambios reales',
+        )
+        parser.add_argument(
+            '--si-hace-falta',
+            action='store_true',
+            help='Reconstruir solo si el ledger está vacío o no coincide con los turnos y reservas',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        if dry_run:
+            diferencias = SlotCapacidad.diferencias()
+            if not diferencias:
+                self.stdout.write(self.style.SUCCESS('[DRY-RUN] El ledger coincide con los turnos y reservas.'))
+                return
+            self.stdout.write(self.style.WARNING(
+                f'[DRY-RUN] {len(diferencias)} slot(s) con diferencias (reservados+retenidos, ledger -> real):'
+            ))
+            for (taller_id, tipo_vehiculo_id, fecha, hora_inicio), actual, real in diferencias:
+                self.stdout.write(
+                    f'  - Taller {taller_id} | Tipo {tipo_vehiculo_id} | {fecha:%d/%m/%Y} {hora_inicio:%H:%M} | '
+                    f'{actual[0]}+{actual[1]} -> {real[0]}+{real[1]}'
+                )
+            return
+
+        existentes = SlotCapacidad.objects.count()
+        if options['si_hace_falta']:
+            diferencias = SlotCapacidad.diferencias()
+            if not diferencias:
+                self.stdout.write(self.style.SUCCESS(
+                    f'El ledger coincide con los turnos y reservas ({existentes} slot(s)); no se reconstruye.'
+                ))
+                return
+            self.stdout.write(self.style.WARNING(
+                f'{len(diferencias)} slot(s) con diferencias: reconstruyendo el ledger...'
+            ))
+
+        total = SlotCapacidad.reconstruir()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Ledger reconstruido: {total} slot(s) (antes: {existentes}).'
+        ))
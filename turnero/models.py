@@ -1,15 +1,21 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils import timezone
 from clientes.models import Cliente
 from territorios.models import Localidad
 from django.contrib.auth.models import User
 from talleres.models import Taller, TipoVehiculo, Vehiculo
+import logging
 import secrets
 import qrcode
 from io import BytesIO
 from django.core.files import File
 from PIL import Image, ImageDraw
 
+logger = logging.getLogger(__name__)
+
 
 class Turno(models.Model):
     """Turnos agendados para revisiones técnicas"""
@@ -167,16 +173,47 @@ class Turno(models.Model):
         verbose_name = "Turno"
         verbose_name_plural = "Turnos"
         ordering = ['-fecha', '-hora_inicio']
-        unique_together = ['taller', 'fecha', 'hora_inicio']
+        # La capacidad por slot (turnos_simultaneos de cada tipo) se controla con el
+        # ledger SlotCapacidad bloqueado en turnero.reservas, no con una restricción única
         indexes = [
             models.Index(fields=['fecha', 'taller']),
+            models.Index(fields=['taller', 'tipo_vehiculo', 'fecha', 'hora_inicio']),
             models.Index(fields=['codigo']),
             models.Index(fields=['estado']),
         ]
 
+    # Estados que ocupan un cupo en el ledger SlotCapacidad
+    ESTADOS_OCUPAN_CUPO = ('PENDIENTE', 'CONFIRMADO')
+    CAMPOS_SLOT = {'taller', 'taller_id', 'tipo_vehiculo', 'tipo_vehiculo_id', 'fecha', 'hora_inicio', 'estado'}
+
+    # Slot que el turno ocupaba al cargarse desde la base (None si no ocupa cupo)
+    _slot_original = None
+
     def __str__(self):
         return f"{self.codigo} - {self.vehiculo.dominio} - {self.fecha} {self.hora_inicio}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if not instance.get_deferred_fields() & cls.CAMPOS_SLOT:
+            instance._slot_original = instance.slot_ocupado()
+        return instance
+
+    def slot_ocupado(self):
+        """
+        Retorna la clave (taller_id, tipo_vehiculo_id, fecha, hora_inicio) del cupo
+        que ocupa el turno, o None si por su estado no ocupa cupo.
+        """
+        if self.estado not in self.ESTADOS_OCUPAN_CUPO or not self.tipo_vehiculo_id:
+            return None
+        campo = self._meta.get_field
+        return (
+            campo('taller').to_python(self.taller_id),
+            campo('tipo_vehiculo').to_python(self.tipo_vehiculo_id),
+            campo('fecha').to_python(self.fecha),
+            campo('hora_inicio').to_python(self.hora_inicio),
+        )
+
     def save(self, *args, **kwargs):
         """Override para generar código y token automáticamente"""
         update_fields = kwargs.get('update_fields')
@@ -191,11 +228,16 @@ class Turno(models.Model):
             if not self.token_cancelacion:
                 self.token_cancelacion = secrets.token_urlsafe(32)
 
-        super().save(*args, **kwargs)
+        # El turno y el ledger de capacidad se actualizan en la misma transacción
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is None or self.CAMPOS_SLOT & set(update_fields):
+                slot_nuevo = self.slot_ocupado()
+                if slot_nuevo != self._slot_original:
+                    SlotCapacidad.mover(self._slot_original, slot_nuevo, campo='reservados')
+                    self._slot_original = slot_nuevo
 
-        # Generar QR solo si es nuevo y no estamos haciendo update parcial
-        if update_fields is None and not self.qr_code:
-            self.generar_qr()
+        # El QR no se genera acá: se arma en el primer acceso (ver obtener_qr)
 
     @staticmethod
     def generar_token_verificacion(codigo):
@@ -250,9 +292,32 @@ class Turno(models.Model):
         img.save(buffer, format='PNG')
         buffer.seek(0)
 
-        # Guardar en el modelo
+        # Guardar el archivo y solo la columna qr_code (sin pasar por save())
         filename = f'turno_{self.codigo}.png'
-        self.qr_code.save(filename, File(buffer), save=True)
+        self.qr_code.save(filename, File(buffer), save=False)
+        Turno.objects.filter(pk=self.pk).update(qr_code=self.qr_code.name)
+
+    def obtener_qr(self):
+        """
+        QR del turno, generado en el primer acceso y no al crear el turno (la
+        reserva no paga el armado del PNG). El archivo queda en MEDIA_ROOT y se
+        reutiliza. Lo usan los templates ({{ turno.obtener_qr.url }}) y los
+        emails; retorna el campo qr_code, vacío si no se pudo generar.
+        """
+        if self.qr_code or not self.pk:
+            return self.qr_code
+
+        nombre = self.qr_code.field.generate_filename(self, f'turno_{self.codigo}.png')
+        try:
+            if self.qr_code.storage.exists(nombre):
+                # Ya generado por otro proceso (el worker de emails o una vista)
+                self.qr_code.name = nombre
+                Turno.objects.filter(pk=self.pk).update(qr_code=nombre)
+            else:
+                self.generar_qr()
+        except Exception as e:
+            logger.error(f"No se pudo generar el QR del turno {self.codigo}: {e}")
+        return self.qr_code
 
     def generar_token_reprogramacion(self):
         """Genera un token único para reprogramar el turno con expiración de 48 horas"""
@@ -447,32 +512,67 @@ class ReservaTemporal(models.Model):
     def __str__(self):
         return f"Reserva {self.taller.get_nombre()} - {self.fecha} {self.hora_inicio} (expira: {self.expira_at})"
 
+    def slot(self):
+        """Clave (taller_id, tipo_vehiculo_id, fecha, hora_inicio) del slot retenido"""
+        if not self.tipo_vehiculo_id:
+            return None
+        return (self.taller_id, self.tipo_vehiculo_id, self.fecha, self.hora_inicio)
+
     @property
     def esta_activa(self):
         """Verifica si la reserva aún está vigente"""
         return timezone.now() < self.expira_at
 
     @classmethod
-    def limpiar_expiradas(cls):
-        """Elimina todas las reservas expiradas"""
-        return cls.objects.filter(expira_at__lt=timezone.now()).delete()
+    def eliminar(cls, queryset):
+        """
+        Elimina las reservas del queryset con un único DELETE y las descuenta del
+        contador de retenidos del ledger con una actualización por slot.
+        Retorna la cantidad de reservas eliminadas.
+        """
+        from django.db.models import Count
+
+        with transaction.atomic():
+            por_slot = list(
+                queryset.filter(tipo_vehiculo__isnull=False)
+                .values('taller_id', 'tipo_vehiculo_id', 'fecha', 'hora_inicio')
+                .annotate(total=Count('id')).order_by()
+            )
+            eliminadas, _ = queryset.delete()
+            for fila in por_slot:
+                slot = (fila['taller_id'], fila['tipo_vehiculo_id'], fila['fecha'], fila['hora_inicio'])
+                SlotCapacidad.ajustar(slot, 'retenidos', -fila['total'])
+        return eliminadas
+
+    @classmethod
+    def limpiar_expiradas(cls, lote=1000):
+        """
+        Elimina las reservas expiradas en lotes de hasta `lote` filas.
+        No se ejecuta en el request: las lecturas filtran por expira_at y la
+        purga la hace el comando purgar_reservas_temporales.
+        Retorna la cantidad total de reservas eliminadas.
+        """
+        total = 0
+        while True:
+            ids = list(
+                cls.objects.filter(expira_at__lte=timezone.now())
+                .order_by('expira_at').values_list('id', flat=True)[:lote]
+            )
+            if not ids:
+                return total
+            total += cls.eliminar(cls.objects.filter(id__in=ids))
 
     @classmethod
     def contar_reservas_activas(cls, taller, tipo_vehiculo, fecha, hora_inicio, excluir_session=None):
         """
         Cuenta las reservas temporales activas para un slot específico.
         Opcionalmente excluye una sesión específica (la del usuario actual).
+        Con TURNERO_RESERVAS_BACKEND = 'cache' es una única lectura del cache.
         """
-        qs = cls.objects.filter(
-            taller=taller,
-            tipo_vehiculo=tipo_vehiculo,
-            fecha=fecha,
-            hora_inicio=hora_inicio,
-            expira_at__gt=timezone.now()
-        )
-        if excluir_session:
-            qs = qs.exclude(session_key=excluir_session)
-        return qs.count()
+        from .reservas_temporales import obtener_backend
+
+        slot = (getattr(taller, 'pk', taller), getattr(tipo_vehiculo, 'pk', tipo_vehiculo), fecha, hora_inicio)
+        return obtener_backend().contar(slot, excluir_session=excluir_session)
 
     @classmethod
     def crear_o_actualizar(cls, taller, tipo_vehiculo, fecha, hora_inicio, session_key, minutos_expiracion=10):
@@ -480,23 +580,264 @@ class ReservaTemporal(models.Model):
         Crea o actualiza una reserva temporal para un slot.
         Si ya existe una reserva de esta sesión, la actualiza.
         Si es un nuevo slot, elimina reservas anteriores de esta sesión.
+        No verifica cupos: para eso usar turnero.reservas.retener_slot.
         """
-        from datetime import timedelta
-
-        # Limpiar reservas expiradas primero
-        cls.limpiar_expiradas()
+        from .reservas_temporales import obtener_backend
 
+        backend = obtener_backend()
         # Eliminar reservas anteriores de esta sesión (un usuario solo puede reservar un slot a la vez)
-        cls.objects.filter(session_key=session_key).delete()
-
-        # Crear nueva reserva
-        expira_at = timezone.now() + timedelta(minutes=minutos_expiracion)
-
-        return cls.objects.create(
+        backend.liberar_sesion(session_key)
+        return backend.retener(
             taller=taller,
             tipo_vehiculo=tipo_vehiculo,
             fecha=fecha,
             hora_inicio=hora_inicio,
             session_key=session_key,
-            expira_at=expira_at
+            minutos_expiracion=minutos_expiracion,
         )
+
+
+class SlotCapacidad(models.Model):
+    """
+    Ledger materializado de ocupación por slot.
+    Mantiene contadores de turnos (reservados) y reservas temporales (retenidos)
+    por taller/tipo de trámite/fecha/hora, actualizados en la misma transacción
+    que los cambios de Turno y ReservaTemporal.
+    Se reconstruye con: python manage.py reconstruir_capacidad
+    """
+    taller = models.ForeignKey(
+        Taller,
+        on_delete=models.CASCADE,
+        verbose_name="Taller",
+        related_name='slots_capacidad'
+    )
+    tipo_vehiculo = models.ForeignKey(
+        TipoVehiculo,
+        on_delete=models.CASCADE,
+        verbose_name="Tipo de Trámite"
+    )
+    fecha = models.DateField(verbose_name="Fecha")
+    hora_inicio = models.TimeField(verbose_name="Hora de Inicio")
+
+    reservados = models.IntegerField(
+        default=0,
+        verbose_name="Turnos Reservados",
+        help_text="Turnos PENDIENTE/CONFIRMADO en el slot"
+    )
+    retenidos = models.IntegerField(
+        default=0,
+        verbose_name="Reservas Temporales",
+        help_text="Reservas temporales registradas en el slot (incluye las expiradas aún no purgadas)"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
+
+    class Meta:
+        verbose_name = "Capacidad de Slot"
+        verbose_name_plural = "Capacidad de Slots"
+        unique_together = ['taller', 'tipo_vehiculo', 'fecha', 'hora_inicio']
+        indexes = [
+            models.Index(fields=['taller', 'tipo_vehiculo', 'fecha']),
+        ]
+
+    def __str__(self):
+        return f"{self.taller_id}/{self.tipo_vehiculo_id} {self.fecha} {self.hora_inicio}: {self.reservados}+{self.retenidos}"
+
+    @classmethod
+    def ajustar(cls, slot, campo, delta):
+        """Suma delta al contador indicado del slot (taller_id, tipo_vehiculo_id, fecha, hora_inicio)"""
+        if slot is None or not delta:
+            return
+        taller_id, tipo_vehiculo_id, fecha, hora_inicio = slot
+        filtro = dict(taller_id=taller_id, tipo_vehiculo_id=tipo_vehiculo_id, fecha=fecha, hora_inicio=hora_inicio)
+        cambios = {campo: F(campo) + delta, 'updated_at': timezone.now()}
+
+        # Los descuentos solo aplican sobre filas existentes; los incrementos crean la fila si falta
+        if delta < 0:
+            cls.objects.filter(**filtro).update(**cambios)
+            return
+        fila, _ = cls.objects.get_or_create(**filtro)
+        cls.objects.filter(pk=fila.pk).update(**cambios)
+
+    @classmethod
+    def mover(cls, slot_anterior, slot_nuevo, campo='reservados'):
+        """
+        Libera un cupo del slot anterior y ocupa uno en el nuevo.
+        Las filas se actualizan en el orden de la clave del slot (el mismo que
+        reservas.bloquear_slots): dos movimientos cruzados (A→B y B→A) no se
+        bloquean mutuamente.
+        """
+        cambios = [(slot, delta) for slot, delta in ((slot_anterior, -1), (slot_nuevo, 1)) if slot is not None]
+        for slot, delta in sorted(cambios, key=lambda cambio: cambio[0]):
+            cls.ajustar(slot, campo, delta)
+
+    @classmethod
+    def contar(cls):
+        """
+        Ocupación real por slot calculada desde Turno y ReservaTemporal:
+        {(taller_id, tipo_vehiculo_id, fecha, hora_inicio): [reservados, retenidos]}
+        """
+        from django.db.models import Count
+
+        contadores = {}
+        turnos = Turno.objects.filter(
+            estado__in=Turno.ESTADOS_OCUPAN_CUPO,
+            tipo_vehiculo__isnull=False,
+        ).values('taller_id', 'tipo_vehiculo_id', 'fecha', 'hora_inicio').annotate(total=Count('id')).order_by()
+        for t in turnos:
+            clave = (t['taller_id'], t['tipo_vehiculo_id'], t['fecha'], t['hora_inicio'])
+            contadores.setdefault(clave, [0, 0])[0] = t['total']
+
+        reservas = ReservaTemporal.objects.filter(
+            tipo_vehiculo__isnull=False,
+        ).values('taller_id', 'tipo_vehiculo_id', 'fecha', 'hora_inicio').annotate(total=Count('id')).order_by()
+        for r in reservas:
+            clave = (r['taller_id'], r['tipo_vehiculo_id'], r['fecha'], r['hora_inicio'])
+            contadores.setdefault(clave, [0, 0])[1] = r['total']
+
+        return contadores
+
+    @classmethod
+    def diferencias(cls):
+        """
+        Slots cuyo ledger no coincide con la ocupación real.
+        Retorna una lista de (clave, (reservados, retenidos) del ledger, (reservados, retenidos) reales).
+        """
+        reales = cls.contar()
+        ledger = {
+            (f['taller_id'], f['tipo_vehiculo_id'], f['fecha'], f['hora_inicio']): (f['reservados'], f['retenidos'])
+            for f in cls.objects.values('taller_id', 'tipo_vehiculo_id', 'fecha', 'hora_inicio', 'reservados', 'retenidos')
+        }
+        resultado = []
+        for clave in sorted(set(reales) | set(ledger)):
+            actual = ledger.get(clave, (0, 0))
+            real = tuple(reales.get(clave, (0, 0)))
+            if actual != real:
+                resultado.append((clave, actual, real))
+        return resultado
+
+    @classmethod
+    def _bloquear_tablas(cls):
+        """
+        Bloquea el ledger, Turno y ReservaTemporal contra escrituras hasta el fin
+        de la transacción (las lecturas siguen). Así ninguna reserva se confirma
+        entre el conteo y el reemplazo del ledger. El ledger va primero: las
+        reservas bloquean su fila (verificar_cupo) antes de escribir el turno.
+        Solo PostgreSQL; en SQLite la transacción de escritura ya es exclusiva.
+        """
+        from django.db import connection
+
+        if connection.vendor != 'postgresql':
+            return
+        tablas = ', '.join(
+            connection.ops.quote_name(modelo._meta.db_table)
+            for modelo in (cls, Turno, ReservaTemporal)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {tablas} IN EXCLUSIVE MODE')
+
+    @classmethod
+    def reconstruir(cls):
+        """
+        Reconstruye el ledger completo desde Turno y ReservaTemporal.
+        Cuenta y reemplaza en una misma transacción con las tablas bloqueadas:
+        las reservas concurrentes esperan a que termine.
+        Retorna la cantidad de slots generados.
+        """
+        with transaction.atomic():
+            cls._bloquear_tablas()
+            contadores = cls.contar()
+            cls.objects.all().delete()
+            cls.objects.bulk_create([
+                cls(
+                    taller_id=clave[0],
+                    tipo_vehiculo_id=clave[1],
+                    fecha=clave[2],
+                    hora_inicio=clave[3],
+                    reservados=reservados,
+                    retenidos=retenidos,
+                )
+                for clave, (reservados, retenidos) in contadores.items()
+            ], batch_size=1000)
+
+        return len(contadores)
+
+
+class EmailPendiente(models.Model):
+    """
+    Cola (outbox) de emails transaccionales: confirmación de turno, links de
+    cancelación/reprogramación y derivaciones del asistente.
+    Las vistas solo insertan la fila, en la misma transacción que el turno o el
+    historial; el envío SMTP lo hace el comando procesar_emails, con reintentos
+    y backoff (ver turnero/cola_emails.py).
+    """
+    TIPO_CHOICES = [
+        ('turno', 'Turno (confirmación/recordatorio)'),
+        ('solicitud_cancelacion', 'Link de cancelación'),
+        ('cancelacion', 'Cancelación confirmada'),
+        ('reprogramacion', 'Link de reprogramación'),
+        ('confirmacion_reprogramacion', 'Reprogramación confirmada'),
+        ('derivacion', 'Derivación del asistente'),
+    ]
+
+    ESTADO_CHOICES = [
+        ('PENDIENTE', 'Pendiente'),
+        ('ENVIADO', 'Enviado'),
+        ('FALLIDO', 'Fallido'),
+    ]
+
+    tipo = models.CharField(max_length=30, choices=TIPO_CHOICES, verbose_name="Tipo")
+    turno = models.ForeignKey(
+        Turno,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='emails_pendientes',
+        verbose_name="Turno"
+    )
+    parametros = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Parámetros",
+        help_text="Datos para armar el email (motivo, token, id de derivación, etc.)"
+    )
+    estado = models.CharField(
+        max_length=10,
+        choices=ESTADO_CHOICES,
+        default='PENDIENTE',
+        verbose_name="Estado"
+    )
+    intentos = models.PositiveIntegerField(default=0, verbose_name="Intentos")
+    proximo_intento = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Próximo Intento",
+        help_text="El worker toma los pendientes cuyo próximo intento ya llegó"
+    )
+    ultimo_error = models.TextField(blank=True, verbose_name="Último Error")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
+    enviado_at = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Envío")
+
+    class Meta:
+        verbose_name = "Email Pendiente"
+        verbose_name_plural = "Emails Pendientes"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['estado', 'proximo_intento']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} - {self.turno or self.parametros.get('derivacion_id', '')} ({self.estado})"
+
+
+# Señales para mantener el ledger SlotCapacidad
+@receiver(post_delete, sender=Turno)
+def liberar_cupo_turno(sender, instance, **kwargs):
+    """Libera el cupo del turno eliminado"""
+    SlotCapacidad.ajustar(instance._slot_original, 'reservados', -1)
+
+
+@receiver(post_save, sender=ReservaTemporal)
+def registrar_reserva_temporal(sender, instance, created, **kwargs):
+    """Suma la reserva temporal nueva al contador de retenidos"""
+    if created:
+        SlotCapacidad.ajustar(instance.slot(), 'retenidos', 1)
+
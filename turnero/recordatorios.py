@@ -0,0 +1,168 @@
+"""
+Recordatorios por email de los turnos del día siguiente.
+
+enviar_recordatorios recorre los turnos PENDIENTE de la fecha que todavía no
+tienen recordatorio_enviado, en lotes por id:
+- arma los mensajes en el hilo principal (consultas y lectura del QR), con
+  los templates y el logo precargados (turnero.emails);
+- los envía en paralelo por un PoolConexiones de `concurrencia` conexiones
+  SMTP persistentes;
+- al terminar cada lote marca recordatorio_enviado y registra el historial
+  con dos consultas (update + bulk_create).
+
+Es reanudable: lo ya marcado no se vuelve a tomar, y los que fallaron quedan
+sin marcar para la próxima corrida. Dos corridas no se superponen: en
+PostgreSQL se toma un advisory lock de sesión, compartido por todos los
+procesos y liberado solo si el proceso muere; en otras bases (SQLite, en
+desarrollo) se usa una clave en el cache de Django, que solo excluye corridas
+entre procesos si el cache es compartido. Si se pide detener (evento `detener`,
+ver el comando enviar_recordatorios) se termina el lote en curso, se marca
+y se sale; en el peor caso (proceso matado a mitad de un lote) se repite
+como mucho ese lote.
+"""
+import logging
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+LOTE_POR_DEFECTO = 100
+CONCURRENCIA_POR_DEFECTO = 4
+CLAVE_BLOQUEO = 'turnero:recordatorios:en_curso'
+SEGUNDOS_BLOQUEO = 30 * 60
+# Clave del advisory lock de PostgreSQL (entero de 32 bits estable)
+CLAVE_BLOQUEO_DB = zlib.crc32(CLAVE_BLOQUEO.encode('utf-8'))
+
+
+class RecordatoriosEnCurso(Exception):
+    """Otra corrida de recordatorios está en curso"""
+
+
+def turnos_a_recordar(fecha):
+    """Turnos de la fecha que deben recibir recordatorio"""
+    from .models import Turno
+
+    return (
+        Turno.objects.filter(fecha=fecha, estado='PENDIENTE', recordatorio_enviado=False)
+        .exclude(Q(cliente__email__isnull=True) | Q(cliente__email=''))
+        .select_related('cliente', 'vehiculo', 'taller__planta', 'tipo_vehiculo')
+        .order_by('id')
+    )
+
+
+@contextmanager
+def _bloqueo():
+    """Exclusión entre corridas; lanza RecordatoriosEnCurso si otra tiene el bloqueo"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [CLAVE_BLOQUEO_DB])
+            if not cursor.fetchone()[0]:
+                raise RecordatoriosEnCurso()
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [CLAVE_BLOQUEO_DB])
+        return
+
+    if not cache.add(CLAVE_BLOQUEO, 1, SEGUNDOS_BLOQUEO):
+        raise RecordatoriosEnCurso()
+    try:
+        yield
+    finally:
+        cache.delete(CLAVE_BLOQUEO)
+
+
+def _marcar_enviados(turnos):
+    from .models import HistorialTurno, Turno
+
+    if not turnos:
+        return
+    with transaction.atomic():
+        Turno.objects.filter(id__in=[t.id for t in turnos]).update(recordatorio_enviado=True)
+        HistorialTurno.objects.bulk_create([
+            HistorialTurno(
+                turno=turno,
+                accion='RECORDATORIO_ENVIADO',
+                descripcion=f'Recordatorio enviado a {turno.cliente.email}',
+            )
+            for turno in turnos
+        ])
+
+
+def _enviar_lote(pool, executor, from_email, turnos):
+    """Envía un lote en paralelo. Retorna (enviados, fallidos) como listas de turnos"""
+    from .utils import armar_email_turno
+
+    futuros = []
+    fallidos = []
+    for turno in turnos:
+        try:
+            mensaje = armar_email_turno(turno, from_email, motivo='recordatorio')
+        except Exception as e:
+            logger.error(f"No se pudo armar el recordatorio del turno {turno.codigo}: {e}")
+            fallidos.append(turno)
+            continue
+        futuros.append((turno, executor.submit(pool.enviar_mime, from_email, [turno.cliente.email], mensaje)))
+
+    enviados = []
+    for turno, futuro in futuros:
+        try:
+            futuro.result()
+            enviados.append(turno)
+        except Exception as e:
+            logger.warning(f"Falló el recordatorio del turno {turno.codigo}: {e}")
+            fallidos.append(turno)
+    return enviados, fallidos
+
+
+def enviar_recordatorios(fecha, lote=LOTE_POR_DEFECTO, concurrencia=CONCURRENCIA_POR_DEFECTO, detener=None):
+    """
+    Envía los recordatorios pendientes de `fecha`. Retorna un resumen con
+    enviados, fallidos, segundos, por_minuto e interrumpido. Lanza
+    RecordatoriosEnCurso si otra corrida tiene el bloqueo.
+    """
+    from core.models import EmailConfig
+    from .conexion_email import PoolConexiones
+    from .emails import precargar
+
+    resumen = {'enviados': 0, 'fallidos': 0, 'segundos': 0.0, 'por_minuto': 0.0, 'interrumpido': False}
+    email_config = EmailConfig.get_actual()
+    if email_config is None:
+        logger.warning("No hay configuración de correo: no se envían recordatorios")
+        return resumen
+
+    with _bloqueo():
+        precargar()
+        from_email = email_config.default_from_email or email_config.email_host_user
+        pool = PoolConexiones(email_config, concurrencia)
+        inicio = time.monotonic()
+        ultimo_id = 0
+        try:
+            with ThreadPoolExecutor(max_workers=max(concurrencia, 1)) as executor:
+                while True:
+                    if detener is not None and detener.is_set():
+                        resumen['interrumpido'] = True
+                        break
+                    turnos = list(turnos_a_recordar(fecha).filter(id__gt=ultimo_id)[:lote])
+                    if not turnos:
+                        break
+                    ultimo_id = turnos[-1].id
+
+                    enviados, fallidos = _enviar_lote(pool, executor, from_email, turnos)
+                    _marcar_enviados(enviados)
+                    resumen['enviados'] += len(enviados)
+                    resumen['fallidos'] += len(fallidos)
+        finally:
+            pool.cerrar()
+
+    segundos = time.monotonic() - inicio
+    resumen['segundos'] = round(segundos, 1)
+    resumen['por_minuto'] = round(resumen['enviados'] * 60 / segundos, 1) if segundos else 0.0
+    return resumen
@@ -0,0 +1,162 @@
+"""
+Servicio de reserva de cupos.
+
+Toma cupos de forma atómica bloqueando la fila del slot en el ledger
+SlotCapacidad (SELECT ... FOR UPDATE). Las reservas concurrentes de un mismo
+slot se serializan sobre esa única fila, en lugar de sobrevender o fallar con
+IntegrityError, y la capacidad respetada es la de turnos_simultaneos del tipo.
+
+Cambiar un turno de slot (reprogramar, editar desde el panel) toca dos filas:
+guardar_cambio_slot las bloquea en el orden de la clave del slot, el mismo
+que usa SlotCapacidad.mover, así dos reprogramaciones cruzadas no se
+bloquean mutuamente. Si igual la base aborta la transacción (deadlock o
+falla de serialización, OperationalError), las vistas lo informan como
+horario no disponible.
+
+Las reservas temporales se leen y escriben a través del backend configurado
+(ver reservas_temporales.obtener_backend): tabla ReservaTemporal o cache.
+"""
+from django.db import transaction
+
+from .models import Turno, SlotCapacidad
+from .reservas_temporales import obtener_backend
+
+
+class SlotNoDisponible(Exception):
+    """El slot solicitado ya no tiene cupos disponibles"""
+
+
+def clave_slot(taller, tipo_vehiculo, fecha, hora_inicio):
+    """Arma la clave (taller_id, tipo_vehiculo_id, fecha, hora_inicio) del ledger"""
+    return (
+        getattr(taller, 'pk', taller),
+        getattr(tipo_vehiculo, 'pk', tipo_vehiculo),
+        fecha,
+        hora_inicio,
+    )
+
+
+def verificar_cupo(slot, capacidad, session_key=None, excluir_turno=None, incluir_reservas=True):
+    """
+    Bloquea la fila del slot y verifica que quede al menos un cupo.
+    Debe llamarse dentro de transaction.atomic(); el bloqueo se mantiene hasta
+    el fin de la transacción. Lanza SlotNoDisponible si el slot está completo.
+
+    session_key: no cuenta las reservas temporales de esta sesión
+    excluir_turno: turno en edición que ya ocupa este mismo slot
+    incluir_reservas: False para no contar reservas temporales (carga desde el panel)
+    """
+    taller_id, tipo_vehiculo_id, fecha, hora_inicio = slot
+    fila, _ = SlotCapacidad.objects.select_for_update().get_or_create(
+        taller_id=taller_id,
+        tipo_vehiculo_id=tipo_vehiculo_id,
+        fecha=fecha,
+        hora_inicio=hora_inicio,
+    )
+
+    ocupados = fila.reservados
+    if excluir_turno is not None and excluir_turno._slot_original == slot:
+        ocupados -= 1
+
+    # Reservas temporales vigentes de otros usuarios (con el backend de base de
+    # datos solo se consultan si el ledger las registra)
+    retenidos = 0
+    backend = obtener_backend()
+    if incluir_reservas and (fila.retenidos > 0 or not backend.registra_en_ledger):
+        retenidos = backend.contar(slot, excluir_session=session_key)
+
+    if ocupados + retenidos >= capacidad:
+        raise SlotNoDisponible('El horario seleccionado ya no tiene cupos disponibles')
+
+    return fila
+
+
+def bloquear_slots(*slots):
+    """
+    Bloquea las filas del ledger de los slots indicados (None se ignora), en
+    orden de clave. Debe llamarse dentro de transaction.atomic().
+    """
+    for taller_id, tipo_vehiculo_id, fecha, hora_inicio in sorted({s for s in slots if s is not None}):
+        SlotCapacidad.objects.select_for_update().get_or_create(
+            taller_id=taller_id,
+            tipo_vehiculo_id=tipo_vehiculo_id,
+            fecha=fecha,
+            hora_inicio=hora_inicio,
+        )
+
+
+def guardar_cambio_slot(turno, capacidad, session_key=None, incluir_reservas=True):
+    """
+    Guarda un turno existente que puede haber cambiado de slot, verificando el
+    cupo del slot nuevo. Bloquea primero los dos slots (anterior y nuevo) en
+    orden fijo. Debe llamarse dentro de transaction.atomic(); lanza
+    SlotNoDisponible si el slot nuevo está completo.
+    """
+    slot_nuevo = turno.slot_ocupado()
+    if slot_nuevo and slot_nuevo != turno._slot_original:
+        bloquear_slots(turno._slot_original, slot_nuevo)
+        verificar_cupo(slot_nuevo, capacidad, session_key=session_key, excluir_turno=turno,
+                       incluir_reservas=incluir_reservas)
+    turno.save()
+
+
+def reservar_turno(capacidad, session_key=None, **datos):
+    """
+    Crea un turno tomando su cupo de forma atómica.
+    datos: campos de Turno (taller, tipo_vehiculo, fecha, hora_inicio, ...)
+    Si se indica session_key, la reserva temporal de la sesión se convierte en el turno.
+    """
+    slot = clave_slot(datos['taller'], datos['tipo_vehiculo'], datos['fecha'], datos['hora_inicio'])
+    backend = obtener_backend()
+
+    with transaction.atomic():
+        verificar_cupo(slot, capacidad, session_key=session_key)
+        turno = Turno.objects.create(**datos)
+
+        # La reserva temporal de este slot se libera en la misma transacción
+        if session_key:
+            backend.liberar_sesion(session_key, slot=slot)
+
+    # Cualquier otra reserva de la sesión queda sin efecto
+    if session_key:
+        backend.liberar_sesion(session_key)
+
+    return turno
+
+
+def retener_slot(taller, tipo_vehiculo, fecha, hora_inicio, capacidad, session_key, minutos_expiracion=10):
+    """
+    Crea la reserva temporal de la sesión sobre un slot verificando el cupo.
+    Lanza SlotNoDisponible si no quedan cupos.
+
+    Con el backend de base de datos el cupo se verifica con el slot bloqueado;
+    con el de cache se lee el ledger sin bloqueo y el contador atómico del
+    cache resuelve la concurrencia entre reservas temporales.
+    """
+    backend = obtener_backend()
+
+    # Liberar antes las reservas previas de la sesión (otro slot: otra fila del ledger)
+    backend.liberar_sesion(session_key)
+
+    slot = clave_slot(taller, tipo_vehiculo, fecha, hora_inicio)
+    datos = dict(
+        taller=taller,
+        tipo_vehiculo=tipo_vehiculo,
+        fecha=fecha,
+        hora_inicio=hora_inicio,
+        session_key=session_key,
+        minutos_expiracion=minutos_expiracion,
+    )
+
+    if not backend.registra_en_ledger:
+        ocupados = SlotCapacidad.objects.filter(
+            taller_id=slot[0],
+            tipo_vehiculo_id=slot[1],
+            fecha=slot[2],
+            hora_inicio=slot[3],
+        ).values_list('reservados', flat=True).first() or 0
+        return backend.retener(limite=capacidad - ocupados, **datos)
+
+    with transaction.atomic():
+        verificar_cupo(slot, capacidad, session_key=session_key)
+        return backend.retener(**datos)
@@ -0,0 +1,238 @@
+"""
+Backends de reservas temporales de slots.
+
+Las reservas temporales (retenciones de 10 minutos mientras el usuario completa
+el turno) pueden guardarse en dos lugares, según settings.TURNERO_RESERVAS_BACKEND:
+
+- 'db' (por defecto): tabla ReservaTemporal, contada en el ledger SlotCapacidad.
+- 'cache': cache de Django (settings.TURNERO_RESERVAS_CACHE). Cada slot lleva
+  contadores atómicos por minuto de expiración y cada sesión una clave con TTL,
+  por lo que retener, liberar y contar no escriben en la base de datos.
+
+El backend 'cache' necesita un cache con incr atómico: Redis o Memcached en
+producción (compartido entre workers), o LocMem en desarrollo con un solo
+proceso (con varios workers cada proceso vería solo sus propias reservas).
+FileBased y Database implementan incr como get + set: dos reservas
+simultáneas del último cupo podrían pasar las dos, así que se rechazan
+(ImproperlyConfigured) al crear el backend.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import ReservaTemporal
+
+
+def _id(valor):
+    return getattr(valor, 'pk', valor)
+
+
+class BackendBaseDatos:
+    """Reservas en la tabla ReservaTemporal (el ledger registra los retenidos)"""
+
+    registra_en_ledger = True
+
+    def _filtro_slot(self, slot):
+        taller_id, tipo_vehiculo_id, fecha, hora_inicio = slot
+        return ReservaTemporal.objects.filter(
+            taller_id=taller_id,
+            tipo_vehiculo_id=tipo_vehiculo_id,
+            fecha=fecha,
+            hora_inicio=hora_inicio,
+        )
+
+    def contar(self, slot, excluir_session=None):
+        qs = self._filtro_slot(slot).filter(expira_at__gt=timezone.now())
+        if excluir_session:
+            qs = qs.exclude(session_key=excluir_session)
+        return qs.count()
+
+    def contar_dia(self, taller, tipo_vehiculo, fecha, horas, excluir_session=None):
+        qs = ReservaTemporal.objects.filter(
+            taller_id=_id(taller),
+            tipo_vehiculo_id=_id(tipo_vehiculo),
+            fecha=fecha,
+            expira_at__gt=timezone.now(),
+        )
+        if excluir_session:
+            qs = qs.exclude(session_key=excluir_session)
+
+        filas = qs.values('hora_inicio').annotate(total=Count('id')).order_by()
+        return {(fecha, f['hora_inicio']): f['total'] for f in filas}
+
+    def retener(self, taller, tipo_vehiculo, fecha, hora_inicio, session_key, minutos_expiracion=10, limite=None):
+        """Crea la reserva. El cupo lo verifica el llamador con el slot bloqueado."""
+        return ReservaTemporal.objects.create(
+            taller=taller,
+            tipo_vehiculo=tipo_vehiculo,
+            fecha=fecha,
+            hora_inicio=hora_inicio,
+            session_key=session_key,
+            expira_at=timezone.now() + timedelta(minutes=minutos_expiracion),
+        )
+
+    def liberar_sesion(self, session_key, slot=None):
+        qs = self._filtro_slot(slot) if slot else ReservaTemporal.objects.all()
+        return ReservaTemporal.eliminar(qs.filter(session_key=session_key))
+
+
+class BackendCache:
+    """
+    Reservas en el cache de Django.
+
+    Por slot se guarda un contador por minuto de expiración
+    (turnero:rt:<taller>:<tipo>:<fecha>:<hora>:<minuto>); las reservas activas
+    son la suma de los contadores desde el minuto actual hasta la ventana máxima,
+    leídos con un único get_many. La clave de sesión guarda el slot y el minuto
+    de la reserva de esa sesión para poder liberarla o excluirla del conteo.
+    """
+
+    registra_en_ledger = False
+    prefijo = 'turnero:rt'
+    # Duración máxima de una reserva: define cuántos contadores se leen por slot
+    ventana_minutos = 15
+
+    # Caches cuyo incr no es atómico (o que no guardan nada)
+    caches_no_soportados = (FileBasedCache, DatabaseCache, DummyCache)
+
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+        if isinstance(self.cache, self.caches_no_soportados):
+            raise ImproperlyConfigured(
+                f"TURNERO_RESERVAS_BACKEND='cache' requiere Redis, Memcached o LocMem: el cache "
+                f"{alias!r} ({type(self.cache).__name__}) no tiene incr atómico"
+            )
+
+    def _clave_sesion(self, session_key):
+        return f'{self.prefijo}:s:{session_key}'
+
+    def _clave_contador(self, slot, minuto):
+        taller_id, tipo_vehiculo_id, fecha, hora_inicio = slot
+        return f'{self.prefijo}:{taller_id}:{tipo_vehiculo_id}:{fecha:%Y%m%d}:{hora_inicio:%H%M}:{minuto}'
+
+    def _minutos_vigentes(self):
+        actual = int(time.time() // 60)
+        return range(actual, actual + self.ventana_minutos + 1)
+
+    def _sumar(self, valores, slot, minutos):
+        return sum(max(valores.get(self._clave_contador(slot, m)) or 0, 0) for m in minutos)
+
+    def _propia(self, valores, session_key, slot, minutos):
+        """1 si la reserva vigente de la sesión está en este slot"""
+        reserva = valores.get(self._clave_sesion(session_key)) if session_key else None
+        return int(bool(reserva) and reserva['slot'] == slot and reserva['minuto'] in minutos)
+
+    def contar(self, slot, excluir_session=None):
+        slot = (_id(slot[0]), _id(slot[1]), slot[2], slot[3])
+        minutos = self._minutos_vigentes()
+        claves = [self._clave_contador(slot, m) for m in minutos]
+        if excluir_session:
+            claves.append(self._clave_sesion(excluir_session))
+
+        valores = self.cache.get_many(claves)
+        total = self._sumar(valores, slot, minutos) - self._propia(valores, excluir_session, slot, minutos)
+        return max(total, 0)
+
+    def contar_dia(self, taller, tipo_vehiculo, fecha, horas, excluir_session=None):
+        minutos = self._minutos_vigentes()
+        slots = [(_id(taller), _id(tipo_vehiculo), fecha, hora) for hora in horas]
+        claves = [self._clave_contador(slot, m) for slot in slots for m in minutos]
+        if excluir_session:
+            claves.append(self._clave_sesion(excluir_session))
+
+        valores = self.cache.get_many(claves)
+        reservas = {}
+        for slot in slots:
+            total = self._sumar(valores, slot, minutos) - self._propia(valores, excluir_session, slot, minutos)
+            if total > 0:
+                reservas[(fecha, slot[3])] = total
+        return reservas
+
+    def _incrementar(self, clave, timeout):
+        self.cache.add(clave, 0, timeout)
+        try:
+            self.cache.incr(clave)
+        except ValueError:
+            # El contador expiró entre add e incr
+            self.cache.set(clave, 1, timeout)
+
+    def _decrementar(self, clave):
+        try:
+            self.cache.decr(clave)
+        except ValueError:
+            # El contador ya expiró: no hay nada que descontar
+            pass
+
+    def retener(self, taller, tipo_vehiculo, fecha, hora_inicio, session_key, minutos_expiracion=10, limite=None):
+        """
+        Incrementa el contador del slot y luego verifica el total: si supera el
+        límite (cupos que dejan los turnos) deshace el incremento y lanza
+        SlotNoDisponible. Dos pedidos simultáneos por el último cupo pueden
+        rechazarse ambos, pero nunca se otorgan cupos de más.
+        """
+        from .reservas import SlotNoDisponible
+
+        minutos_expiracion = min(minutos_expiracion, self.ventana_minutos)
+        expira_at = timezone.now() + timedelta(minutes=minutos_expiracion)
+        minuto = int(expira_at.timestamp() // 60)
+        timeout = (minuto + 1) * 60 - int(time.time()) + 5
+
+        slot = (_id(taller), _id(tipo_vehiculo), fecha, hora_inicio)
+        clave = self._clave_contador(slot, minuto)
+        self._incrementar(clave, timeout)
+
+        if limite is not None and self.contar(slot) > limite:
+            self._decrementar(clave)
+            raise SlotNoDisponible('El horario seleccionado ya no tiene cupos disponibles')
+
+        self.cache.set(
+            self._clave_sesion(session_key),
+            {'slot': slot, 'minuto': minuto},
+            timeout,
+        )
+        # Instancia no persistida, para que los llamadores reciban el mismo tipo en ambos backends
+        return ReservaTemporal(
+            taller=taller,
+            tipo_vehiculo=tipo_vehiculo,
+            fecha=fecha,
+            hora_inicio=hora_inicio,
+            session_key=session_key,
+            expira_at=expira_at,
+        )
+
+    def liberar_sesion(self, session_key, slot=None):
+        clave_sesion = self._clave_sesion(session_key)
+        reserva = self.cache.get(clave_sesion)
+        if not reserva or (slot and reserva['slot'] != (_id(slot[0]), _id(slot[1]), slot[2], slot[3])):
+            return 0
+
+        self.cache.delete(clave_sesion)
+        if reserva['minuto'] < int(time.time() // 60):
+            # Ya expiró: su contador no se vuelve a leer
+            return 0
+        self._decrementar(self._clave_contador(reserva['slot'], reserva['minuto']))
+        return 1
+
+
+_backends = {}
+
+
+def obtener_backend():
+    """Retorna la instancia (una por proceso) del backend configurado en TURNERO_RESERVAS_BACKEND"""
+    nombre = getattr(settings, 'TURNERO_RESERVAS_BACKEND', 'db')
+    if nombre not in _backends:
+        if nombre == 'cache':
+            _backends[nombre] = BackendCache(getattr(settings, 'TURNERO_RESERVAS_CACHE', 'default'))
+        elif nombre == 'db':
+            _backends[nombre] = BackendBaseDatos()
+        else:
+            raise ValueError(f"TURNERO_RESERVAS_BACKEND inválido: {nombre!r} (usar 'db' o 'cache')")
+    return _backends[nombre]
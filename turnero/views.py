@@ -5,12 +5,18 @@ from django.views import View
 from django.views.generic import TemplateView
 from django.utils import timezone
 from datetime import datetime, timedelta, time
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.db.models import Q, Count, Case, When, Value, IntegerField
 from clientes.models import Cliente
 from territorios.models import Localidad
-from talleres.models import Taller, TipoVehiculo, Vehiculo, ConfiguracionTaller, FranjaAnulada
-from .models import Turno, HistorialTurno, ReservaTemporal
+from talleres.models import Taller, TipoVehiculo, Vehiculo, ConfiguracionTaller
+from .models import Turno, HistorialTurno
+from .cola_emails import encolar_email
+from .reservas import SlotNoDisponible, reservar_turno, retener_slot
+from .availability import (
+    calcular_calendario, calcular_horarios_dia, es_fecha_no_laborable,
+    fechas_no_laborables, nombre_dia,
+)
 from .forms import (
     Step1ClienteForm, Step2VehiculoForm, Step3TallerForm,
     Step4FechaHoraForm, Step5ConfirmacionForm, CancelarTurnoForm, BuscarTurnoForm
@@ -541,9 +547,6 @@ class Step5ConfirmacionView(View):
             # Obtener session_key
             session_key = request.session.session_key
 
-            # Limpiar reservas temporales expiradas
-            ReservaTemporal.limpiar_expiradas()
-
             # Verificar que no sea fecha no laborable (feriado)
             if taller.fechas_no_laborables:
                 fechas_no_lab = taller.fechas_no_laborables
@@ -559,25 +562,8 @@ class Step5ConfirmacionView(View):
                             'captcha_error': 'La fecha seleccionada es un feriado o dia no laborable. Por favor seleccione otra fecha.',
                         })
 
-            # Verificar disponibilidad final antes de crear el turno
             try:
                 config = ConfiguracionTaller.objects.get(taller=taller, tipo_vehiculo=tipo_vehiculo)
-
-                # Contar turnos existentes
-                turnos_en_hora = Turno.objects.filter(
-                    taller=taller,
-                    fecha=fecha,
-                    hora_inicio=hora_inicio,
-                    tipo_vehiculo=tipo_vehiculo,
-                    estado__in=['PENDIENTE', 'CONFIRMADO']
-                ).count()
-
-                if turnos_en_hora >= config.turnos_simultaneos:
-                    # Ya no hay disponibilidad, redirigir al paso 4
-                    from django.contrib import messages
-                    messages.error(request, 'Lo sentimos, el horario seleccionado ya no está disponible. Por favor, seleccione otro horario.')
-                    return redirect_with_embedded(request, 'turnero:step4_fecha_hora')
-
             except ConfiguracionTaller.DoesNotExist:
                 config = None  # Continuar si no hay configuración específica
 
@@ -590,52 +576,41 @@ class Step5ConfirmacionView(View):
             hora_fin_dt = datetime.combine(fecha, hora_inicio) + timedelta(minutes=duracion)
             hora_fin = hora_fin_dt.time()
 
+            # Verificación final y creación atómica: el slot queda bloqueado hasta crear el turno,
+            # y la reserva temporal de esta sesión se convierte en el turno real
             try:
-                turno = Turno.objects.create(
-                    vehiculo=vehiculo,
-                    cliente=cliente,
-                    taller=taller,
-                    tipo_vehiculo=tipo_vehiculo,
-                    fecha=fecha,
-                    hora_inicio=hora_inicio,
-                    hora_fin=hora_fin,
-                    estado='PENDIENTE',
-                    observaciones=form.cleaned_data.get('observaciones', '')
-                )
-            except IntegrityError:
-                from django.contrib import messages
-                messages.error(request, 'Lo sentimos, el horario seleccionado fue tomado por otro usuario. Por favor, seleccioná otro horario.')
-                return redirect_with_embedded(request, 'turnero:step4_fecha_hora')
-
-            # Eliminar la reserva temporal de esta sesión (ya se convirtió en turno real)
-            if session_key:
-                ReservaTemporal.objects.filter(session_key=session_key).delete()
-
-            # Crear historial
-            HistorialTurno.objects.create(
-                turno=turno,
-                accion='CREACION',
-                descripcion=f'Turno creado desde la web para {vehiculo.dominio}',
-                ip_address=self.get_client_ip(request)
-            )
+                with transaction.atomic():
+                    turno = reservar_turno(
+                        capacidad=config.turnos_simultaneos if config else 1,
+                        session_key=session_key,
+                        vehiculo=vehiculo,
+                        cliente=cliente,
+                        taller=taller,
+                        tipo_vehiculo=tipo_vehiculo,
+                        fecha=fecha,
+                        hora_inicio=hora_inicio,
+                        hora_fin=hora_fin,
+                        estado='PENDIENTE',
+                        observaciones=form.cleaned_data.get('observaciones', '')
+                    )
 
-            # Enviar email de confirmación
-            try:
-                from .utils import enviar_email_turno
-                success, message = enviar_email_turno(turno, motivo='confirmacion')
-                if success:
-                    turno.email_enviado = True
-                    turno.save(update_fields=['email_enviado'])
+                    # Crear historial
                     HistorialTurno.objects.create(
                         turno=turno,
-                        accion='EMAIL_ENVIADO',
-                        descripcion=f'Email de confirmación enviado a {cliente.email}',
+                        accion='CREACION',
+                        descripcion=f'Turno creado desde la web para {vehiculo.dominio}',
                         ip_address=self.get_client_ip(request)
                     )
-            except Exception as e:
-                # Si falla el envío de email, no interrumpir el flujo
-                # El turno ya fue creado exitosamente
-                pass
+
+                    # Email de confirmación: se encola con el turno y lo envía procesar_emails
+                    # (al enviarse marca email_enviado y registra EMAIL_ENVIADO en el historial)
+                    encolar_email('turno', turno, motivo='confirmacion',
+                                  ip_address=self.get_client_ip(request))
+            except (SlotNoDisponible, IntegrityError):
+                # Ya no hay disponibilidad, redirigir al paso 4
+                from django.contrib import messages
+                messages.error(request, 'Lo sentimos, el horario seleccionado ya no está disponible. Por favor, seleccione otro horario.')
+                return redirect_with_embedded(request, 'turnero:step4_fecha_hora')
 
             # Limpiar sesión
             for key in ['cliente_id', 'vehiculo_id', 'taller_id', 'tipo_vehiculo_id', 'fecha', 'hora_inicio']:
@@ -886,12 +861,13 @@ def obtener_horarios_disponibles_ajax(request):
         return JsonResponse({'error': 'Faltan parámetros'}, status=400)
 
     try:
-        taller = Taller.objects.get(id=taller_id)
-        tipo_vehiculo = TipoVehiculo.objects.get(id=tipo_vehiculo_id)
         fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
 
-        # Obtener configuración
-        config = ConfiguracionTaller.objects.get(taller=taller, tipo_vehiculo=tipo_vehiculo)
+        # Obtener configuración (con taller y tipo en la misma consulta)
+        config = ConfiguracionTaller.objects.select_related('taller', 'tipo_vehiculo').get(
+            taller_id=taller_id, tipo_vehiculo_id=tipo_vehiculo_id
+        )
+        taller = config.taller
 
         # Obtener session_key del usuario actual (para excluir su propia reserva)
         session_key = request.session.session_key
@@ -899,93 +875,36 @@ def obtener_horarios_disponibles_ajax(request):
             request.session.create()
             session_key = request.session.session_key
 
-        # Limpiar reservas temporales expiradas
-        ReservaTemporal.limpiar_expiradas()
-
-        # Obtener hora actual en zona horaria de Argentina (configurada en settings.py)
-        ahora = timezone.localtime(timezone.now())
-        hoy = ahora.date()
-        hora_actual_sistema = ahora.time()
-
         # Obtener horario del día específico
-        dia_nombre = ['lunes', 'martes', 'miercoles', 'jueves', 'viernes', 'sabado', 'domingo'][fecha.weekday()]
-        horario_apertura, horario_cierre = taller.get_horario_dia(dia_nombre)
+        horario_apertura, horario_cierre = taller.get_horario_dia(nombre_dia(fecha))
 
         if not horario_apertura or not horario_cierre:
             return JsonResponse({'horarios': [], 'message': 'El taller no atiende este día'})
 
         # Verificar si es fecha no laborable (feriado)
-        if taller.fechas_no_laborables and isinstance(taller.fechas_no_laborables, list):
-            for item in taller.fechas_no_laborables:
-                f_str = item.get('fecha', '') if isinstance(item, dict) else str(item)
-                if f_str == fecha.isoformat() or f_str == fecha.strftime('%Y-%m-%d'):
-                    return JsonResponse({'horarios': [], 'message': 'El taller no atiende este dia (feriado/no laborable)'})
-
-        # Obtener franjas anuladas activas para esta fecha y taller (específicas + recurrentes)
-        franjas_anuladas = FranjaAnulada.objects.filter(
-            taller=taller,
-            status=True
-        ).filter(
-            Q(fecha=fecha, es_recurrente=False) |
-            Q(es_recurrente=True, dia_semana=dia_nombre)
-        )
+        if es_fecha_no_laborable(taller, fecha):
+            return JsonResponse({'horarios': [], 'message': 'El taller no atiende este dia (feriado/no laborable)'})
 
-        # Generar horarios disponibles
-        horarios = []
-        hora_actual = datetime.combine(fecha, horario_apertura)
-        hora_cierre = datetime.combine(fecha, horario_cierre)
-
-        while hora_actual < hora_cierre:
-            hora_time = hora_actual.time()
-
-            # Si la fecha es hoy, filtrar horarios que ya pasaron
-            if fecha == hoy and hora_time <= hora_actual_sistema:
-                hora_actual += timedelta(minutes=config.intervalo_minutos)
-                continue
-
-            # Verificar si el horario cae en una franja anulada
-            en_franja_anulada = franjas_anuladas.filter(
-                hora_inicio__lte=hora_time,
-                hora_fin__gt=hora_time
-            ).exists()
-            if en_franja_anulada:
-                hora_actual += timedelta(minutes=config.intervalo_minutos)
-                continue
-
-            # Contar turnos confirmados/pendientes del mismo tipo de vehículo
-            turnos_en_hora = Turno.objects.filter(
-                taller=taller,
-                fecha=fecha,
-                hora_inicio=hora_time,
-                tipo_vehiculo=tipo_vehiculo,
-                estado__in=['PENDIENTE', 'CONFIRMADO']
-            ).count()
-
-            # Contar reservas temporales activas (excluyendo la del usuario actual)
-            reservas_en_hora = ReservaTemporal.contar_reservas_activas(
-                taller=taller,
-                tipo_vehiculo=tipo_vehiculo,
-                fecha=fecha,
-                hora_inicio=hora_time,
-                excluir_session=session_key
-            )
-
-            # Cupos disponibles = capacidad - turnos confirmados - reservas temporales de otros
-            cupos_disponibles = config.turnos_simultaneos - turnos_en_hora - reservas_en_hora
-
-            if cupos_disponibles > 0:
-                horarios.append({
-                    'hora': hora_actual.strftime('%H:%M'),
-                    'disponible': True,
-                    'cupos': cupos_disponibles,
-                    'total': config.turnos_simultaneos
-                })
+        # Grilla completa del día: turnos, reservas de otros y franjas anuladas en consultas agrupadas
+        slots = calcular_horarios_dia(
+            config, fecha,
+            session_key=session_key,
+            horario=(horario_apertura, horario_cierre),
+        )
 
-            hora_actual += timedelta(minutes=config.intervalo_minutos)
+        horarios = [
+            {
+                'hora': slot.hora_inicio.strftime('%H:%M'),
+                'disponible': True,
+                'cupos': slot.cupos,
+                'total': slot.capacidad
+            }
+            for slot in slots if slot.disponible
+        ]
 
         return JsonResponse({'horarios': horarios})
 
-    except (Taller.DoesNotExist, TipoVehiculo.DoesNotExist, ConfiguracionTaller.DoesNotExist):
+    except ConfiguracionTaller.DoesNotExist:
         return JsonResponse({'error': 'Configuración no encontrada'}, status=404)
     except ValueError:
         return JsonResponse({'error': 'Formato de fecha inválido'}, status=400)
@@ -1022,50 +941,29 @@ def reservar_horario_ajax(request):
         # Obtener configuración para verificar capacidad
         config = ConfiguracionTaller.objects.get(taller=taller, tipo_vehiculo=tipo_vehiculo)
 
-        # Limpiar reservas expiradas
-        ReservaTemporal.limpiar_expiradas()
-
-        # Contar turnos confirmados
-        turnos_en_hora = Turno.objects.filter(
-            taller=taller,
-            fecha=fecha,
-            hora_inicio=hora,
-            tipo_vehiculo=tipo_vehiculo,
-            estado__in=['PENDIENTE', 'CONFIRMADO']
-        ).count()
-
-        # Contar reservas temporales de OTROS usuarios
-        reservas_otros = ReservaTemporal.contar_reservas_activas(
-            taller=taller,
-            tipo_vehiculo=tipo_vehiculo,
-            fecha=fecha,
-            hora_inicio=hora,
-            excluir_session=session_key
-        )
-
-        cupos_disponibles = config.turnos_simultaneos - turnos_en_hora - reservas_otros
-
-        if cupos_disponibles <= 0:
+        # Crear la reserva temporal (10 minutos de duración) con el slot bloqueado:
+        # cuenta turnos y reservas de OTROS usuarios contra turnos_simultaneos
+        try:
+            reserva = retener_slot(
+                taller=taller,
+                tipo_vehiculo=tipo_vehiculo,
+                fecha=fecha,
+                hora_inicio=hora,
+                capacidad=config.turnos_simultaneos,
+                session_key=session_key,
+                minutos_expiracion=10
+            )
+        except SlotNoDisponible:
             return JsonResponse({
                 'success': False,
                 'error': 'Este horario ya no está disponible. Por favor, seleccione otro.'
             })
 
-        # Crear la reserva temporal (10 minutos de duración)
-        reserva = ReservaTemporal.crear_o_actualizar(
-            taller=taller,
-            tipo_vehiculo=tipo_vehiculo,
-            fecha=fecha,
-            hora_inicio=hora,
-            session_key=session_key,
-            minutos_expiracion=10
-        )
-
         return JsonResponse({
             'success': True,
             'message': 'Horario reservado temporalmente',
             'expira_en': 10,  # minutos
-            'reserva_id': reserva.id
+            'reserva_id': reserva.id  # None con el backend de cache (reserva no persistida)
         })
 
     except (Taller.DoesNotExist, TipoVehiculo.DoesNotExist, ConfiguracionTaller.DoesNotExist):
@@ -1077,7 +975,11 @@ def reservar_horario_ajax(request):
 
 
 def obtener_fechas_disponibles_ajax(request):
-    """Obtener fechas disponibles para el calendario (AJAX)"""
+    """
+    Obtener fechas disponibles para el calendario (AJAX).
+    Incluye la capacidad restante por fecha para los próximos 60 días y
+    deshabilita de entrada los días sin cupos (completos, sin atención o feriados).
+    """
     taller_id = request.GET.get('taller_id')
     tipo_vehiculo_id = request.GET.get('tipo_vehiculo_id')
 
@@ -1086,87 +988,51 @@ def obtener_fechas_disponibles_ajax(request):
 
     try:
         taller = Taller.objects.get(id=taller_id)
-        dias_atencion = taller.dias_atencion
 
         # Obtener hora actual en zona horaria de Argentina
         ahora = timezone.localtime(timezone.now())
         hoy = ahora.date()
         hora_actual = ahora.time()
+        fecha_maxima = hoy + timedelta(days=60)
 
         fechas_deshabilitadas = []
+        disponibilidad = {}
 
-        for i in range(60):
-            fecha = hoy + timedelta(days=i)
-            dia_nombre = ['lunes', 'martes', 'miercoles', 'jueves', 'viernes', 'sabado', 'domingo'][fecha.weekday()]
-
-            # Obtener horario del día (soporta horarios diferenciados)
-            horario_apertura_dia, horario_cierre_dia = taller.get_horario_dia(dia_nombre)
-
-            # Deshabilitar si no atiende ese día de la semana
-            if not horario_apertura_dia or not horario_cierre_dia:
-                fechas_deshabilitadas.append(fecha.isoformat())
-                continue
-
-            # Si es hoy, verificar si aún quedan horarios disponibles
-            if fecha == hoy:
-                # Si ya pasó el horario de cierre, deshabilitar hoy
-                if hora_actual >= horario_cierre_dia:
+        try:
+            config = ConfiguracionTaller.objects.get(taller=taller, tipo_vehiculo_id=tipo_vehiculo_id)
+            config.taller = taller
+        except (ConfiguracionTaller.DoesNotExist, ValueError):
+            config = None
+
+        if config:
+            # Capacidad real por fecha: una sola consulta agrupada para toda la ventana
+            calendario = calcular_calendario(config, hoy, fecha_maxima)
+            for fecha, (cupos, total) in calendario.items():
+                disponibilidad[fecha.isoformat()] = {'cupos': cupos, 'total': total}
+                if cupos <= 0:
                     fechas_deshabilitadas.append(fecha.isoformat())
-                    continue
-
-                # Verificar si queda al menos un horario disponible hoy
-                # (considerando el intervalo de turnos)
-                try:
-                    tipo_vehiculo = TipoVehiculo.objects.get(id=tipo_vehiculo_id)
-                    config = ConfiguracionTaller.objects.get(taller=taller, tipo_vehiculo=tipo_vehiculo)
-
-                    # Buscar el próximo horario disponible
-                    hora_iteracion = datetime.combine(fecha, horario_apertura_dia)
-                    hora_cierre = datetime.combine(fecha, horario_cierre_dia)
-                    hay_horarios_disponibles = False
-
-                    while hora_iteracion < hora_cierre:
-                        hora_time = hora_iteracion.time()
-
-                        # Solo considerar horarios que aún no pasaron
-                        if hora_time > hora_actual:
-                            hay_horarios_disponibles = True
-                            break
-
-                        hora_iteracion += timedelta(minutes=config.intervalo_minutos)
-
-                    if not hay_horarios_disponibles:
-                        fechas_deshabilitadas.append(fecha.isoformat())
-                        continue
-
-                except (TipoVehiculo.DoesNotExist, ConfiguracionTaller.DoesNotExist):
-                    # Si no hay configuración, deshabilitar por seguridad
-                    pass
+        else:
+            # Sin configuración: deshabilitar solo por día de atención / horario de cierre
+            no_laborables = fechas_no_laborables(taller)
+            for i in range(61):
+                fecha = hoy + timedelta(days=i)
+                horario_apertura_dia, horario_cierre_dia = taller.get_horario_dia(nombre_dia(fecha))
 
-        # Agregar fechas no laborables (feriados, vacaciones, etc.)
-        if taller.fechas_no_laborables:
-            for item in taller.fechas_no_laborables:
-                try:
-                    from datetime import datetime
-                    # Soportar formato string "YYYY-MM-DD" o dict {"fecha": "YYYY-MM-DD", "motivo": "..."}
-                    if isinstance(item, dict):
-                        fecha_str = item.get('fecha', '')
-                    else:
-                        fecha_str = str(item)
-                    fecha_no_lab = datetime.strptime(fecha_str, '%Y-%m-%d').date()
-                    if hoy <= fecha_no_lab <= (hoy + timedelta(days=60)):
-                        if fecha_no_lab.isoformat() not in fechas_deshabilitadas:
-                            fechas_deshabilitadas.append(fecha_no_lab.isoformat())
-                except (ValueError, TypeError):
-                    pass
+                if not horario_apertura_dia or not horario_cierre_dia:
+                    fechas_deshabilitadas.append(fecha.isoformat())
+                elif fecha == hoy and hora_actual >= horario_cierre_dia:
+                    fechas_deshabilitadas.append(fecha.isoformat())
+                elif fecha.isoformat() in no_laborables:
+                    fechas_deshabilitadas.append(fecha.isoformat())
 
         return JsonResponse({
             'fechas_deshabilitadas': fechas_deshabilitadas,
+            'disponibilidad': disponibilidad,
             'fecha_minima': hoy.isoformat(),
-            'fecha_maxima': (hoy + timedelta(days=60)).isoformat()
+            'fecha_maxima': fecha_maxima.isoformat()
         })
 
-    except Taller.DoesNotExist:
+    except (Taller.DoesNotExist, ValueError):
         return JsonResponse({'error': 'Taller no encontrado'}, status=404)
 
 